@@ -1,11 +1,11 @@
 import os
 import logging
-import threading
+import importlib.util
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify, send_file, flash, redirect, url_for
-from flask_sqlalchemy import SQLAlchemy
+from flask import Blueprint, current_app, render_template, request, jsonify, send_file, flash, redirect, url_for
 from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
 import csv
 import io
 import json
@@ -17,72 +17,145 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Import models first to set up the database
-from models import db, Employee, Attendance, UnknownFace
-
-# Create the app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "fallback-secret-key")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
-
-# Configure the database
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///attendance.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-app.config["UPLOAD_FOLDER"] = "uploads"
-app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max file size
-
-# Initialize extensions
-db.init_app(app)
-
-# Create uploads directory
-os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
-os.makedirs(os.path.join(app.config["UPLOAD_FOLDER"], "employees"), exist_ok=True)
-os.makedirs(os.path.join(app.config["UPLOAD_FOLDER"], "attendance"), exist_ok=True)
-
-# Initialize configuration and services
-try:
-    from config import Config
-    config = Config()
-except ImportError:
-    logger.warning("Config module not available, using defaults")
-    config = None
-
-try:
-    from notifier import NotificationService
-    notification_service = NotificationService()
-except ImportError:
-    logger.warning("Notification service not available")
-    notification_service = None
-
-# Initialize face recognition system
-face_recognition_system = None
-recognition_thread = None
-
-# Try to import face recognition modules
-try:
-    import cv2
-    import face_recognition
-    import numpy as np
-    from recognition import FaceRecognitionSystem
-    from utils import blur_face, save_employee_images
-    FACE_RECOGNITION_AVAILABLE = True
-    logger.info("Face recognition modules loaded successfully")
-except ImportError as e:
-    FACE_RECOGNITION_AVAILABLE = False
-    logger.warning(f"Face recognition modules not available: {e}")
-
-with app.app_context():
-    db.create_all()
-
-@app.route('/')
+from models import db, Employee, Attendance, UnknownFace, UploadJob, create_db_app
+from jobs import UploadJobQueue
+from retention import create_retention_engine
+from metrics import CONTENT_TYPE
+from worker import RecognitionController, WorkerClient, WorkerUnavailableError
+
+bp = Blueprint('main', __name__)
+
+# Services, created by create_app
+config = None
+notification_service = None
+upload_job_queue = None
+retention_engine = None
+
+# Runs recognition in this process, or talks to a separate worker (worker.py)
+recognition_controller = None
+
+# Check for the computer vision modules without importing them; cv2 and
+# face_recognition (which loads the dlib models) are imported on first use
+FACE_RECOGNITION_AVAILABLE = all(importlib.util.find_spec(module) for module in ('cv2', 'face_recognition'))
+if FACE_RECOGNITION_AVAILABLE:
+    logger.info("Face recognition modules found")
+else:
+    logger.warning("Face recognition modules not available")
+
+def recognition_available():
+    """Whether recognition can run, here or in the worker process"""
+    return FACE_RECOGNITION_AVAILABLE or isinstance(recognition_controller, WorkerClient)
+
+def reload_recognition_gallery(employee_id=None):
+    """Reload employee embeddings into the running recognition system"""
+    try:
+        recognition_controller.reload_gallery(employee_id)
+    except WorkerUnavailableError as e:
+        logger.warning(f"Could not reload gallery: {str(e)}")
+
+def create_app(app_config=None):
+    """Create the web application and start its background services"""
+    global config, notification_service, upload_job_queue, retention_engine, recognition_controller
+    
+    # Initialize configuration first; the app takes UPLOAD_FOLDER from it
+    config = app_config
+    if config is None:
+        try:
+            from config import Config
+            config = Config()
+        except ImportError:
+            logger.warning("Config module not available, using defaults")
+    
+    # Create the app with the database configured
+    app = create_db_app(__name__, config or {})
+    app.secret_key = os.environ.get("SESSION_SECRET", "fallback-secret-key")
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+    app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max file size
+    app.register_blueprint(bp)
+    
+    # Create uploads directory
+    os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+    os.makedirs(os.path.join(app.config["UPLOAD_FOLDER"], "employees"), exist_ok=True)
+    os.makedirs(os.path.join(app.config["UPLOAD_FOLDER"], "attendance"), exist_ok=True)
+    
+    # Initialize services
+    try:
+        from notifier import NotificationService
+        notification_service = NotificationService()
+    except ImportError:
+        logger.warning("Notification service not available")
+        notification_service = None
+    
+    # Only one process may own the camera; with several web workers it runs in worker.py
+    worker_url = config.get('RECOGNITION_WORKER_URL') if config else None
+    if worker_url:
+        recognition_controller = WorkerClient(
+            worker_url,
+            token=config.get('RECOGNITION_WORKER_TOKEN'),
+            timeout=config.get('RECOGNITION_WORKER_TIMEOUT', 5)
+        )
+        logger.info(f"Recognition is controlled through the worker at {worker_url}")
+    else:
+        recognition_controller = RecognitionController(app, db, notification_service, config)
+    
+    from enrollment import enrollment_settings, conflict_settings
+    from embedding_cache import open_embedding_cache
+    
+    upload_job_queue = UploadJobQueue(
+        app, db,
+        max_workers=config.get('UPLOAD_WORKERS', 2) if config else 2,
+        on_gallery_changed=reload_recognition_gallery,
+        encoder_settings=enrollment_settings(config),
+        conflict_settings=conflict_settings(config),
+        embedding_cache=open_embedding_cache(config)
+    )
+    
+    retention_engine = create_retention_engine(app, db, config)
+    
+    with app.app_context():
+        db.create_all()
+        if FACE_RECOGNITION_AVAILABLE:
+            upload_job_queue.recover()
+    
+    if config and config.get('RETENTION_ENABLED', False):
+        retention_engine.start_scheduler(config.get('RETENTION_INTERVAL_HOURS', 24))
+    
+    return app
+
+def __getattr__(name):
+    """Build the default application on first access (gunicorn app:app, tests)"""
+    if name == 'app':
+        app = create_app()
+        globals()['app'] = app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+@bp.app_template_filter('media_url')
+def media_url(image_path, size=None):
+    """Build the URL of an uploaded image (or its thumbnail) for templates"""
+    if not image_path:
+        return ''
+    
+    upload_folder = os.path.abspath(current_app.config["UPLOAD_FOLDER"])
+    filename = os.path.relpath(os.path.abspath(image_path), upload_folder).replace(os.sep, '/')
+    params = {'filename': filename}
+    if size:
+        params['size'] = size
+    
+    # Version the URL with the file's mtime so responses can be cached as immutable
+    try:
+        params['v'] = int(os.stat(image_path).st_mtime)
+    except OSError:
+        pass
+    
+    return url_for('main.serve_media', **params)
+
+@bp.route('/')
 def index():
     """Home page redirect to dashboard"""
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
 def dashboard():
     """Main dashboard showing attendance overview"""
     today = datetime.now().date()
@@ -122,13 +195,13 @@ def dashboard():
                          total_employees=len(employees),
                          present_count=len([a for a in attendance_summary if a['status'] in ['Present', 'Late']]))
 
-@app.route('/employees')
+@bp.route('/employees')
 def employees():
     """Employee management page"""
     employees = Employee.query.all()
     return render_template('employees.html', employees=employees)
 
-@app.route('/api/employees', methods=['GET'])
+@bp.route('/api/employees', methods=['GET'])
 def get_employees():
     """API endpoint to get all employees"""
     employees = Employee.query.all()
@@ -139,7 +212,7 @@ def get_employees():
         'created_at': emp.created_at.isoformat()
     } for emp in employees])
 
-@app.route('/api/employees', methods=['POST'])
+@bp.route('/api/employees', methods=['POST'])
 def add_employee():
     """API endpoint to add new employee"""
     try:
@@ -169,7 +242,7 @@ def add_employee():
         logger.error(f"Error adding employee: {str(e)}")
         return jsonify({'error': 'Failed to add employee'}), 500
 
-@app.route('/api/employees/<int:employee_id>/upload-photos', methods=['POST'])
+@bp.route('/api/employees/<int:employee_id>/upload-photos', methods=['POST'])
 def upload_employee_photos(employee_id):
     """Upload reference photos for an employee"""
     try:
@@ -186,40 +259,23 @@ def upload_employee_photos(employee_id):
         saved_files = []
         
         if FACE_RECOGNITION_AVAILABLE:
-            embeddings = []
-            
             for i, photo in enumerate(photos):
                 if photo.filename == '':
                     continue
                     
-                # Save the uploaded file
+                # Save the uploaded file; encoding happens in the background job
                 filename = secure_filename(f"{employee.name}_{i+1}_{photo.filename}")
-                filepath = os.path.join(app.config["UPLOAD_FOLDER"], "employees", filename)
+                filepath = os.path.join(current_app.config["UPLOAD_FOLDER"], "employees", filename)
                 photo.save(filepath)
                 saved_files.append(filepath)
-                
-                # Generate face embedding
-                image = face_recognition.load_image_file(filepath)
-                face_encodings = face_recognition.face_encodings(image)
-                
-                if face_encodings:
-                    embeddings.append(face_encodings[0].tolist())
-                else:
-                    # Clean up uploaded files if face not found
-                    for file in saved_files:
-                        if os.path.exists(file):
-                            os.remove(file)
-                    return jsonify({'error': f'No face found in photo {i+1}'}), 400
             
-            # Store embeddings in database
-            employee.face_embeddings = json.dumps(embeddings)
-            employee.photo_paths = json.dumps(saved_files)
-            db.session.commit()
+            job = upload_job_queue.enqueue(employee.id, saved_files)
             
-            # Restart recognition system to reload embeddings
-            restart_recognition_system()
-            
-            return jsonify({'message': 'Photos uploaded and processed successfully'}), 200
+            return jsonify({
+                'message': 'Photos uploaded and queued for processing',
+                'job_id': job.id,
+                'status_url': url_for('main.get_job', job_id=job.id)
+            }), 202
         else:
             # Save photos without face recognition processing
             for i, photo in enumerate(photos):
@@ -227,7 +283,7 @@ def upload_employee_photos(employee_id):
                     continue
                     
                 filename = secure_filename(f"{employee.name}_{i+1}_{photo.filename}")
-                filepath = os.path.join(app.config["UPLOAD_FOLDER"], "employees", filename)
+                filepath = os.path.join(current_app.config["UPLOAD_FOLDER"], "employees", filename)
                 photo.save(filepath)
                 saved_files.append(filepath)
             
@@ -241,7 +297,25 @@ def upload_employee_photos(employee_id):
         logger.error(f"Error uploading photos: {str(e)}")
         return jsonify({'error': 'Failed to upload photos'}), 500
 
-@app.route('/api/attendance')
+@bp.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Report progress and per-photo errors of a background upload job"""
+    job = db.session.get(UploadJob, job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify({
+        'id': job.id,
+        'employee_id': job.employee_id,
+        'status': job.status,
+        'total': job.total,
+        'processed': job.processed,
+        'errors': json.loads(job.errors) if job.errors else [],
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    })
+
+@bp.route('/api/attendance')
 def get_attendance():
     """Get attendance records with optional filtering"""
     try:
@@ -274,7 +348,7 @@ def get_attendance():
         logger.error(f"Error fetching attendance: {str(e)}")
         return jsonify({'error': 'Failed to fetch attendance records'}), 500
 
-@app.route('/api/attendance/export')
+@bp.route('/api/attendance/export')
 def export_attendance():
     """Export attendance records as CSV"""
     try:
@@ -329,98 +403,193 @@ def export_attendance():
         logger.error(f"Error exporting attendance: {str(e)}")
         return jsonify({'error': 'Failed to export attendance'}), 500
 
-@app.route('/api/recognition/start', methods=['POST'])
+@bp.route('/media/<path:filename>')
+def serve_media(filename):
+    """Serve uploaded images and their cached thumbnails with HTTP caching"""
+    upload_folder = os.path.abspath(current_app.config["UPLOAD_FOLDER"])
+    image_path = safe_join(upload_folder, filename)
+    if image_path is None or not os.path.isfile(image_path):
+        return jsonify({'error': 'Not found'}), 404
+    
+    if request.args.get('size') == 'thumb':
+        try:
+            from utils import ensure_thumbnail
+            thumbnail_size = config.get('THUMBNAIL_SIZE', 150) if config else 150
+            thumbnail_path = ensure_thumbnail(filename, upload_folder, (thumbnail_size, thumbnail_size))
+            if thumbnail_path:
+                image_path = thumbnail_path
+        except ImportError:
+            logger.warning("Image libraries not available, serving original instead of thumbnail")
+    
+    # conditional=True answers If-None-Match / If-Modified-Since and Range requests
+    max_age = config.get('MEDIA_CACHE_MAX_AGE', 31536000) if config else 31536000
+    response = send_file(image_path, conditional=True, etag=True, max_age=max_age)
+    if request.args.get('v'):
+        response.cache_control.immutable = True
+    return response
+
+@bp.route('/api/recognition/start', methods=['POST'])
 def start_recognition():
     """Start the face recognition system"""
     try:
-        if not FACE_RECOGNITION_AVAILABLE:
+        if not recognition_available():
             return jsonify({'message': 'Face recognition system is not available. Computer vision dependencies need to be installed.'}), 200
         
-        global face_recognition_system, recognition_thread
-        
-        if face_recognition_system and face_recognition_system.is_running:
+        if not recognition_controller.start():
             return jsonify({'message': 'Recognition system is already running'}), 200
         
-        face_recognition_system = FaceRecognitionSystem(db, notification_service, config)
-        recognition_thread = threading.Thread(target=face_recognition_system.run)
-        recognition_thread.daemon = True
-        recognition_thread.start()
-        
         return jsonify({'message': 'Recognition system started successfully'}), 200
         
+    except WorkerUnavailableError as e:
+        logger.error(f"Error starting recognition: {str(e)}")
+        return jsonify({'error': 'Recognition worker is unreachable'}), 502
     except Exception as e:
         logger.error(f"Error starting recognition: {str(e)}")
         return jsonify({'error': 'Failed to start recognition system'}), 500
 
-@app.route('/api/recognition/stop', methods=['POST'])
+@bp.route('/api/recognition/stop', methods=['POST'])
 def stop_recognition():
     """Stop the face recognition system"""
     try:
-        global face_recognition_system
-        
-        if face_recognition_system:
-            face_recognition_system.stop()
-            face_recognition_system = None
+        recognition_controller.stop()
         
         return jsonify({'message': 'Recognition system stopped successfully'}), 200
         
+    except WorkerUnavailableError as e:
+        logger.error(f"Error stopping recognition: {str(e)}")
+        return jsonify({'error': 'Recognition worker is unreachable'}), 502
     except Exception as e:
         logger.error(f"Error stopping recognition: {str(e)}")
         return jsonify({'error': 'Failed to stop recognition system'}), 500
 
-@app.route('/api/recognition/status')
+@bp.route('/api/recognition/status')
 def recognition_status():
     """Get the status of the face recognition system"""
     try:
-        if not FACE_RECOGNITION_AVAILABLE:
+        if not recognition_available():
             return jsonify({
                 'is_running': False,
                 'message': 'Face recognition system is not available. Install OpenCV and face_recognition to enable.'
             })
         
-        is_running = face_recognition_system and face_recognition_system.is_running
-        return jsonify({
-            'is_running': is_running,
-            'message': 'Recognition system is running' if is_running else 'Recognition system is stopped'
-        })
+        return jsonify(recognition_controller.status())
+    except WorkerUnavailableError as e:
+        logger.error(f"Error getting recognition status: {str(e)}")
+        return jsonify({'is_running': False, 'error': 'Recognition worker is unreachable'}), 502
     except Exception as e:
         logger.error(f"Error getting recognition status: {str(e)}")
         return jsonify({'error': 'Failed to get recognition status'}), 500
 
-def restart_recognition_system():
-    """Restart the recognition system to reload employee data"""
-    if not FACE_RECOGNITION_AVAILABLE:
-        return
+@bp.route('/api/recognition/profile', methods=['POST'])
+def start_profile():
+    """Profile the running recognition loop for a number of seconds or frames"""
+    try:
+        if not (config and config.get('PROFILER_ENABLED', False)):
+            return jsonify({'error': 'Profiling is disabled. Set PROFILER_ENABLED=true to enable it.'}), 403
+        
+        data = request.get_json(silent=True) or {}
+        seconds = data.get('seconds')
+        frames = data.get('frames')
+        session = recognition_controller.start_profile(
+            mode=data.get('mode', 'sampling'),
+            seconds=float(seconds) if seconds is not None else None,
+            frames=int(frames) if frames is not None else None
+        )
+        
+        return jsonify({
+            'message': 'Profiling started',
+            'session': session,
+            'status_url': url_for('main.profile_status')
+        }), 202
+        
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+    except WorkerUnavailableError as e:
+        logger.error(f"Error starting profiler: {str(e)}")
+        return jsonify({'error': 'Recognition worker is unreachable'}), 502
+    except Exception as e:
+        logger.error(f"Error starting profiler: {str(e)}")
+        return jsonify({'error': 'Failed to start profiling'}), 500
+
+@bp.route('/api/recognition/profile')
+def profile_status():
+    """Get the state and output files of the current or last profiling session"""
+    if not (config and config.get('PROFILER_ENABLED', False)):
+        return jsonify({'error': 'Profiling is disabled. Set PROFILER_ENABLED=true to enable it.'}), 403
     
-    global face_recognition_system, recognition_thread
+    try:
+        return jsonify(recognition_controller.profile_status())
+    except WorkerUnavailableError as e:
+        logger.error(f"Error getting profiler status: {str(e)}")
+        return jsonify({'error': 'Recognition worker is unreachable'}), 502
+
+@bp.route('/api/config')
+def get_runtime_config():
+    """Get the settings that can be changed without restarting recognition"""
+    if not config:
+        return jsonify({'error': 'Configuration is not available'}), 503
     
     try:
-        # Stop current system
-        if face_recognition_system:
-            face_recognition_system.stop()
-        
-        # Wait a moment for cleanup
-        import time
-        time.sleep(1)
-        
-        # Start new system
-        face_recognition_system = FaceRecognitionSystem(db, notification_service, config)
-        recognition_thread = threading.Thread(target=face_recognition_system.run)
-        recognition_thread.daemon = True
-        recognition_thread.start()
-        
-        logger.info("Recognition system restarted successfully")
+        return jsonify(recognition_controller.runtime_config())
+    except WorkerUnavailableError as e:
+        logger.error(f"Error getting runtime configuration: {str(e)}")
+        return jsonify({'error': 'Recognition worker is unreachable'}), 502
+
+@bp.route('/api/config/reload', methods=['POST'])
+def reload_config():
+    """Re-read the environment, or apply runtime overrides from the JSON body
+    
+    The running recognition loop picks the new values up on its next frame.
+    """
+    from config import RUNTIME_KEYS
+    
+    if not config:
+        return jsonify({'error': 'Configuration is not available'}), 503
+    
+    try:
+        overrides = request.get_json(silent=True) or None
+        changed = config.reload(overrides)
+        if isinstance(recognition_controller, WorkerClient):
+            # The worker has its own copy of the configuration
+            changed = sorted(set(changed) | set(recognition_controller.reload_config(overrides)))
+        restart_required = [key for key in changed if key not in RUNTIME_KEYS]
+        
+        logger.info(f"Configuration reloaded, changed: {', '.join(changed) or 'nothing'}")
+        return jsonify({
+            'message': 'Configuration reloaded',
+            'changed': changed,
+            'restart_required': restart_required
+        })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except WorkerUnavailableError as e:
+        logger.error(f"Error reloading configuration: {str(e)}")
+        return jsonify({'error': 'Recognition worker is unreachable'}), 502
     except Exception as e:
-        logger.error(f"Error restarting recognition system: {str(e)}")
+        logger.error(f"Error reloading configuration: {str(e)}")
+        return jsonify({'error': 'Failed to reload configuration'}), 500
+
+@bp.route('/metrics')
+def metrics():
+    """Expose recognition pipeline metrics in Prometheus text format"""
+    try:
+        # The pipeline metrics live in whichever process runs the loop
+        return current_app.response_class(recognition_controller.metrics(), content_type=CONTENT_TYPE)
+    except WorkerUnavailableError as e:
+        logger.error(f"Error collecting metrics: {str(e)}")
+        return jsonify({'error': 'Recognition worker is unreachable'}), 502
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Not found'}), 404
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
 if __name__ == '__main__':
+    app = create_app()
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
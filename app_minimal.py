@@ -1,7 +1,7 @@
 import os
 import logging
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify, send_file, flash, redirect, url_for
+from flask import Blueprint, Flask, render_template, request, jsonify, send_file, send_from_directory, flash, redirect, url_for
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
@@ -39,6 +39,9 @@ app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max file size
 # Initialize extensions
 db.init_app(app)
 
+# Same blueprint name as app.py, so the shared templates build the same endpoints
+bp = Blueprint('main', __name__)
+
 # Create uploads directory
 os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 os.makedirs(os.path.join(app.config["UPLOAD_FOLDER"], "employees"), exist_ok=True)
@@ -85,12 +88,12 @@ class UnknownFace(db.Model):
 with app.app_context():
     db.create_all()
 
-@app.route('/')
+@bp.route('/')
 def index():
     """Home page redirect to dashboard"""
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
 def dashboard():
     """Main dashboard showing attendance overview"""
     today = datetime.now().date()
@@ -130,13 +133,13 @@ def dashboard():
                          total_employees=len(employees),
                          present_count=len([a for a in attendance_summary if a['status'] in ['Present', 'Late']]))
 
-@app.route('/employees')
+@bp.route('/employees')
 def employees():
     """Employee management page"""
     employees = Employee.query.all()
     return render_template('employees.html', employees=employees)
 
-@app.route('/api/employees', methods=['GET'])
+@bp.route('/api/employees', methods=['GET'])
 def get_employees():
     """API endpoint to get all employees"""
     employees = Employee.query.all()
@@ -147,7 +150,7 @@ def get_employees():
         'created_at': emp.created_at.isoformat()
     } for emp in employees])
 
-@app.route('/api/employees', methods=['POST'])
+@bp.route('/api/employees', methods=['POST'])
 def add_employee():
     """API endpoint to add new employee"""
     try:
@@ -177,7 +180,7 @@ def add_employee():
         logger.error(f"Error adding employee: {str(e)}")
         return jsonify({'error': 'Failed to add employee'}), 500
 
-@app.route('/api/employees/<int:employee_id>/upload-photos', methods=['POST'])
+@bp.route('/api/employees/<int:employee_id>/upload-photos', methods=['POST'])
 def upload_employee_photos(employee_id):
     """Upload reference photos for an employee"""
     try:
@@ -213,7 +216,7 @@ def upload_employee_photos(employee_id):
         logger.error(f"Error uploading photos: {str(e)}")
         return jsonify({'error': 'Failed to upload photos'}), 500
 
-@app.route('/api/attendance')
+@bp.route('/api/attendance')
 def get_attendance():
     """Get attendance records with optional filtering"""
     try:
@@ -246,7 +249,7 @@ def get_attendance():
         logger.error(f"Error fetching attendance: {str(e)}")
         return jsonify({'error': 'Failed to fetch attendance records'}), 500
 
-@app.route('/api/attendance/export')
+@bp.route('/api/attendance/export')
 def export_attendance():
     """Export attendance records as CSV"""
     try:
@@ -301,17 +304,17 @@ def export_attendance():
         logger.error(f"Error exporting attendance: {str(e)}")
         return jsonify({'error': 'Failed to export attendance'}), 500
 
-@app.route('/api/recognition/start', methods=['POST'])
+@bp.route('/api/recognition/start', methods=['POST'])
 def start_recognition():
     """Start the face recognition system"""
     return jsonify({'message': 'Face recognition system is not available. Computer vision dependencies need to be installed.'}), 200
 
-@app.route('/api/recognition/stop', methods=['POST'])
+@bp.route('/api/recognition/stop', methods=['POST'])
 def stop_recognition():
     """Stop the face recognition system"""
     return jsonify({'message': 'Face recognition system is not running'}), 200
 
-@app.route('/api/recognition/status')
+@bp.route('/api/recognition/status')
 def recognition_status():
     """Get the status of the face recognition system"""
     return jsonify({
@@ -319,6 +322,23 @@ def recognition_status():
         'message': 'Face recognition system is not available. Install OpenCV and face_recognition to enable.'
     })
 
+@bp.app_template_filter('media_url')
+def media_url(image_path, size=None):
+    """Build the URL of an uploaded image for templates (thumbnails are served as originals)"""
+    if not image_path:
+        return ''
+    
+    upload_folder = os.path.abspath(app.config["UPLOAD_FOLDER"])
+    filename = os.path.relpath(os.path.abspath(image_path), upload_folder).replace(os.sep, '/')
+    return url_for('main.serve_media', filename=filename)
+
+@bp.route('/media/<path:filename>')
+def serve_media(filename):
+    """Serve uploaded images"""
+    return send_from_directory(os.path.abspath(app.config["UPLOAD_FOLDER"]), filename)
+
+app.register_blueprint(bp)
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Not found'}), 404
@@ -0,0 +1,201 @@
+import os
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v', '.webm')
+
+# Work units are sized so each takes a few seconds: long enough that the
+# per-unit overhead (opening the file, seeking) does not matter, short enough
+# that all processes stay busy until the end
+IMAGES_PER_UNIT = 32
+FRAMES_PER_UNIT = 300
+
+_pipeline = None  # FacePipeline of this worker process
+
+def video_units(path, frames_per_unit=FRAMES_PER_UNIT, every=1, start=None):
+    """Split a video into frame ranges that are decoded independently
+
+    ``start`` is when the first frame was recorded; by default the file's
+    modification time minus the video's duration.
+    """
+    import cv2
+
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            raise ValueError(f"Cannot open video {path}")
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+    finally:
+        capture.release()
+
+    if start is None:
+        duration = frame_count / fps if fps > 0 else 0.0
+        start = datetime.fromtimestamp(os.path.getmtime(path)) - timedelta(seconds=duration)
+
+    # Streams without a frame count are decoded by a single worker to the end
+    bounds = range(0, frame_count, frames_per_unit) if frame_count > 0 else [0]
+    return [
+        {
+            'kind': 'video',
+            'path': path,
+            'first': first,
+            'stop': min(first + frames_per_unit, frame_count) if frame_count > 0 else None,
+            'every': every,
+            'fps': fps,
+            'started_at': start.isoformat(),
+        }
+        for first in bounds
+    ]
+
+def discover_media(source, images_per_unit=IMAGES_PER_UNIT, frames_per_unit=FRAMES_PER_UNIT, every=1, start=None):
+    """Work units for a video file or a directory tree of images and videos"""
+    if os.path.isfile(source):
+        if source.lower().endswith(VIDEO_EXTENSIONS):
+            return video_units(source, frames_per_unit, every, start)
+        images, videos = [source], []
+    else:
+        images, videos = [], []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    images.append(path)
+                elif filename.lower().endswith(VIDEO_EXTENSIONS):
+                    videos.append(path)
+
+    units = [
+        {'kind': 'images', 'paths': images[i:i + images_per_unit]}
+        for i in range(0, len(images), images_per_unit)
+    ]
+    for path in videos:
+        units.extend(video_units(path, frames_per_unit, every, start))
+    return units
+
+def init_worker(settings, payload):
+    """Process pool initializer: build this worker's pipeline and gallery once"""
+    import cv2
+    from recognition import FacePipeline
+
+    global _pipeline
+    # One process per core already; OpenCV's own threads would only compete
+    cv2.setNumThreads(1)
+    _pipeline = FacePipeline(settings)
+    _pipeline.gallery = _pipeline.build_gallery(*payload)
+
+def match_faces(pipeline, frame, base):
+    """One record per face that passes the quality gate, with its nearest employee"""
+    gallery = pipeline.gallery
+    threshold = pipeline.settings.get('RECOGNITION_THRESHOLD', 0.6)
+    records = []
+    for location, encoding in pipeline.analyze_frame(frame):
+        index, distance = gallery.nearest(encoding, tolerance=threshold) if len(gallery) else (None, float('inf'))
+        employee_id = int(gallery.labels[index]) if distance <= threshold else None
+        records.append(dict(
+            base,
+            box=[int(value) for value in location],
+            employee_id=employee_id,
+            name=gallery.names.get(employee_id) if employee_id is not None else None,
+            distance=round(float(distance), 4) if index is not None else None,
+        ))
+    return records
+
+def recognize_unit(unit):
+    """Run the pipeline over one work unit; returns (records, frames processed)"""
+    import cv2
+
+    records = []
+    frames = 0
+    if unit['kind'] == 'images':
+        for path in unit['paths']:
+            frame = cv2.imread(path)
+            if frame is None:
+                logger.error(f"Error reading image {path}")
+                continue
+            frames += 1
+            captured_at = datetime.fromtimestamp(os.path.getmtime(path))
+            records.extend(match_faces(_pipeline, frame, {
+                'file': path, 'frame': None, 'timestamp': captured_at.isoformat()
+            }))
+        return records, frames
+
+    capture = cv2.VideoCapture(unit['path'])
+    try:
+        started_at = datetime.fromisoformat(unit['started_at'])
+        index = unit['first']
+        if index:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+        frame = None
+        while unit['stop'] is None or index < unit['stop']:
+            if index % unit['every']:
+                # Skipped frames are only demuxed, not decoded
+                if not capture.grab():
+                    break
+            else:
+                ret, frame = capture.read(frame)
+                if not ret:
+                    break
+                frames += 1
+                seconds = index / unit['fps'] if unit['fps'] > 0 else 0.0
+                records.extend(match_faces(_pipeline, frame, {
+                    'file': unit['path'],
+                    'frame': index,
+                    'seconds': round(seconds, 3),
+                    'timestamp': (started_at + timedelta(seconds=seconds)).isoformat(),
+                }))
+            index += 1
+    finally:
+        capture.release()
+    return records, frames
+
+def first_sightings(records):
+    """Earliest recognition of each employee on each day, as {(employee_id, date): record}"""
+    sightings = {}
+    for record in records:
+        if record['employee_id'] is None:
+            continue
+        timestamp = datetime.fromisoformat(record['timestamp'])
+        key = (record['employee_id'], timestamp.date())
+        if key not in sightings or timestamp < datetime.fromisoformat(sightings[key]['timestamp']):
+            sightings[key] = record
+    return sightings
+
+def backfill_attendance(db, sightings):
+    """Insert attendance for sightings on days the employee has none yet; returns the rows added
+
+    The live loop marks attendance once per employee per day, so a day that
+    already has a record is left alone.
+    """
+    from models import Attendance
+
+    if not sightings:
+        return 0
+
+    first_day = min(day for _, day in sightings)
+    last_day = max(day for _, day in sightings)
+    existing = {
+        (employee_id, timestamp.date())
+        for employee_id, timestamp in db.session.query(Attendance.employee_id, Attendance.timestamp).filter(
+            Attendance.employee_id.in_({employee_id for employee_id, _ in sightings}),
+            Attendance.timestamp >= first_day,
+            Attendance.timestamp < last_day + timedelta(days=1)
+        )
+    }
+
+    rows = [
+        Attendance(
+            employee_id=employee_id,
+            timestamp=datetime.fromisoformat(record['timestamp']),
+            image_path=None,
+            confidence=1 - record['distance']
+        )
+        for (employee_id, day), record in sorted(sightings.items())
+        if (employee_id, day) not in existing
+    ]
+    db.session.add_all(rows)
+    db.session.commit()
+    return len(rows)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Per-frame memory allocations of the detection preprocessing
+Runs camera capture, downscaling and BGR to RGB conversion for a stream of
+frames the way the recognition loop used to (new arrays every frame, and a
+[:, :, ::-1] view that dlib copies again) and the way it does now (preallocated
+buffers reused across frames). tracemalloc reports the memory allocated while
+handling each frame once the loop is in a steady state.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+from roi import detection_scale
+from utils import BufferPool, shrink_to_rgb
+
+FRAME_SIZES = ((640, 480), (1280, 720), (1920, 1080))
+
+def legacy_frame(source, scale, state):
+    """Original loop: a new frame from read(), resize, then a reversed view copied for dlib"""
+    frame = source.copy()
+    small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+    return np.ascontiguousarray(small_frame[:, :, ::-1])
+
+def allocating_frame(source, scale, state):
+    """resize and cvtColor allocating their outputs, as before buffers were pooled"""
+    frame = source.copy()
+    small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+    return cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+
+def pooled_frame(source, scale, state):
+    """Current loop: read into the previous frame's memory and shrink into pooled buffers"""
+    frame = state.get('frame')
+    if frame is None:
+        frame = state['frame'] = np.empty_like(source)
+    np.copyto(frame, source)
+    return shrink_to_rgb(frame, scale, state['pool'], 'frame')
+
+PIPELINES = {
+    'legacy': legacy_frame,
+    'allocating': allocating_frame,
+    'pooled': pooled_frame,
+}
+
+def measure_pipeline(pipeline, source, scale, frames, warmup=10):
+    """Bytes allocated per frame (tracemalloc peak above the steady state) and time per frame"""
+    state = {'pool': BufferPool()}
+    for _ in range(warmup):
+        pipeline(source, scale, state)
+
+    allocated = []
+    tracemalloc.start()
+    try:
+        for _ in range(frames):
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            pipeline(source, scale, state)
+            allocated.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        pipeline(source, scale, state)
+    elapsed = time.perf_counter() - start
+
+    allocated.sort()
+    return {
+        'allocated_kb_per_frame': allocated[len(allocated) // 2] / 1024,
+        'max_allocated_kb': allocated[-1] / 1024,
+        'ms_per_frame': elapsed * 1000 / frames,
+        'buffers_kb': state['pool'].nbytes() / 1024,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Steady-state allocations per frame, before and after buffer reuse')
+    parser.add_argument('--frames', type=int, default=200, help='Frames measured per pipeline')
+    parser.add_argument('--json', default=None, help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = {}
+    print(f"{'frame':<11} {'pipeline':<11} {'KB/frame':>9} {'max KB':>8} {'ms/frame':>9} {'pooled KB':>10}")
+    for width, height in FRAME_SIZES:
+        source = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+        scale = detection_scale(width, {'CAMERA_WIDTH': width})
+        for name, pipeline in PIPELINES.items():
+            row = measure_pipeline(pipeline, source, scale, args.frames)
+            results[f"{width}x{height}/{name}"] = row
+            print(f"{f'{width}x{height}':<11} {name:<11} {row['allocated_kb_per_frame']:>9.1f} {row['max_allocated_kb']:>8.1f} "
+                  f"{row['ms_per_frame']:>9.3f} {row['buffers_kb']:>10.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+if __name__ == '__main__':
+    main()
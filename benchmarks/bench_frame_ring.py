@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Compare frame transfer between processes: shared-memory ring vs multiprocessing.Queue
+Each simulated camera is a producer process writing frames at a fixed rate and
+a consumer process reading them. Reports delivered FPS, dropped frames,
+capture-to-consumer latency and CPU time per frame for 1 to 4 cameras.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import multiprocessing as mp
+import numpy as np
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_ring import FrameRing, RingReader
+
+TRANSPORTS = ('ring', 'queue')
+
+def produce(transport, target, fps, seconds, shape, start, results):
+    """Write frames at fps for the given duration"""
+    frames = [np.full(shape, i, dtype=np.uint8) for i in range(4)]
+    ring = FrameRing.attach(target) if transport == 'ring' else None
+    start.wait()
+
+    cpu_start = time.process_time()
+    sent = dropped = 0
+    interval = 1 / fps
+    next_due = time.monotonic()
+    deadline = next_due + seconds
+    while next_due < deadline:
+        now = time.monotonic()
+        if now < next_due:
+            time.sleep(next_due - now)
+        next_due += interval
+        frame = frames[sent % len(frames)]
+        if ring is not None:
+            ring.write(frame, time.time())
+        else:
+            try:
+                target.put_nowait((time.time(), frame))
+            except queue.Full:
+                dropped += 1
+                continue
+        sent += 1
+
+    if ring is None:
+        target.put(None)
+    else:
+        ring.close()
+    results.put(('producer', sent, dropped, time.process_time() - cpu_start))
+
+def consume(transport, source, seconds, start, results):
+    """Read frames until the producer stops, touching each like a detector would"""
+    ring = FrameRing.attach(source) if transport == 'ring' else None
+    reader = RingReader(ring) if ring is not None else None
+    start.wait()
+
+    cpu_start = time.process_time()
+    latencies = []
+    deadline = time.monotonic() + seconds + 1.0
+    while time.monotonic() < deadline:
+        if reader is not None:
+            frame = reader.read(timeout=0.1)
+            if frame is None:
+                continue
+            timestamp, image = frame.timestamp, frame.image
+        else:
+            try:
+                item = source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            timestamp, image = item
+        image[::16, ::16].sum()
+        latencies.append(time.time() - timestamp)
+
+    dropped = reader.dropped if reader is not None else 0
+    if ring is not None:
+        reader = frame = image = None
+        ring.close()
+    results.put(('consumer', latencies, dropped, time.process_time() - cpu_start))
+
+def run_transport(transport, cameras, fps, seconds, shape, slots):
+    """Run one producer/consumer pair per camera and aggregate their reports"""
+    start = mp.Event()
+    results = mp.Queue()
+    rings = []
+    processes = []
+
+    for _ in range(cameras):
+        if transport == 'ring':
+            ring = FrameRing.create(slots=slots, shape=shape)
+            rings.append(ring)
+            channel = ring.name
+        else:
+            channel = mp.Queue(maxsize=slots)
+        processes.append(mp.Process(target=produce, args=(transport, channel, fps, seconds, shape, start, results)))
+        processes.append(mp.Process(target=consume, args=(transport, channel, seconds, start, results)))
+
+    for process in processes:
+        process.start()
+    time.sleep(0.2)
+    start.set()
+
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    for ring in rings:
+        ring.close()
+        ring.unlink()
+
+    sent = sum(report[1] for report in reports if report[0] == 'producer')
+    latencies = [latency for report in reports if report[0] == 'consumer' for latency in report[1]]
+    dropped = sum(report[2] for report in reports)
+    cpu_seconds = sum(report[3] for report in reports)
+    received = len(latencies)
+
+    return {
+        'cameras': cameras,
+        'sent': sent,
+        'received': received,
+        'dropped': dropped,
+        'delivered_fps_per_camera': received / seconds / cameras,
+        'latency_p50_ms': float(np.percentile(latencies, 50)) * 1000 if latencies else None,
+        'latency_p95_ms': float(np.percentile(latencies, 95)) * 1000 if latencies else None,
+        'cpu_us_per_frame': cpu_seconds / received * 1e6 if received else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared-memory ring vs multiprocessing.Queue for frame transfer')
+    parser.add_argument('--cameras', type=int, nargs='+', default=[1, 2, 3, 4], help='Camera counts to simulate')
+    parser.add_argument('--fps', type=float, default=30.0, help='Frames per second per camera')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each run')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--slots', type=int, default=8, help='Ring slots / queue size per camera')
+    parser.add_argument('--only', nargs='+', choices=TRANSPORTS, default=list(TRANSPORTS))
+    parser.add_argument('--json', default=None, help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    shape = (args.height, args.width, 3)
+    print(f"{args.width}x{args.height} frames at {args.fps:g} FPS for {args.seconds:g}s, {os.cpu_count()} CPUs")
+    print("-" * 78)
+    print(f"{'transport':<10} {'cams':>4} {'fps/cam':>8} {'dropped':>8} {'p50 ms':>8} {'p95 ms':>8} {'cpu us/frame':>13}")
+
+    results = []
+    for cameras in args.cameras:
+        for transport in args.only:
+            result = run_transport(transport, cameras, args.fps, args.seconds, shape, args.slots)
+            result['transport'] = transport
+            results.append(result)
+            print(f"{transport:<10} {cameras:>4} {result['delivered_fps_per_camera']:>8.1f} {result['dropped']:>8} "
+                  f"{result['latency_p50_ms'] or 0:>8.2f} {result['latency_p95_ms'] or 0:>8.2f} "
+                  f"{result['cpu_us_per_frame'] or 0:>13.0f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'width': args.width, 'height': args.height, 'fps': args.fps, 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
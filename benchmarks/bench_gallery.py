@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Compare gallery storage modes for matching
+Builds synthetic galleries of employees with several embeddings each and
+reports, per EmbeddingStore mode, the memory footprint, match throughput and
+how often the decision differs from an exact float64 search over the legacy
+list-of-arrays gallery. Each mode is measured with an exhaustive scan and with
+the per-employee centroid prefilter (rows named mode+kN).
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_store import EmbeddingStore, STORE_MODES
+
+GALLERY_SIZES = (1000, 10000, 100000)
+PER_EMPLOYEE = 3
+PROBES = 200
+
+# Python object overhead of one float64 np.array in the legacy list gallery
+ARRAY_OVERHEAD = sys.getsizeof(np.zeros(0)) + 8
+
+def synthetic_gallery(embeddings, per_employee=PER_EMPLOYEE, probes=PROBES, seed=0):
+    """Employees as clusters of embeddings, plus probes of known people and strangers
+
+    Identities are spread like dlib embeddings (different people about 1.6
+    apart); photos of the same person vary by about 0.4.
+    """
+    rng = np.random.default_rng(seed)
+    employees = max(1, embeddings // per_employee)
+    centers = rng.normal(0, 0.1, size=(employees, 128))
+    labels = np.repeat(np.arange(employees), per_employee)
+    vectors = centers[labels] + rng.normal(0, 0.025, size=(len(labels), 128))
+
+    known = rng.integers(0, employees, size=probes // 2)
+    known_probes = centers[known] + rng.normal(0, 0.025, size=(len(known), 128))
+    strangers = rng.normal(0, 0.1, size=(probes - len(known), 128))
+    return vectors, labels, np.vstack([known_probes, strangers])
+
+def exact_matches(vectors, probes):
+    """(index, distance) of the nearest embedding per probe in float64"""
+    results = []
+    for probe in probes:
+        distances = np.linalg.norm(vectors - probe, axis=1)
+        index = int(np.argmin(distances))
+        results.append((index, float(distances[index])))
+    return results
+
+def evaluate(store, probes, reference, labels, tolerance):
+    """Throughput and agreement of a store with the exact reference"""
+    store.nearest(probes[0], tolerance)
+    start = time.perf_counter()
+    results = [store.nearest(probe, tolerance) for probe in probes]
+    elapsed = time.perf_counter() - start
+
+    same_person = sum(labels[index] == labels[ref_index] for (index, _), (ref_index, _) in zip(results, reference))
+    same_decision = sum(
+        (distance <= tolerance) == (ref_distance <= tolerance)
+        for (_, distance), (_, ref_distance) in zip(results, reference)
+    )
+    return {
+        'memory_mb': store.memory_bytes() / 2**20,
+        'disk_mb': store.disk_bytes() / 2**20,
+        'match_us': elapsed / len(probes) * 1e6,
+        'matches_per_second': len(probes) / elapsed,
+        'same_person': same_person / len(probes),
+        'same_decision': same_decision / len(probes),
+        'max_distance_error': max(abs(distance - ref_distance) for (_, distance), (_, ref_distance) in zip(results, reference)),
+    }
+
+def legacy_result(vectors, probes, reference):
+    """Footprint and speed of the old list of float64 arrays with face_distance-style matching"""
+    gallery = [row for row in vectors]
+    start = time.perf_counter()
+    for probe in probes:
+        np.argmin(np.linalg.norm(np.asarray(gallery) - probe, axis=1))
+    elapsed = time.perf_counter() - start
+    return {
+        'memory_mb': len(gallery) * (128 * 8 + ARRAY_OVERHEAD) / 2**20,
+        'disk_mb': 0.0,
+        'match_us': elapsed / len(probes) * 1e6,
+        'matches_per_second': len(probes) / elapsed,
+        'same_person': 1.0,
+        'same_decision': 1.0,
+        'max_distance_error': 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory, speed and accuracy of the gallery storage modes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(GALLERY_SIZES), help='Embeddings per gallery')
+    parser.add_argument('--modes', nargs='+', choices=STORE_MODES, default=list(STORE_MODES))
+    parser.add_argument('--rerank', type=int, default=32, help='Candidates re-ranked with exact distances')
+    parser.add_argument('--candidates', type=int, default=8, help='Employees searched after the centroid prefilter')
+    parser.add_argument('--probes', type=int, default=PROBES, help='Probes per gallery (half strangers)')
+    parser.add_argument('--tolerance', type=float, default=0.6, help='Recognition threshold for decisions')
+    parser.add_argument('--json', default=None, help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes:
+        vectors, labels, probes = synthetic_gallery(size, probes=args.probes)
+        reference = exact_matches(vectors, probes)
+
+        print(f"\n{len(vectors)} embeddings, {labels[-1] + 1} employees")
+        print(f"{'mode':<12} {'memory MB':>10} {'disk MB':>8} {'match us':>9} {'same person':>12} {'same decision':>14} {'max dist err':>13}")
+        rows = {'legacy': legacy_result(vectors, probes, reference)}
+        for mode in args.modes:
+            for candidates in (0, args.candidates):
+                store = EmbeddingStore.from_embeddings(vectors, labels, mode=mode, rerank=args.rerank, candidates=candidates)
+                name = f"{mode}+k{candidates}" if candidates else mode
+                rows[name] = evaluate(store, probes, reference, labels, args.tolerance)
+
+        for mode, row in rows.items():
+            print(f"{mode:<12} {row['memory_mb']:>10.2f} {row['disk_mb']:>8.2f} {row['match_us']:>9.0f} "
+                  f"{row['same_person']:>12.1%} {row['same_decision']:>14.1%} {row['max_distance_error']:>13.2e}")
+        results[str(size)] = rows
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the recognition hot paths
+Times matching against EmbeddingStore galleries of 100 to 100k embeddings per
+storage mode and candidate count, face detection
+across frame sizes, scales and models, encoding with different num_jitters and
+load_known_faces with different row counts. Results are written as JSON and can
+be compared with a previous run to flag regressions.
+"""
+
+import os
+import sys
+import time
+import json
+import argparse
+import platform
+import subprocess
+import tempfile
+import numpy as np
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+GALLERY_SIZES = (100, 1000, 10000, 100000)
+FRAME_SIZES = ((640, 480), (1280, 720), (1920, 1080))
+DETECTION_SCALES = (0.25, 0.5, 1.0)
+DETECTION_MODELS = ('hog', 'cnn')
+NUM_JITTERS = (1, 5, 10)
+ROW_COUNTS = (100, 1000, 10000)
+PER_EMPLOYEE = 3
+
+def measure(func, repeat=5, number=1):
+    """Run func repeat x number times after one warm-up call; times are per call in ms"""
+    func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) * 1000 / number)
+    times.sort()
+    return {
+        'median_ms': times[len(times) // 2],
+        'min_ms': times[0],
+        'max_ms': times[-1],
+        'runs': repeat * number,
+    }
+
+def synthetic_embeddings(count, seed=0):
+    """Random unit-scale vectors shaped like dlib's 128-d face embeddings"""
+    rng = np.random.default_rng(seed)
+    embeddings = rng.normal(0, 0.1, size=(count, 128))
+    return [row for row in embeddings]
+
+def synthetic_gallery(count, per_employee=PER_EMPLOYEE, seed=0):
+    """Embeddings and labels of employees with several photos each, clustered like dlib's"""
+    rng = np.random.default_rng(seed)
+    employees = max(1, count // per_employee)
+    centers = rng.normal(0, 0.1, size=(employees, 128))
+    labels = np.repeat(np.arange(employees) + 1, per_employee)[:count]
+    vectors = centers[labels - 1] + rng.normal(0, 0.025, size=(len(labels), 128))
+    return vectors, labels
+
+def synthetic_frame(width, height, faces=0, face_image=None, seed=0):
+    """Noise frame of the given size with optional copies of a face photo pasted in"""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+    if faces and face_image is not None:
+        import cv2
+        side = min(width // max(faces, 1), height) // 2
+        face = cv2.resize(face_image, (side, side))
+        for i in range(faces):
+            x = i * (width // faces) + side // 4
+            y = (height - side) // 2
+            frame[y:y + side, x:x + side] = face
+    return frame
+
+def match_face(gallery, face_encoding, tolerance=0.6):
+    """Same work process_frame does per face: the store's nearest() and the threshold decision"""
+    best_match_index, distance = gallery.nearest(face_encoding, tolerance=tolerance)
+    return distance <= tolerance, best_match_index
+
+def bench_matching(results, sizes, modes, candidates, repeat, rerank=32):
+    from embedding_store import EmbeddingStore
+
+    for size in sizes:
+        vectors, labels = synthetic_gallery(size)
+        # A new photo of a known employee, the common case at the door
+        probe = vectors[len(vectors) // 2] + np.random.default_rng(1).normal(0, 0.025, size=128)
+        number = max(1, 10000 // size)
+        for mode in modes:
+            for count in candidates:
+                gallery = EmbeddingStore.from_embeddings(vectors, labels, mode=mode, rerank=rerank, candidates=count)
+                key = f"match/gallery={size}/mode={mode}/candidates={count}"
+                results[key] = measure(lambda: match_face(gallery, probe), repeat, number)
+                print(f"  {key}: {results[key]['median_ms']:.3f} ms")
+
+def bench_detection(results, frame_sizes, scales, models, face_counts, face_image, repeat):
+    import cv2
+    import face_recognition
+    from roi import detection_scale
+
+    for width, height in frame_sizes:
+        # Also time the scale the recognition loop picks by default for this resolution
+        frame_scales = sorted(set(scales) | {detection_scale(width, {'CAMERA_WIDTH': width})})
+        for faces in face_counts:
+            frame = synthetic_frame(width, height, faces, face_image)
+            for scale in frame_scales:
+                small = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+                rgb_small = np.ascontiguousarray(small[:, :, ::-1])
+                for model in models:
+                    key = f"detect/{width}x{height}/faces={faces}/scale={scale}/model={model}"
+                    results[key] = measure(lambda: face_recognition.face_locations(rgb_small, model=model), repeat)
+                    print(f"  {key}: {results[key]['median_ms']:.1f} ms")
+
+def bench_encoding(results, jitters, face_image, repeat):
+    import face_recognition
+
+    if face_image is None:
+        face_image = synthetic_frame(150, 150)
+    rgb = np.ascontiguousarray(face_image[:, :, ::-1])
+    height, width = rgb.shape[:2]
+    location = [(0, width, height, 0)]
+    for num_jitters in jitters:
+        key = f"encode/num_jitters={num_jitters}"
+        results[key] = measure(
+            lambda: face_recognition.face_encodings(rgb, known_face_locations=location, num_jitters=num_jitters),
+            repeat
+        )
+        print(f"  {key}: {results[key]['median_ms']:.1f} ms")
+
+def bench_load_known_faces(results, row_counts, repeat):
+    from flask import Flask
+    from models import db, Employee
+    from recognition import FaceRecognitionSystem
+
+    with tempfile.TemporaryDirectory() as directory:
+        flask_app = Flask(__name__)
+        flask_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        db.init_app(flask_app)
+
+        with flask_app.app_context():
+            db.create_all()
+            system = None
+            inserted = 0
+            for rows in sorted(row_counts):
+                embeddings = synthetic_embeddings(rows - inserted, seed=rows)
+                db.session.add_all([
+                    Employee(
+                        name=f"Employee {inserted + i}",
+                        email=f"employee{inserted + i}@example.com",
+                        face_embeddings=json.dumps([embedding.tolist()])
+                    )
+                    for i, embedding in enumerate(embeddings)
+                ])
+                db.session.commit()
+                inserted = rows
+
+                if system is None:
+                    system = FaceRecognitionSystem(db, None, {})
+                key = f"load_known_faces/rows={rows}"
+                results[key] = measure(system.load_known_faces, repeat)
+                print(f"  {key}: {results[key]['median_ms']:.1f} ms")
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def compare_results(current, baseline, threshold):
+    """Return (key, baseline ms, current ms, ratio) for benchmarks slower than the threshold allows"""
+    regressions = []
+    for key, result in current.items():
+        previous = baseline.get(key)
+        if not previous or not previous.get('median_ms'):
+            continue
+        ratio = result['median_ms'] / previous['median_ms']
+        if ratio > 1 + threshold:
+            regressions.append((key, previous['median_ms'], result['median_ms'], ratio))
+    return regressions
+
+def main():
+    from config import Config
+    from embedding_store import STORE_MODES
+
+    config = Config()
+    parser = argparse.ArgumentParser(description='Micro-benchmarks for matching, detection, encoding and gallery loading')
+    parser.add_argument('--only', nargs='+', choices=['match', 'detect', 'encode', 'load'],
+                        default=['match', 'detect', 'encode', 'load'], help='Benchmark groups to run')
+    parser.add_argument('--quick', action='store_true', help='Smaller sizes and fewer repeats for a fast check')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed repetitions per benchmark')
+    parser.add_argument('--store-modes', nargs='+', choices=STORE_MODES, default=[config.get('GALLERY_STORE_MODE', 'float32')],
+                        help='Gallery storage modes to match against (default: GALLERY_STORE_MODE)')
+    parser.add_argument('--candidates', type=int, nargs='+', default=[config.get('GALLERY_CANDIDATES', 8)],
+                        help='Centroid prefilter candidates, 0 compares every embedding (default: GALLERY_CANDIDATES)')
+    parser.add_argument('--face-image', default=None, help='Photo of a face pasted into generated frames')
+    parser.add_argument('--faces', type=int, nargs='+', default=[0, 1, 4], help='Faces per generated frame')
+    parser.add_argument('--cnn', action='store_true', help='Include the CNN detector (slow without a GPU)')
+    parser.add_argument('--json', default=None, help='Write results to this JSON file')
+    parser.add_argument('--compare', default=None, help='Baseline JSON from a previous run')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Allowed slowdown before flagging (0.15 = 15%%)')
+    args = parser.parse_args()
+
+    repeat = 3 if args.quick else args.repeat
+    face_image = None
+    if args.face_image:
+        import cv2
+        face_image = cv2.imread(args.face_image)
+        if face_image is None:
+            parser.error(f"Cannot read {args.face_image}")
+    if args.faces != [0] and face_image is None:
+        # Faces can only be placed in frames when a face photo is given
+        args.faces = [0]
+
+    results = {}
+    groups = {
+        'match': lambda: bench_matching(
+            results, GALLERY_SIZES[:3] if args.quick else GALLERY_SIZES, args.store_modes, args.candidates,
+            repeat, config.get('GALLERY_RERANK', 32)
+        ),
+        'detect': lambda: bench_detection(
+            results, FRAME_SIZES[:1] if args.quick else FRAME_SIZES, DETECTION_SCALES,
+            DETECTION_MODELS if args.cnn else DETECTION_MODELS[:1], args.faces, face_image, repeat
+        ),
+        'encode': lambda: bench_encoding(results, NUM_JITTERS[:2] if args.quick else NUM_JITTERS, face_image, repeat),
+        'load': lambda: bench_load_known_faces(results, ROW_COUNTS[:2] if args.quick else ROW_COUNTS, repeat),
+    }
+    skipped = {}
+    for name in args.only:
+        print(f"\n{name}")
+        try:
+            groups[name]()
+        except ImportError as e:
+            skipped[name] = str(e)
+            print(f"  ✗ skipped: {e}")
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'quick': args.quick,
+            'skipped': skipped,
+        },
+        'results': results,
+    }
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline.get('results', {}), args.threshold)
+        print(f"\nCompared with {args.compare} (commit {baseline.get('meta', {}).get('commit')})")
+        print("-" * 60)
+        if not regressions:
+            print(f"✓ No regressions above {args.threshold:.0%}")
+            return
+        for key, before, after, ratio in regressions:
+            print(f"✗ {key}: {before:.3f} -> {after:.3f} ms ({ratio:.2f}x)")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Measure cold-start cost of the CLI and the web app
+Runs each entry point in a fresh interpreter with ``python -X importtime``,
+reports the total import time, the heaviest modules and the wall time of
+common commands, and optionally compares with a previous run.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry points whose imports we track
+IMPORT_TARGETS = {
+    'cli': 'import cli',
+    'app_module': 'import app',
+    'app_factory': 'from app import create_app; create_app()',
+    'models': 'import models',
+}
+
+# Commands timed end to end
+COMMANDS = {
+    'cli_help': [sys.executable, 'cli.py', '--help'],
+    'cli_list': [sys.executable, 'cli.py', 'list'],
+}
+
+def parse_importtime(stderr):
+    """Return {module: (self_us, cumulative_us, depth)} from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = int(parts[0]), int(parts[1]), parts[2]
+        # Nesting is shown by indentation; only the top-level entries sum to the total
+        depth = (len(name) - len(name.lstrip(' '))) // 2
+        modules[name.strip()] = (self_us, cumulative_us, depth)
+    return modules
+
+def package_costs(modules):
+    """Total self time per top-level package in ms, heaviest first"""
+    costs = {}
+    for module, (self_us, _, _) in modules.items():
+        package = module.split('.')[0]
+        costs[package] = costs.get(package, 0) + self_us / 1000
+    return sorted(costs.items(), key=lambda item: item[1], reverse=True)
+
+def measure_imports(statement, runs):
+    """Median total import time (ms) and the module breakdown of the median run"""
+    results = []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', statement],
+            cwd=ROOT, capture_output=True, text=True
+        )
+        modules = parse_importtime(proc.stderr)
+        total_us = sum(cumulative for _, cumulative, depth in modules.values() if depth == 0)
+        results.append((total_us, modules))
+    results.sort(key=lambda item: item[0])
+    return results[len(results) // 2]
+
+def measure_command(command, runs):
+    """Median wall time of a command in ms"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, capture_output=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure CLI and web app import/startup time')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per measurement')
+    parser.add_argument('--top', type=int, default=10, help='Heaviest packages to list per target')
+    parser.add_argument('--json', default=None, help='Write results to this JSON file')
+    parser.add_argument('--compare', default=None, help='Baseline JSON from a previous run')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed slowdown before flagging (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    results = {'imports': {}, 'commands': {}}
+
+    for name, statement in IMPORT_TARGETS.items():
+        total_us, modules = measure_imports(statement, args.runs)
+        top = [{'package': package, 'ms': ms} for package, ms in package_costs(modules)[:args.top]]
+        results['imports'][name] = {'total_ms': total_us / 1000, 'modules': len(modules), 'top': top}
+
+        print(f"\n{name}: {total_us / 1000:.0f} ms importing {len(modules)} modules ({statement})")
+        for entry in top:
+            print(f"  {entry['package']:<24} {entry['ms']:8.1f} ms")
+
+    print()
+    for name, command in COMMANDS.items():
+        results['commands'][name] = {'wall_ms': measure_command(command, args.runs)}
+        print(f"{name:<12} {results['commands'][name]['wall_ms']:.0f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        current = {f"import/{k}": v['total_ms'] for k, v in results['imports'].items()}
+        current.update({f"command/{k}": v['wall_ms'] for k, v in results['commands'].items()})
+        previous = {f"import/{k}": v['total_ms'] for k, v in baseline.get('imports', {}).items()}
+        previous.update({f"command/{k}": v['wall_ms'] for k, v in baseline.get('commands', {}).items()})
+
+        print(f"\nCompared with {args.compare}")
+        print("-" * 60)
+        regressions = 0
+        for key, value in current.items():
+            if not previous.get(key):
+                continue
+            ratio = value / previous[key]
+            marker = '✗' if ratio > 1 + args.threshold else '✓'
+            regressions += marker == '✗'
+            print(f"{marker} {key:<24} {previous[key]:8.0f} -> {value:8.0f} ms ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Compare full-resolution enrollment encoding with the preprocessed pipeline
+Reports per-photo timing, the distance between both embeddings of each photo
+and genuine/impostor match accuracy for a folder of labelled photos
+"""
+
+import os
+import sys
+import time
+import argparse
+import json
+import numpy as np
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import face_recognition
+from enrollment import enrollment_settings, load_oriented_image, preprocess_photo
+from cli import discover_import_tasks
+from config import Config
+
+def encode_full_resolution(photo_path):
+    """Baseline: detect and encode on the full-resolution photo"""
+    image = load_oriented_image(photo_path)
+    encodings = face_recognition.face_encodings(image)
+    if not encodings:
+        raise ValueError(f"No face found in photo {photo_path}")
+    return np.array(encodings[0])
+
+def match_accuracy(embeddings, labels, threshold):
+    """Fraction of photo pairs whose match decision agrees with their labels"""
+    embeddings = np.asarray(embeddings)
+    labels = np.asarray(labels)
+    distances = np.linalg.norm(embeddings[:, None, :] - embeddings[None, :, :], axis=2)
+    same = labels[:, None] == labels[None, :]
+    upper = np.triu_indices(len(labels), k=1)
+    correct = (distances[upper] <= threshold) == same[upper]
+    return float(correct.mean()) if correct.size else 1.0
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare enrollment preprocessing against full-resolution encoding')
+    parser.add_argument('source', help='Directory with one folder per person, or a manifest CSV (name,email,folder)')
+    parser.add_argument('--max-dimension', type=int, default=None, help='Override ENROLLMENT_MAX_DIMENSION')
+    parser.add_argument('--threshold', type=float, default=0.6, help='Match threshold used for accuracy')
+    parser.add_argument('--json', default=None, help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    settings = enrollment_settings(Config())
+    if args.max_dimension:
+        settings['max_dimension'] = args.max_dimension
+
+    baseline, processed, labels, drift = [], [], [], []
+    baseline_times, processed_times = [], []
+    stage_totals = {}
+    failures = 0
+
+    for task in discover_import_tasks(args.source):
+        for photo_path in task['photo_paths']:
+            try:
+                start = time.perf_counter()
+                full = encode_full_resolution(photo_path)
+                baseline_times.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                result = preprocess_photo(photo_path, settings)
+                processed_times.append(time.perf_counter() - start)
+            except ValueError as e:
+                print(f"  ✗ {e}")
+                failures += 1
+                continue
+
+            small = np.array(result['embedding'])
+            baseline.append(full)
+            processed.append(small)
+            labels.append(task['email'])
+            drift.append(float(np.linalg.norm(full - small)))
+            for stage, ms in result['timings'].items():
+                stage_totals[stage] = stage_totals.get(stage, 0.0) + ms
+
+    if not baseline:
+        print("No photos could be encoded")
+        return
+
+    count = len(baseline)
+    results = {
+        'photos': count,
+        'failures': failures,
+        'settings': settings,
+        'baseline_ms_per_photo': 1000 * float(np.mean(baseline_times)),
+        'preprocessed_ms_per_photo': 1000 * float(np.mean(processed_times)),
+        'speedup': float(np.mean(baseline_times) / np.mean(processed_times)),
+        'stage_ms_per_photo': {stage: total / count for stage, total in stage_totals.items()},
+        'embedding_drift_mean': float(np.mean(drift)),
+        'embedding_drift_max': float(np.max(drift)),
+        'baseline_accuracy': match_accuracy(baseline, labels, args.threshold),
+        'preprocessed_accuracy': match_accuracy(processed, labels, args.threshold),
+    }
+
+    print(f"\nEnrollment comparison over {count} photos ({failures} failed)")
+    print("-" * 60)
+    print(f"Full resolution:  {results['baseline_ms_per_photo']:.1f} ms/photo")
+    print(f"Preprocessed:     {results['preprocessed_ms_per_photo']:.1f} ms/photo ({results['speedup']:.1f}x faster)")
+    for stage, ms in results['stage_ms_per_photo'].items():
+        print(f"  {stage:<8} {ms:.1f} ms")
+    print(f"Embedding drift:  mean {results['embedding_drift_mean']:.4f}, max {results['embedding_drift_max']:.4f}")
+    print(f"Match accuracy:   {results['baseline_accuracy']:.4f} -> {results['preprocessed_accuracy']:.4f} "
+          f"at threshold {args.threshold}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
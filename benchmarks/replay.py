@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+End-to-end replay benchmark for the recognition loop
+Seeds a scratch database with synthetic employees (plus real ones enrolled from
+photos), replays a video file or an image sequence through
+FaceRecognitionSystem with a stand-in camera and reports sustained FPS,
+capture-to-commit latency, DB write rate and peak RSS. Runs headless.
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import resource
+import tempfile
+import numpy as np
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+from flask import Flask
+from sqlalchemy import event
+from models import db, Employee, Attendance, UnknownFace
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+class FakeCamera:
+    """Stand-in for cv2.VideoCapture that replays a video file or a folder of images
+
+    Frames are delivered at ``fps`` (0 replays as fast as the loop reads) and the
+    sequence can be looped to simulate a longer shift. ``last_read_at`` holds the
+    perf_counter time the most recent frame was handed out.
+    """
+
+    def __init__(self, source, fps=30.0, loops=1, width=None, height=None):
+        self.source = source
+        self.fps = fps
+        self.loops = loops
+        self.size = (width, height) if width and height else None
+        self.frames_read = 0
+        self.last_read_at = None
+        self._opened = True
+        self._next_due = None
+        self._frames = self._iter_frames()
+
+    def _iter_sequence(self):
+        if os.path.isdir(self.source):
+            paths = sorted(
+                path for path in glob.glob(os.path.join(self.source, '*'))
+                if path.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            for path in paths:
+                frame = cv2.imread(path)
+                if frame is not None:
+                    yield frame
+        else:
+            capture = cv2.VideoCapture(self.source)
+            try:
+                while True:
+                    ret, frame = capture.read()
+                    if not ret:
+                        break
+                    yield frame
+            finally:
+                capture.release()
+
+    def _iter_frames(self):
+        for _ in range(self.loops):
+            for frame in self._iter_sequence():
+                if self.size:
+                    frame = cv2.resize(frame, self.size)
+                yield frame
+
+    def isOpened(self):
+        return self._opened
+
+    def set(self, prop, value):
+        return True
+
+    def read(self):
+        if not self._opened:
+            return False, None
+
+        # Pace delivery like a real camera
+        if self.fps:
+            now = time.perf_counter()
+            if self._next_due is not None and now < self._next_due:
+                time.sleep(self._next_due - now)
+            self._next_due = max(now, self._next_due or now) + 1 / self.fps
+
+        frame = next(self._frames, None)
+        if frame is None:
+            return False, None
+
+        self.frames_read += 1
+        self.last_read_at = time.perf_counter()
+        return True, frame
+
+    def release(self):
+        self._opened = False
+
+class NullNotifier:
+    """Notification service that only counts alerts"""
+
+    def __init__(self):
+        self.alerts = 0
+
+    def send_unknown_face_alert(self, image_path):
+        self.alerts += 1
+        return True
+
+class CommitRecorder:
+    """Measure time from frame capture to the commit of each attendance/unknown row"""
+
+    def __init__(self, system):
+        self.system = system
+        self.pending = 0
+        self.latencies = []
+        self.commit_times = []
+        self.attendance_rows = 0
+        self.unknown_rows = 0
+
+    def install(self, session):
+        event.listen(Attendance, 'after_insert', self._attendance_inserted)
+        event.listen(UnknownFace, 'after_insert', self._unknown_inserted)
+        event.listen(session, 'after_commit', self._committed)
+
+    def _attendance_inserted(self, mapper, connection, target):
+        self.pending += 1
+        self.attendance_rows += 1
+
+    def _unknown_inserted(self, mapper, connection, target):
+        self.pending += 1
+        self.unknown_rows += 1
+
+    def _committed(self, session):
+        if not self.pending:
+            return
+        now = time.monotonic()
+        # The loop handles one frame at a time, so the row belongs to the frame being handled
+        frame = self.system.current_frame
+        if frame is not None:
+            self.latencies.extend([now - frame.timestamp] * self.pending)
+        self.commit_times.extend([now] * self.pending)
+        self.pending = 0
+
+def synthetic_employees(count, offset=0, seed=0):
+    """Employees with random 128-d embeddings that act as gallery distractors"""
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        yield Employee(
+            name=f"Synthetic {offset + i}",
+            email=f"synthetic{offset + i}@example.com",
+            face_embeddings=json.dumps(rng.normal(0, 0.1, size=(1, 128)).tolist())
+        )
+
+def enroll_from_photos(source, settings):
+    """Employees enrolled from real photos (one folder per email, as for cli.py import)"""
+    from cli import discover_import_tasks
+    from enrollment import encode_photo
+
+    employees = []
+    for task in discover_import_tasks(source):
+        embeddings = []
+        for photo_path in task['photo_paths']:
+            try:
+                embeddings.append(list(encode_photo(photo_path, settings)))
+            except ValueError as e:
+                print(f"  ✗ {e}")
+        if embeddings:
+            employees.append(Employee(name=task['name'], email=task['email'], face_embeddings=json.dumps(embeddings)))
+    return employees
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else None
+
+def stage_summary():
+    """Mean latency per pipeline stage from the metrics registry, in ms"""
+    from metrics import STAGES
+
+    summary = {}
+    for stage, child in STAGES.items():
+        count = sum(child.counts)
+        if count:
+            summary[stage] = {'count': count, 'mean_ms': 1000 * child.sum / count}
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a video or image sequence through the recognition loop')
+    parser.add_argument('source', help='Video file or directory of frames')
+    parser.add_argument('--employees', type=int, default=1000, help='Synthetic employees to seed')
+    parser.add_argument('--enroll', default=None, help='Photos of the people in the replay (cli.py import layout)')
+    parser.add_argument('--fps', type=float, default=30.0, help='Camera frame rate (0 = as fast as possible)')
+    parser.add_argument('--loops', type=int, default=1, help='Replay the source this many times')
+    parser.add_argument('--width', type=int, default=None, help='Resize frames to this width')
+    parser.add_argument('--height', type=int, default=None, help='Resize frames to this height')
+    parser.add_argument('--database', default=None, help='SQLite file to use instead of a scratch database')
+    parser.add_argument('--json', default=None, help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    from config import Config
+    from enrollment import enrollment_settings
+    from recognition import FaceRecognitionSystem
+
+    rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database = args.database or os.path.join(workdir, 'replay.db')
+        flask_app = Flask(__name__)
+        flask_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.abspath(database)}"
+        db.init_app(flask_app)
+
+        config = Config()
+        config.update({
+            'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+            'DIAGNOSTICS_FOLDER': os.path.join(workdir, 'diagnostics'),
+            # An unpaced replay hands every frame to the loop; a grabber would drop most of them
+            'CAMERA_GRABBER': args.fps > 0,
+        })
+
+        with flask_app.app_context():
+            db.create_all()
+
+            print(f"Seeding {args.employees} synthetic employees...")
+            start = time.perf_counter()
+            db.session.add_all(synthetic_employees(args.employees))
+            if args.enroll:
+                enrolled = enroll_from_photos(args.enroll, enrollment_settings(config))
+                db.session.add_all(enrolled)
+                print(f"Enrolled {len(enrolled)} employees from {args.enroll}")
+            db.session.commit()
+            seed_seconds = time.perf_counter() - start
+
+            camera = FakeCamera(args.source, fps=args.fps, loops=args.loops, width=args.width, height=args.height)
+            notifier = NullNotifier()
+            system = FaceRecognitionSystem(db, notifier, config, camera=camera)
+            gallery_size = len(system.gallery)
+            recorder = CommitRecorder(system)
+            recorder.install(db.session)
+
+            print(f"Replaying {args.source} against a gallery of {gallery_size} embeddings...")
+            start = time.perf_counter()
+            system.run()
+            elapsed = time.perf_counter() - start
+
+    from metrics import FRAMES_PROCESSED, FRAMES_DROPPED, FRAME_AGE
+    processed = int(FRAMES_PROCESSED.value)
+    frame_age = FRAME_AGE.labels()
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    writes = recorder.attendance_rows + recorder.unknown_rows
+    write_span = (recorder.commit_times[-1] - recorder.commit_times[0]) if len(recorder.commit_times) > 1 else 0
+
+    results = {
+        'source': args.source,
+        'gallery_size': gallery_size,
+        'seed_seconds': seed_seconds,
+        'elapsed_seconds': elapsed,
+        'frames_read': camera.frames_read,
+        'frames_processed': processed,
+        'frames_dropped': int(FRAMES_DROPPED.value),
+        'frame_age_mean_ms': 1000 * frame_age.sum / processed if processed else None,
+        'read_fps': camera.frames_read / elapsed if elapsed else 0.0,
+        'processed_fps': processed / elapsed if elapsed else 0.0,
+        'attendance_rows': recorder.attendance_rows,
+        'unknown_rows': recorder.unknown_rows,
+        'notifications': notifier.alerts,
+        'db_writes_per_second': writes / elapsed if elapsed else 0.0,
+        'db_writes_per_second_during_burst': (writes - 1) / write_span if write_span else None,
+        'latency_p50_ms': percentile(recorder.latencies, 50),
+        'latency_p95_ms': percentile(recorder.latencies, 95),
+        'latency_max_ms': percentile(recorder.latencies, 100),
+        # ru_maxrss is reported in kilobytes on Linux
+        'rss_start_mb': rss_start / 1024,
+        'rss_peak_mb': rss_peak / 1024,
+        'stages': stage_summary(),
+    }
+
+    print(f"\nReplay of {results['frames_read']} frames in {elapsed:.1f}s")
+    print("-" * 60)
+    print(f"Read FPS:          {results['read_fps']:.1f}")
+    print(f"Processed FPS:     {results['processed_fps']:.1f}")
+    if processed:
+        print(f"Frame age:         {results['frame_age_mean_ms']:.1f} ms mean, {results['frames_dropped']} frames dropped")
+    print(f"Attendance rows:   {results['attendance_rows']}  Unknown rows: {results['unknown_rows']}")
+    print(f"DB writes/s:       {results['db_writes_per_second']:.2f}")
+    if recorder.latencies:
+        print(f"Capture->commit:   p50 {results['latency_p50_ms']:.1f} ms, p95 {results['latency_p95_ms']:.1f} ms, "
+              f"max {results['latency_max_ms']:.1f} ms")
+    print(f"Peak RSS:          {results['rss_peak_mb']:.0f} MB (start {results['rss_start_mb']:.0f} MB)")
+    for stage, summary in results['stages'].items():
+        print(f"  {stage:<12} {summary['mean_ms']:8.2f} ms x {summary['count']}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -7,29 +7,38 @@ Allows adding employees and managing the system from command line
 import os
 import sys
 import argparse
+import csv
 import json
-import cv2
-import numpy as np
+import time
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sqlalchemy.exc import IntegrityError
 
 # Add the parent directory to the path to import our modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import app
-from models import db, Employee, Attendance
+from models import db, Employee, Attendance, create_db_app
+from config import Config
 
-# Try to import face recognition modules
-try:
-    import face_recognition
-    from PIL import Image
-    FACE_RECOGNITION_AVAILABLE = True
-except ImportError:
-    FACE_RECOGNITION_AVAILABLE = False
+# Only check that the face recognition modules exist; commands that need them
+# import them on first use so database-only commands start quickly
+FACE_RECOGNITION_AVAILABLE = all(importlib.util.find_spec(module) for module in ('cv2', 'face_recognition'))
+if not FACE_RECOGNITION_AVAILABLE:
     print("Warning: Face recognition modules not available. Some features will be limited.")
 
-def add_employee(name, email, photo_paths):
+_app = None
+
+def get_app():
+    """Return the database-only Flask app used by all commands"""
+    global _app
+    if _app is None:
+        _app = create_db_app(__name__)
+    return _app
+
+def add_employee(name, email, photo_paths, allow_conflicts=False):
     """Add a new employee with face recognition data"""
     try:
-        with app.app_context():
+        with get_app().app_context():
             # Check if employee already exists
             existing = Employee.query.filter_by(email=email).first()
             if existing:
@@ -48,8 +57,17 @@ def add_employee(name, email, photo_paths):
                 print(f"✓ Employee {name} added successfully (without face recognition)")
                 return True
             
+            import cv2
+            from enrollment import enrollment_settings, process_photo, load_oriented_image
+            from enrollment import conflict_settings, find_identity_conflicts
+            from embedding_cache import open_embedding_cache
+            
             # Process photos and generate embeddings
+            config = Config()
+            settings = enrollment_settings(config)
+            cache = open_embedding_cache(config)
             embeddings = []
+            images = []
             saved_files = []
             
             print(f"Processing {len(photo_paths)} photos for {name}...")
@@ -61,36 +79,48 @@ def add_employee(name, email, photo_paths):
                 
                 # Load and process image
                 try:
-                    image = face_recognition.load_image_file(photo_path)
-                    face_encodings = face_recognition.face_encodings(image)
-                    
-                    if not face_encodings:
-                        print(f"Error: No face found in photo {photo_path}")
-                        return False
-                    
-                    if len(face_encodings) > 1:
-                        print(f"Warning: Multiple faces found in photo {photo_path}, using the first one")
-                    
-                    embeddings.append(face_encodings[0].tolist())
-                    
-                    # Save photo to uploads directory
-                    uploads_dir = os.path.join("uploads", "employees")
-                    os.makedirs(uploads_dir, exist_ok=True)
-                    
-                    filename = f"{name.replace(' ', '_')}_{i+1}.jpg"
-                    save_path = os.path.join(uploads_dir, filename)
+                    result = process_photo(photo_path, settings, cache)
+                    image = result['image'] if result['image'] is not None else load_oriented_image(photo_path)
+                    embeddings.append(result['embedding'])
+                    images.append(image)
                     
-                    # Convert and save image
-                    cv2_image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-                    cv2.imwrite(save_path, cv2_image)
-                    saved_files.append(save_path)
-                    
-                    print(f"  ✓ Processed photo {i+1}: {os.path.basename(photo_path)}")
+                    timings = result['timings']
+                    if result['cached']:
+                        print(f"  ✓ Processed photo {i+1}: {os.path.basename(photo_path)} (cached)")
+                    else:
+                        print(f"  ✓ Processed photo {i+1}: {os.path.basename(photo_path)} "
+                              f"(load {timings['load']:.0f}ms, detect {timings['detect']:.0f}ms, "
+                              f"encode {timings['encode']:.0f}ms, total {timings['total']:.0f}ms)")
                     
                 except Exception as e:
                     print(f"Error processing photo {photo_path}: {str(e)}")
                     return False
             
+            # Refuse faces that are already enrolled under someone else, before
+            # anything is written
+            conflicts = find_identity_conflicts(db, embeddings, conflict_settings(config))
+            for conflict in conflicts:
+                print(f"  ! Photo {conflict['photo']} is {conflict['distance']:.2f} from employee "
+                      f"{conflict['employee_id']} ({conflict['name']})")
+            if conflicts:
+                if config.get('ENROLLMENT_CONFLICT_ACTION', 'reject') == 'reject' and not allow_conflicts:
+                    print(f"Error: {name} looks like an enrolled employee. Check for a duplicate, "
+                          f"or use --allow-conflicts to add anyway")
+                    return False
+                print(f"Warning: {name} looks like an enrolled employee, adding anyway")
+            
+            # Save photos to uploads directory
+            uploads_dir = os.path.join("uploads", "employees")
+            os.makedirs(uploads_dir, exist_ok=True)
+            for i, image in enumerate(images):
+                filename = f"{name.replace(' ', '_')}_{i+1}.jpg"
+                save_path = os.path.join(uploads_dir, filename)
+                
+                # Convert and save image
+                cv2_image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+                cv2.imwrite(save_path, cv2_image)
+                saved_files.append(save_path)
+            
             # Create employee record
             employee = Employee(
                 name=name,
@@ -103,6 +133,8 @@ def add_employee(name, email, photo_paths):
             db.session.commit()
             
             print(f"✓ Employee {name} added successfully with {len(embeddings)} face encodings")
+            if cache:
+                print_cache_stats(cache)
             return True
             
     except Exception as e:
@@ -112,7 +144,7 @@ def add_employee(name, email, photo_paths):
 def list_employees():
     """List all employees"""
     try:
-        with app.app_context():
+        with get_app().app_context():
             employees = Employee.query.all()
             
             if not employees:
@@ -133,7 +165,7 @@ def list_employees():
 def delete_employee(employee_id):
     """Delete an employee"""
     try:
-        with app.app_context():
+        with get_app().app_context():
             employee = Employee.query.get(employee_id)
             if not employee:
                 print(f"Error: Employee with ID {employee_id} not found")
@@ -160,7 +192,7 @@ def delete_employee(employee_id):
 def show_attendance_summary():
     """Show attendance summary"""
     try:
-        with app.app_context():
+        with get_app().app_context():
             from datetime import datetime, timedelta
             
             today = datetime.now().date()
@@ -197,6 +229,476 @@ def show_attendance_summary():
     except Exception as e:
         print(f"Error showing attendance summary: {str(e)}")
 
+def print_cache_stats(cache, lifetime=False, since=None):
+    """Print embedding cache hit rate
+
+    ``since`` is an earlier ``cache.stats()`` snapshot; lookups made by worker
+    processes are only visible through the persisted totals.
+    """
+    stats = cache.stats()
+    if since is not None:
+        hits = stats['total_hits'] - since['total_hits']
+        misses = stats['total_misses'] - since['total_misses']
+        lookups = hits + misses
+        print(f"Embedding cache hit rate: {hits / lookups if lookups else 0.0:.1%} "
+              f"({hits} hits, {misses} misses)")
+    elif lifetime:
+        print(f"Embedding cache: {stats['entries']}/{stats['max_entries']} entries, "
+              f"lifetime hit rate {stats['total_hit_rate']:.1%} "
+              f"({stats['total_hits']} hits, {stats['total_misses']} misses)")
+    else:
+        print(f"Embedding cache hit rate: {stats['hit_rate']:.1%} "
+              f"({stats['hits']} hits, {stats['misses']} misses)")
+
+def manage_embedding_cache(clear=False):
+    """Show or clear the shared embedding cache"""
+    from embedding_cache import open_embedding_cache
+    
+    cache = open_embedding_cache(Config())
+    if cache is None:
+        print("Embedding cache is disabled (EMBEDDING_CACHE_PATH is empty)")
+        return
+    
+    if clear:
+        cache.clear()
+        print("✓ Embedding cache cleared")
+        return
+    
+    print_cache_stats(cache, lifetime=True)
+
+def apply_retention(days=None, attendance_days=None, dry_run=False):
+    """Delete expired capture images and rows, or report what would be deleted"""
+    from retention import create_retention_engine
+    
+    try:
+        config = Config()
+        if days is not None:
+            config.set('IMAGE_RETENTION_DAYS', days)
+        if attendance_days is not None:
+            config.set('ATTENDANCE_RETENTION_DAYS', attendance_days)
+        
+        engine = create_retention_engine(get_app(), db, config)
+        report = engine.run_exclusive(dry_run)
+        if report is None:
+            print("Retention is already running in another process")
+            return False
+        
+        print(f"\nRetention {'dry run' if dry_run else 'report'}")
+        print("-" * 60)
+        print(f"{'Date':<15} {'Files':<10} {'MB':<10}")
+        print("-" * 60)
+        for partition, stats in sorted(report['partitions'].items()):
+            print(f"{partition:<15} {stats['files']:<10} {stats['bytes'] / (1024 * 1024):<10.1f}")
+        
+        action = "Would delete" if dry_run else "Deleted"
+        print(f"\n{action} {report['files']} files ({report['bytes'] / (1024 * 1024):.1f} MB)")
+        print(f"Attendance images cleared: {report['attendance_images_cleared']}")
+        print(f"Unknown faces removed: {report['unknown_faces_deleted']}")
+        print(f"Attendance rows removed: {report['attendance_rows_deleted']}")
+        return True
+        
+    except Exception as e:
+        print(f"Error applying retention: {str(e)}")
+        return False
+
+def migrate_storage(batch_size=500, dry_run=False):
+    """Move flat-layout captures into the date-sharded layout"""
+    from storage import CaptureStorage
+    
+    try:
+        with get_app().app_context():
+            storage = CaptureStorage(get_app().config["UPLOAD_FOLDER"])
+            moved = storage.migrate_legacy_files(db, batch_size=batch_size, dry_run=dry_run)
+        
+        if dry_run:
+            print(f"Would migrate {moved} captures to {storage.root}/YYYY/MM/DD/HH")
+        else:
+            print(f"✓ Migrated {moved} captures to {storage.root}/YYYY/MM/DD/HH")
+        return True
+        
+    except Exception as e:
+        print(f"Error migrating storage: {str(e)}")
+        return False
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff')
+
+def discover_import_tasks(source):
+    """Build the list of employees to import from a directory tree or manifest CSV
+
+    A directory tree has one sub-folder per employee, named after the employee's
+    email address. A manifest CSV has ``name``, ``email`` and ``folder`` columns,
+    with folders resolved relative to the CSV file. An email listed again
+    (ignoring case) is returned with an ``error`` instead of being imported twice.
+    """
+    entries = []
+
+    if os.path.isfile(source):
+        base_dir = os.path.dirname(os.path.abspath(source))
+        with open(source, newline='') as f:
+            for row in csv.DictReader(f):
+                entries.append({
+                    'name': row['name'].strip(),
+                    'email': row['email'].strip(),
+                    'folder': os.path.join(base_dir, row['folder'].strip()),
+                })
+    else:
+        with os.scandir(source) as it:
+            for entry in sorted(it, key=lambda e: e.name):
+                if not entry.is_dir():
+                    continue
+                email = entry.name
+                local_part = email.split('@')[0]
+                name = ' '.join(part.capitalize() for part in local_part.replace('_', '.').split('.') if part)
+                entries.append({'name': name, 'email': email, 'folder': entry.path})
+
+    tasks = []
+    first_listed = {}
+    for entry in entries:
+        first = first_listed.setdefault(entry['email'].lower(), entry)
+        if first is not entry:
+            tasks.append({
+                'name': entry['name'],
+                'email': entry['email'],
+                'photo_paths': [],
+                'error': f"duplicate email, already listed for {first['name']}",
+            })
+            continue
+
+        photos = []
+        if os.path.isdir(entry['folder']):
+            photos = sorted(
+                os.path.join(entry['folder'], filename)
+                for filename in os.listdir(entry['folder'])
+                if filename.lower().endswith(IMAGE_EXTENSIONS)
+            )
+        tasks.append({
+            'name': entry['name'],
+            'email': entry['email'],
+            'photo_paths': photos,
+            'error': None,
+        })
+
+    return tasks
+
+def load_checkpoint(checkpoint_path):
+    """Load the set of emails already imported by a previous run"""
+    if not os.path.exists(checkpoint_path):
+        return set()
+
+    with open(checkpoint_path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+def append_checkpoint(checkpoint_path, emails):
+    """Record committed emails so an interrupted import can resume"""
+    with open(checkpoint_path, 'a') as f:
+        for email in emails:
+            f.write(email + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+def import_employees(source, workers=None, batch_size=50, checkpoint_path=None, min_photos=3):
+    """Bulk-enroll employees, encoding photos in a process pool"""
+    from enrollment import enroll_employee_photos, enrollment_settings
+    from embedding_cache import open_embedding_cache
+
+    try:
+        if checkpoint_path is None:
+            checkpoint_path = os.path.abspath(source).rstrip(os.sep) + '.import-checkpoint'
+
+        done = {email.lower() for email in load_checkpoint(checkpoint_path)}
+        config = Config()
+        settings = enrollment_settings(config)
+        cache = open_embedding_cache(config)
+        cache_stats_before = cache.stats() if cache else None
+        tasks = discover_import_tasks(source)
+
+        with get_app().app_context():
+            existing = {email.lower() for (email,) in db.session.query(Employee.email).all()}
+
+        pending = []
+        skipped = 0
+        failures = []
+        for task in tasks:
+            if task['error']:
+                failures.append((task['email'], task['error']))
+            elif task['email'].lower() in done or task['email'].lower() in existing:
+                skipped += 1
+            elif len(task['photo_paths']) < min_photos:
+                failures.append((task['email'], f"only {len(task['photo_paths'])} photos, {min_photos} required"))
+            else:
+                task['upload_folder'] = get_app().config["UPLOAD_FOLDER"]
+                task['encode'] = FACE_RECOGNITION_AVAILABLE
+                task['settings'] = settings
+                task['cache'] = cache
+                pending.append(task)
+
+        total_photos = sum(len(task['photo_paths']) for task in pending)
+        print(f"Importing {len(pending)} employees ({total_photos} photos), "
+              f"skipping {skipped} already imported")
+
+        start_time = time.monotonic()
+        imported = 0
+        imported_photos = 0
+        batch = []
+
+        def employee_row(result):
+            return Employee(
+                name=result['name'],
+                email=result['email'],
+                face_embeddings=json.dumps(result['embeddings']) if result['embeddings'] else None,
+                photo_paths=json.dumps(result['photo_paths'])
+            )
+
+        def flush(batch):
+            """Commit a batch; returns the results that were stored"""
+            with get_app().app_context():
+                try:
+                    db.session.add_all([employee_row(result) for result in batch])
+                    db.session.commit()
+                    stored = batch
+                except IntegrityError:
+                    # Someone else added one of these emails meanwhile: store the rest one by one
+                    db.session.rollback()
+                    stored = []
+                    for result in batch:
+                        try:
+                            db.session.add(employee_row(result))
+                            db.session.commit()
+                            stored.append(result)
+                        except IntegrityError:
+                            db.session.rollback()
+                            failures.append((result['email'], "email already exists"))
+                            for photo_path in result['photo_paths']:
+                                if os.path.exists(photo_path):
+                                    os.remove(photo_path)
+            append_checkpoint(checkpoint_path, [result['email'] for result in stored])
+            return stored
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(enroll_employee_photos, task) for task in pending]
+
+            for future in as_completed(futures):
+                result = future.result()
+                if result['error']:
+                    failures.append((result['email'], result['error']))
+                    continue
+
+                batch.append(result)
+                if len(batch) >= batch_size:
+                    stored = flush(batch)
+                    imported += len(stored)
+                    imported_photos += sum(len(r['photo_paths']) for r in stored)
+                    batch = []
+
+                    elapsed = time.monotonic() - start_time
+                    print(f"  ✓ {imported}/{len(pending)} employees ({imported / elapsed:.1f}/s)")
+
+            if batch:
+                stored = flush(batch)
+                imported += len(stored)
+                imported_photos += sum(len(r['photo_paths']) for r in stored)
+
+        elapsed = time.monotonic() - start_time
+        print(f"\nImported {imported} employees and {imported_photos} photos in {elapsed:.1f}s")
+        if elapsed > 0:
+            print(f"Throughput: {imported / elapsed:.2f} employees/s, {imported_photos / elapsed:.2f} photos/s")
+
+        if cache and FACE_RECOGNITION_AVAILABLE:
+            print_cache_stats(cache, since=cache_stats_before)
+        
+        if failures:
+            print(f"\n{len(failures)} employees failed:")
+            for email, error in failures:
+                print(f"  ✗ {email}: {error}")
+
+        return not failures
+
+    except KeyboardInterrupt:
+        print(f"\nImport interrupted. Re-run the same command to resume from {checkpoint_path}")
+        return False
+    except Exception as e:
+        print(f"Error importing employees: {str(e)}")
+        return False
+
+def recognize_media(source, output=None, workers=None, every=1, backfill=False, start=None):
+    """Recognize faces in a directory of images and videos, or a video file, in a process pool"""
+    from datetime import datetime
+    from batch_recognition import discover_media, init_worker, recognize_unit, first_sightings, backfill_attendance
+    from embedding_store import gallery_payload
+
+    if not FACE_RECOGNITION_AVAILABLE:
+        print("Error: Face recognition modules are required for batch recognition")
+        return False
+
+    if every < 1:
+        print("Error: --every must be at least 1")
+        return False
+
+    try:
+        if output is None:
+            output = os.path.abspath(source).rstrip(os.sep) + '.recognitions.jsonl'
+
+        config = Config()
+        units = discover_media(source, every=every, start=datetime.fromisoformat(start) if start else None)
+        with get_app().app_context():
+            payload = gallery_payload(db)
+
+        print(f"Recognizing {len(units)} chunks from {source} against {len(payload[1])} face encodings")
+
+        start_time = time.monotonic()
+        last_report = start_time
+        done = 0
+        frames = 0
+        faces = 0
+        failures = []
+        sightings = {}
+
+        with open(output, 'w') as out, ProcessPoolExecutor(
+            max_workers=workers, initializer=init_worker, initargs=(config.to_dict(), payload)
+        ) as executor:
+            futures = {executor.submit(recognize_unit, unit): unit for unit in units}
+
+            # Chunks finish out of order; each record names its file and frame
+            for future in as_completed(futures):
+                done += 1
+                try:
+                    records, unit_frames = future.result()
+                except Exception as e:
+                    unit = futures[future]
+                    failures.append((unit.get('path') or unit['paths'][0], str(e)))
+                    continue
+
+                frames += unit_frames
+                faces += len(records)
+                for record in records:
+                    out.write(json.dumps(record) + '\n')
+                if backfill:
+                    for key, record in first_sightings(records).items():
+                        if key not in sightings or record['timestamp'] < sightings[key]['timestamp']:
+                            sightings[key] = record
+
+                now = time.monotonic()
+                if now - last_report >= 1 or done == len(units):
+                    last_report = now
+                    print(f"  ✓ {done}/{len(units)} chunks, {frames} frames ({frames / (now - start_time):.1f} FPS)")
+
+        elapsed = time.monotonic() - start_time
+        print(f"\nProcessed {frames} frames in {elapsed:.1f}s ({frames / elapsed if elapsed else 0.0:.1f} FPS), "
+              f"{faces} faces written to {output}")
+
+        if backfill:
+            with get_app().app_context():
+                added = backfill_attendance(db, sightings)
+            print(f"✓ Added {added} attendance records ({len(sightings) - added} employee-days already present)")
+
+        if failures:
+            print(f"\n{len(failures)} chunks failed:")
+            for path, error in failures:
+                print(f"  ✗ {path}: {error}")
+
+        return not failures
+
+    except Exception as e:
+        print(f"Error recognizing media: {str(e)}")
+        return False
+
+def reembed_gallery(workers=None, batch_size=None, max_rate=None, force=False, skip_failed=False):
+    """Recompute all embeddings with the current encoder settings and switch recognition to them"""
+    from enrollment import enrollment_settings
+    from embedding_cache import open_embedding_cache
+    from reembedding import GalleryReembedder
+    
+    if not FACE_RECOGNITION_AVAILABLE:
+        print("Error: Face recognition modules are required to re-embed the gallery")
+        return False
+    
+    try:
+        config = Config()
+        app = get_app()
+        with app.app_context():
+            db.create_all()
+        
+        reembedder = GalleryReembedder(
+            app, db, enrollment_settings(config),
+            embedding_cache=open_embedding_cache(config),
+            workers=workers or config.get('REEMBED_WORKERS', 2),
+            batch_size=batch_size or config.get('REEMBED_BATCH_SIZE', 50),
+            max_rate=config.get('REEMBED_MAX_PHOTOS_PER_SECOND', 0) if max_rate is None else max_rate,
+            lock_folder=app.config["UPLOAD_FOLDER"]
+        )
+        
+        start_time = time.monotonic()
+        
+        def progress(version):
+            elapsed = time.monotonic() - start_time
+            print(f"  ✓ {version.processed}/{version.total} employees in version {version.id}, "
+                  f"{version.failed} failed ({elapsed:.0f}s)")
+        
+        report = reembedder.run_exclusive(force, skip_failed, progress)
+        if report is None:
+            print("Re-embedding is already running in another process")
+            return False
+        
+        if report['status'] == 'current':
+            print(f"Gallery version {report['version']} already uses the current encoder settings (use --force to rebuild)")
+            return True
+        
+        if report['failures']:
+            print(f"\n{len(report['failures'])} employees have no usable photo:")
+            for employee_id, errors in report['failures']:
+                print(f"  ✗ {employee_id}: {'; '.join(error['error'] for error in errors)}")
+        
+        if report['status'] == 'failed':
+            print(f"\nGallery version {report['version']} was not activated. Fix their photos and run again "
+                  f"to resume, or use --skip-failed to activate without them")
+            return False
+        
+        print(f"\n✓ Gallery version {report['version']} activated in {time.monotonic() - start_time:.1f}s; "
+              f"recognition switches to it within {config.get('GALLERY_VERSION_CHECK_SECONDS', 30):.0f}s")
+        return True
+        
+    except KeyboardInterrupt:
+        print("\nRe-embedding interrupted. Run the same command again to resume")
+        return False
+    except Exception as e:
+        print(f"Error re-embedding gallery: {str(e)}")
+        return False
+
+def audit_gallery(threshold=None, block_size=None):
+    """List pairs of employees whose faces are closer than the enrollment conflict distance"""
+    from embedding_store import EmbeddingStore, PAIR_BLOCK, gallery_payload
+    
+    try:
+        config = Config()
+        threshold = config.get('ENROLLMENT_CONFLICT_DISTANCE', 0.5) if threshold is None else threshold
+        
+        with get_app().app_context():
+            embeddings, labels, names = gallery_payload(db)
+            emails = dict(db.session.query(Employee.id, Employee.email))
+        
+        gallery = EmbeddingStore.from_embeddings(embeddings, labels, names=names)
+        start_time = time.monotonic()
+        pairs = gallery.close_pairs(threshold, block_size or PAIR_BLOCK)
+        elapsed = time.monotonic() - start_time
+        
+        print(f"Compared {len(embeddings)} embeddings of {len(names)} employees in {elapsed:.1f}s")
+        if not pairs:
+            print(f"✓ No two employees are within {threshold:.2f} of each other")
+            return True
+        
+        print(f"\nFound {len(pairs)} pairs within {threshold:.2f}:")
+        print("-" * 100)
+        print(f"{'Distance':<9} {'ID':<5} {'Name':<20} {'Email':<20} {'ID':<5} {'Name':<20} {'Email':<20}")
+        print("-" * 100)
+        for first, second, distance in pairs:
+            print(f"{distance:<9.3f} {first:<5} {names[first]:<20} {emails[first]:<20} "
+                  f"{second:<5} {names[second]:<20} {emails[second]:<20}")
+        return True
+        
+    except Exception as e:
+        print(f"Error auditing gallery: {str(e)}")
+        return False
+
 def main():
     """Main CLI function"""
     parser = argparse.ArgumentParser(description='Face Attendance System CLI')
@@ -207,6 +709,7 @@ def main():
     add_parser.add_argument('name', help='Employee name')
     add_parser.add_argument('email', help='Employee email')
     add_parser.add_argument('photos', nargs='+', help='Paths to employee photos (minimum 3)')
+    add_parser.add_argument('--allow-conflicts', action='store_true', help='Add even if the faces match another employee')
     
     # List employees command
     list_parser = subparsers.add_parser('list', help='List all employees')
@@ -218,6 +721,50 @@ def main():
     # Attendance summary command
     summary_parser = subparsers.add_parser('summary', help='Show attendance summary')
     
+    # Retention command
+    retention_parser = subparsers.add_parser('retention', help='Delete expired capture images and attendance rows')
+    retention_parser.add_argument('--days', type=int, default=None, help='Keep capture images for this many days (default: IMAGE_RETENTION_DAYS)')
+    retention_parser.add_argument('--attendance-days', type=int, default=None, help='Keep attendance rows for this many days, 0 keeps them forever')
+    retention_parser.add_argument('--dry-run', action='store_true', help='Report what would be deleted without deleting anything')
+    
+    # Storage migration command
+    migrate_parser = subparsers.add_parser('migrate-storage', help='Move flat-layout captures into the date-sharded layout')
+    migrate_parser.add_argument('--batch-size', type=int, default=500, help='Files moved per transaction')
+    migrate_parser.add_argument('--dry-run', action='store_true', help='Count the files that would be moved')
+    
+    # Embedding cache command
+    cache_parser = subparsers.add_parser('cache', help='Show embedding cache statistics')
+    cache_parser.add_argument('--clear', action='store_true', help='Remove all cached embeddings')
+    
+    # Bulk import command
+    import_parser = subparsers.add_parser('import', help='Bulk-import employees from a directory tree or manifest CSV')
+    import_parser.add_argument('source', help='Directory with one folder per employee (named by email) or a manifest CSV (name,email,folder)')
+    import_parser.add_argument('--workers', type=int, default=None, help='Number of encoding processes (default: CPU count)')
+    import_parser.add_argument('--batch-size', type=int, default=50, help='Employees inserted per transaction')
+    import_parser.add_argument('--checkpoint', default=None, help='Checkpoint file used to resume an interrupted import')
+    
+    # Offline recognition command
+    recognize_parser = subparsers.add_parser('recognize', help='Recognize faces in a directory of images and videos, or a video file')
+    recognize_parser.add_argument('source', help='Video file or directory tree of images and videos')
+    recognize_parser.add_argument('--output', default=None, help='JSONL file for the results (default: <source>.recognitions.jsonl)')
+    recognize_parser.add_argument('--workers', type=int, default=None, help='Number of recognition processes (default: CPU count)')
+    recognize_parser.add_argument('--every', type=int, default=1, help='Process every Nth video frame')
+    recognize_parser.add_argument('--backfill', action='store_true', help='Add attendance for each employee\'s first sighting per day')
+    recognize_parser.add_argument('--start', default=None, help='Recording start of the videos, ISO format (default: file time minus duration)')
+    
+    # Gallery re-embedding command
+    reembed_parser = subparsers.add_parser('reembed', help='Recompute all face embeddings after changing encoder settings')
+    reembed_parser.add_argument('--workers', type=int, default=None, help='Number of encoding processes (default: REEMBED_WORKERS)')
+    reembed_parser.add_argument('--batch-size', type=int, default=None, help='Employees committed per transaction (default: REEMBED_BATCH_SIZE)')
+    reembed_parser.add_argument('--max-rate', type=float, default=None, help='Photos encoded per second, 0 is unthrottled (default: REEMBED_MAX_PHOTOS_PER_SECOND)')
+    reembed_parser.add_argument('--force', action='store_true', help='Rebuild even if the active version uses the current settings')
+    reembed_parser.add_argument('--skip-failed', action='store_true', help='Activate even if some employees have no usable photo (they lose their embeddings)')
+    
+    # Audit gallery command
+    audit_parser = subparsers.add_parser('audit-gallery', help='Find employees whose faces are too similar to tell apart')
+    audit_parser.add_argument('--threshold', type=float, default=None, help='Face distance counted as a conflict (default: ENROLLMENT_CONFLICT_DISTANCE)')
+    audit_parser.add_argument('--block-size', type=int, default=None, help='Employees per tile of the all-pairs comparison')
+    
     args = parser.parse_args()
     
     if not args.command:
@@ -229,7 +776,7 @@ def main():
             print("Error: At least 3 photos are required for face recognition")
             return
         
-        add_employee(args.name, args.email, args.photos)
+        add_employee(args.name, args.email, args.photos, args.allow_conflicts)
     
     elif args.command == 'list':
         list_employees()
@@ -239,6 +786,27 @@ def main():
     
     elif args.command == 'summary':
         show_attendance_summary()
+    
+    elif args.command == 'retention':
+        apply_retention(args.days, args.attendance_days, args.dry_run)
+    
+    elif args.command == 'migrate-storage':
+        migrate_storage(args.batch_size, args.dry_run)
+    
+    elif args.command == 'cache':
+        manage_embedding_cache(args.clear)
+    
+    elif args.command == 'import':
+        import_employees(args.source, args.workers, args.batch_size, args.checkpoint)
+    
+    elif args.command == 'recognize':
+        recognize_media(args.source, args.output, args.workers, args.every, args.backfill, args.start)
+    
+    elif args.command == 'reembed':
+        reembed_gallery(args.workers, args.batch_size, args.max_rate, args.force, args.skip_failed)
+    
+    elif args.command == 'audit-gallery':
+        audit_gallery(args.threshold, args.block_size)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
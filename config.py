@@ -1,14 +1,67 @@
 import os
-from dotenv import load_dotenv
+import json
+import threading
+from types import MappingProxyType
+from dotenv import dotenv_values, load_dotenv
+from roi import validate_rois
+
+# Keys whose value comes from .env rather than the process environment;
+# only these are refreshed when .env is read again
+_dotenv_keys = {key for key, value in dotenv_values().items() if value is not None and key not in os.environ}
 
 # Load environment variables
 load_dotenv()
 
+def reload_dotenv():
+    """Read .env again with the same precedence as at startup
+    
+    Variables set by the process environment (systemd, Docker, the shell)
+    are never replaced; keys that came from .env, or are not set at all,
+    take the file's current value.
+    """
+    for key, value in dotenv_values().items():
+        if value is not None and (key in _dotenv_keys or key not in os.environ):
+            os.environ[key] = value
+            _dotenv_keys.add(key)
+
+# Settings the recognition loop re-reads every frame; changing them takes
+# effect without restarting the camera
+RUNTIME_KEYS = frozenset({
+    'RECOGNITION_THRESHOLD',
+    'PROCESS_EVERY_N_FRAMES',
+    'TARGET_FPS',
+    'ATTENDANCE_COOLDOWN_MINUTES',
+    'UNKNOWN_FACE_MAX_ATTEMPTS',
+    'BLUR_FACES',
+    'THUMBNAIL_SIZE',
+    'DETECTION_ROIS',
+    'DETECTION_MIN_FACE_SIZE',
+    'DETECTION_REFINE',
+    'QUALITY_GATE_ENABLED',
+    'QUALITY_MIN_FACE_SIZE',
+    'QUALITY_MIN_SHARPNESS',
+    'QUALITY_MIN_BRIGHTNESS',
+    'QUALITY_MAX_BRIGHTNESS',
+    'QUALITY_MAX_POSE_OFFSET',
+})
+
 class Config:
-    """Configuration class for the Face Attendance System"""
+    """Configuration class for the Face Attendance System
+    
+    Values are held in a dict that is never modified in place: every change
+    builds a new dict and swaps it in with a single assignment, so a
+    ``snapshot()`` taken by the recognition loop never sees a half-applied
+    update.
+    """
     
     def __init__(self):
-        self.config = {
+        self._reload_lock = threading.Lock()
+        self.config = self.load_environment()
+    
+    @staticmethod
+    def load_environment():
+        """Build configuration values from environment variables"""
+        return {
             # Database settings
             'DATABASE_URL': os.getenv('DATABASE_URL', 'sqlite:///attendance.db'),
             
@@ -16,15 +69,53 @@ class Config:
             'CAMERA_INDEX': int(os.getenv('CAMERA_INDEX', '0')),
             'CAMERA_WIDTH': int(os.getenv('CAMERA_WIDTH', '640')),
             'CAMERA_HEIGHT': int(os.getenv('CAMERA_HEIGHT', '480')),
+            # Read the camera on its own thread and always process the newest frame
+            'CAMERA_GRABBER': os.getenv('CAMERA_GRABBER', 'true').lower() == 'true',
             
             # Recognition settings
             'RECOGNITION_THRESHOLD': float(os.getenv('RECOGNITION_THRESHOLD', '0.6')),
+            # In-memory gallery format (float32, float16 or int8) and how many
+            # candidates quantized modes re-rank with exact distances
+            'GALLERY_STORE_MODE': os.getenv('GALLERY_STORE_MODE', 'float32'),
+            'GALLERY_RERANK': int(os.getenv('GALLERY_RERANK', '32')),
+            'GALLERY_CANDIDATES': int(os.getenv('GALLERY_CANDIDATES', '8')),
             'PROCESS_EVERY_N_FRAMES': int(os.getenv('PROCESS_EVERY_N_FRAMES', '3')),
+            # JSON list of {"rect": [x, y, w, h]} / {"polygon": [[x, y], ...]} regions in
+            # fractions of the frame, or an object of such lists per camera index
+            'DETECTION_ROIS': os.getenv('DETECTION_ROIS', ''),
+            # Smallest face to find, in pixels at CAMERA_WIDTH; sets how far frames are
+            # shrunk before detection (0 = a quarter of CAMERA_WIDTH, i.e. 1/4 size)
+            'DETECTION_MIN_FACE_SIZE': int(os.getenv('DETECTION_MIN_FACE_SIZE', '0')),
+            # Encode from full-resolution crops instead of the shrunk detection image
+            'DETECTION_REFINE': os.getenv('DETECTION_REFINE', 'false').lower() == 'true',
+            
+            # Face quality gate between detection and encoding (face size in
+            # full-frame pixels; pose offset 0 disables the landmark check)
+            'QUALITY_GATE_ENABLED': os.getenv('QUALITY_GATE_ENABLED', 'true').lower() == 'true',
+            'QUALITY_MIN_FACE_SIZE': int(os.getenv('QUALITY_MIN_FACE_SIZE', '40')),
+            'QUALITY_MIN_SHARPNESS': float(os.getenv('QUALITY_MIN_SHARPNESS', '15')),
+            'QUALITY_MIN_BRIGHTNESS': int(os.getenv('QUALITY_MIN_BRIGHTNESS', '40')),
+            'QUALITY_MAX_BRIGHTNESS': int(os.getenv('QUALITY_MAX_BRIGHTNESS', '220')),
+            'QUALITY_MAX_POSE_OFFSET': float(os.getenv('QUALITY_MAX_POSE_OFFSET', '0.5')),
             
             # Attendance settings
             'ATTENDANCE_COOLDOWN_MINUTES': int(os.getenv('ATTENDANCE_COOLDOWN_MINUTES', '2')),
             'WORK_START_TIME': os.getenv('WORK_START_TIME', '09:00'),
             
+            # Enrollment settings
+            'ENROLLMENT_MAX_DIMENSION': int(os.getenv('ENROLLMENT_MAX_DIMENSION', '800')),
+            'ENROLLMENT_CROP_SIZE': int(os.getenv('ENROLLMENT_CROP_SIZE', '300')),
+            'ENROLLMENT_DETECTION_MODEL': os.getenv('ENROLLMENT_DETECTION_MODEL', 'hog'),
+            'ENROLLMENT_UPSAMPLE': int(os.getenv('ENROLLMENT_UPSAMPLE', '1')),
+            'ENROLLMENT_NUM_JITTERS': int(os.getenv('ENROLLMENT_NUM_JITTERS', '1')),
+            # New faces this close to another employee are rejected, flagged or let through (off)
+            'ENROLLMENT_CONFLICT_ACTION': os.getenv('ENROLLMENT_CONFLICT_ACTION', 'reject').lower(),
+            'ENROLLMENT_CONFLICT_DISTANCE': float(os.getenv('ENROLLMENT_CONFLICT_DISTANCE', '0.5')),
+            
+            # Embedding cache settings (empty path disables the cache)
+            'EMBEDDING_CACHE_PATH': os.getenv('EMBEDDING_CACHE_PATH', 'cache/embeddings.sqlite'),
+            'EMBEDDING_CACHE_MAX_ENTRIES': int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', '100000')),
+            
             # Unknown face settings
             'UNKNOWN_FACE_MAX_ATTEMPTS': int(os.getenv('UNKNOWN_FACE_MAX_ATTEMPTS', '3')),
             
@@ -45,10 +136,41 @@ class Config:
             # File upload settings
             'UPLOAD_FOLDER': os.getenv('UPLOAD_FOLDER', 'uploads'),
             'MAX_CONTENT_LENGTH': int(os.getenv('MAX_CONTENT_LENGTH', str(16 * 1024 * 1024))),
+            'UPLOAD_WORKERS': int(os.getenv('UPLOAD_WORKERS', '2')),
+            'THUMBNAIL_SIZE': int(os.getenv('THUMBNAIL_SIZE', '150')),
+            'MEDIA_CACHE_MAX_AGE': int(os.getenv('MEDIA_CACHE_MAX_AGE', str(365 * 24 * 60 * 60))),
+            
+            # Retention settings (0 days keeps data forever)
+            'RETENTION_ENABLED': os.getenv('RETENTION_ENABLED', 'false').lower() == 'true',
+            'IMAGE_RETENTION_DAYS': int(os.getenv('IMAGE_RETENTION_DAYS', '30')),
+            'ATTENDANCE_RETENTION_DAYS': int(os.getenv('ATTENDANCE_RETENTION_DAYS', '0')),
+            'RETENTION_INTERVAL_HOURS': float(os.getenv('RETENTION_INTERVAL_HOURS', '24')),
+            'RETENTION_BATCH_SIZE': int(os.getenv('RETENTION_BATCH_SIZE', '500')),
+            'RETENTION_BATCH_PAUSE': float(os.getenv('RETENTION_BATCH_PAUSE', '0.05')),
+            
+            # Re-embedding the gallery after encoder changes (0 photos/s is unthrottled), and how
+            # often the recognition loop checks for a newly activated gallery version
+            'REEMBED_WORKERS': int(os.getenv('REEMBED_WORKERS', '2')),
+            'REEMBED_BATCH_SIZE': int(os.getenv('REEMBED_BATCH_SIZE', '50')),
+            'REEMBED_MAX_PHOTOS_PER_SECOND': float(os.getenv('REEMBED_MAX_PHOTOS_PER_SECOND', '0')),
+            'GALLERY_VERSION_CHECK_SECONDS': float(os.getenv('GALLERY_VERSION_CHECK_SECONDS', '30')),
+            
+            # Diagnostics settings (on-demand profiling of the recognition loop)
+            'PROFILER_ENABLED': os.getenv('PROFILER_ENABLED', 'false').lower() == 'true',
+            'DIAGNOSTICS_FOLDER': os.getenv('DIAGNOSTICS_FOLDER', 'diagnostics'),
+            'PROFILER_MAX_SECONDS': float(os.getenv('PROFILER_MAX_SECONDS', '120')),
+            'PROFILER_SAMPLE_INTERVAL_MS': float(os.getenv('PROFILER_SAMPLE_INTERVAL_MS', '5')),
+            
+            # Recognition worker settings (empty URL runs recognition inside the web process)
+            'RECOGNITION_WORKER_URL': os.getenv('RECOGNITION_WORKER_URL', ''),
+            'RECOGNITION_WORKER_HOST': os.getenv('RECOGNITION_WORKER_HOST', '127.0.0.1'),
+            'RECOGNITION_WORKER_PORT': int(os.getenv('RECOGNITION_WORKER_PORT', '5055')),
+            'RECOGNITION_WORKER_TOKEN': os.getenv('RECOGNITION_WORKER_TOKEN'),
+            'RECOGNITION_WORKER_TIMEOUT': float(os.getenv('RECOGNITION_WORKER_TIMEOUT', '5')),
             
             # Performance settings
             'ENABLE_THREADING': os.getenv('ENABLE_THREADING', 'true').lower() == 'true',
-            'TARGET_FPS': int(os.getenv('TARGET_FPS', '15')),
+            'TARGET_FPS': int(os.getenv('TARGET_FPS', '30')),
         }
     
     def get(self, key, default=None):
@@ -57,32 +179,128 @@ class Config:
     
     def set(self, key, value):
         """Set configuration value"""
-        self.config[key] = value
+        self.update({key: value})
     
     def update(self, updates):
         """Update multiple configuration values"""
-        self.config.update(updates)
+        values = dict(self.config)
+        values.update(updates)
+        self.config = values
     
     def to_dict(self):
         """Return configuration as dictionary"""
         return self.config.copy()
     
-    def validate(self):
+    def snapshot(self):
+        """Return a read-only view of the current values that later changes never affect"""
+        return MappingProxyType(self.config)
+    
+    def coerce(self, key, value):
+        """Convert a value (e.g. from JSON or a form) to the type of the current setting"""
+        current = self.config.get(key)
+        if isinstance(current, bool):
+            if isinstance(value, str):
+                return value.lower() == 'true'
+            return bool(value)
+        if isinstance(current, (int, float)) and not isinstance(value, bool):
+            return type(current)(value)
+        if isinstance(current, str) and isinstance(value, (list, dict)):
+            # Structured settings such as DETECTION_ROIS are stored as JSON text
+            return json.dumps(value)
+        return value
+    
+    def reload(self, overrides=None):
+        """Validate and atomically swap in new values
+        
+        Without overrides the environment is read again, with ``.env`` filling
+        in only what the process environment does not set (as at startup).
+        Overrides are applied on top of the current values and are limited to
+        ``RUNTIME_KEYS``. Returns the sorted list of keys whose value changed;
+        raises ``ValueError`` and keeps the old values if validation fails.
+        """
+        with self._reload_lock:
+            if overrides is None:
+                reload_dotenv()
+                values = self.load_environment()
+            else:
+                unknown = sorted(set(overrides) - RUNTIME_KEYS)
+                if unknown:
+                    raise ValueError(f"Cannot change at runtime: {', '.join(unknown)}")
+                values = dict(self.config)
+                try:
+                    values.update({key: self.coerce(key, value) for key, value in overrides.items()})
+                except (TypeError, ValueError) as e:
+                    raise ValueError(f"Invalid value: {str(e)}")
+            
+            errors = self.validate(values)
+            if errors:
+                raise ValueError("; ".join(errors))
+            
+            changed = sorted(key for key in set(values) | set(self.config) if values.get(key) != self.config.get(key))
+            self.config = values
+            return changed
+    
+    def validate(self, values=None):
         """Validate configuration values"""
+        values = self.config if values is None else values
         errors = []
         
         # Validate numeric values
-        if self.config['RECOGNITION_THRESHOLD'] < 0 or self.config['RECOGNITION_THRESHOLD'] > 1:
+        if values['RECOGNITION_THRESHOLD'] < 0 or values['RECOGNITION_THRESHOLD'] > 1:
             errors.append("RECOGNITION_THRESHOLD must be between 0 and 1")
         
-        if self.config['ATTENDANCE_COOLDOWN_MINUTES'] < 0:
+        if values['ATTENDANCE_COOLDOWN_MINUTES'] < 0:
             errors.append("ATTENDANCE_COOLDOWN_MINUTES must be positive")
         
-        if self.config['CAMERA_INDEX'] < 0:
+        if values['CAMERA_INDEX'] < 0:
             errors.append("CAMERA_INDEX must be non-negative")
         
+        if values['CAMERA_WIDTH'] <= 0 or values['CAMERA_HEIGHT'] <= 0:
+            errors.append("CAMERA_WIDTH and CAMERA_HEIGHT must be positive")
+        
+        if values['GALLERY_STORE_MODE'] not in ('float32', 'float16', 'int8'):
+            errors.append("GALLERY_STORE_MODE must be float32, float16 or int8")
+        
+        if values['GALLERY_RERANK'] < 0:
+            errors.append("GALLERY_RERANK must not be negative")
+        
+        if values['GALLERY_CANDIDATES'] < 0:
+            errors.append("GALLERY_CANDIDATES must not be negative")
+        
+        if values['ENROLLMENT_CONFLICT_ACTION'] not in ('reject', 'flag', 'off'):
+            errors.append("ENROLLMENT_CONFLICT_ACTION must be reject, flag or off")
+        
+        if values['ENROLLMENT_CONFLICT_DISTANCE'] < 0:
+            errors.append("ENROLLMENT_CONFLICT_DISTANCE must not be negative")
+        
+        if values['REEMBED_WORKERS'] < 1 or values['REEMBED_BATCH_SIZE'] < 1:
+            errors.append("REEMBED_WORKERS and REEMBED_BATCH_SIZE must be at least 1")
+        
+        if values['REEMBED_MAX_PHOTOS_PER_SECOND'] < 0:
+            errors.append("REEMBED_MAX_PHOTOS_PER_SECOND must not be negative")
+        
+        if values['DETECTION_MIN_FACE_SIZE'] < 0:
+            errors.append("DETECTION_MIN_FACE_SIZE must not be negative")
+        
+        if values['PROCESS_EVERY_N_FRAMES'] < 1:
+            errors.append("PROCESS_EVERY_N_FRAMES must be at least 1")
+        
+        if values['TARGET_FPS'] <= 0:
+            errors.append("TARGET_FPS must be positive")
+        
+        if values['UNKNOWN_FACE_MAX_ATTEMPTS'] < 1:
+            errors.append("UNKNOWN_FACE_MAX_ATTEMPTS must be at least 1")
+        
+        errors.extend(validate_rois(values.get('DETECTION_ROIS')))
+        
+        if values['QUALITY_MIN_FACE_SIZE'] < 0 or values['QUALITY_MIN_SHARPNESS'] < 0 or values['QUALITY_MAX_POSE_OFFSET'] < 0:
+            errors.append("Quality thresholds must not be negative")
+        
+        if not 0 <= values['QUALITY_MIN_BRIGHTNESS'] < values['QUALITY_MAX_BRIGHTNESS'] <= 255:
+            errors.append("QUALITY_MIN_BRIGHTNESS must be below QUALITY_MAX_BRIGHTNESS, both within 0-255")
+        
         # Validate required directories
-        upload_folder = self.config['UPLOAD_FOLDER']
+        upload_folder = values['UPLOAD_FOLDER']
         if not os.path.exists(upload_folder):
             try:
                 os.makedirs(upload_folder, exist_ok=True)
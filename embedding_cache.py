@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """Persistent LRU cache of face embeddings keyed by image content and encoder settings
+
+    Entries live in a small SQLite file so the web upload path, the CLI and
+    worker processes can share them. Embeddings are stored as float32 blobs.
+    """
+
+    def __init__(self, path, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Connections and locks can't cross process boundaries; reopen lazily
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_pid'] = None
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        """Open the cache database once per process"""
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    embedding BLOB NOT NULL,
+                    location TEXT,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.commit()
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    @staticmethod
+    def make_key(photo_path, settings):
+        """Hash the image bytes together with the encoder settings"""
+        digest = hashlib.sha256()
+        with open(photo_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached entry for a key, or None on a miss"""
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute("SELECT embedding, location FROM embeddings WHERE key = ?", (key,)).fetchone()
+                hit = row is not None
+                if hit:
+                    conn.execute("UPDATE embeddings SET last_access = ? WHERE key = ?", (time.time(), key))
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                conn.execute(
+                    "INSERT INTO stats (name, value) VALUES (?, 1) "
+                    "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+                    ('hits' if hit else 'misses',)
+                )
+                conn.commit()
+
+            if not hit:
+                return None
+
+            embedding, location = row
+            return {
+                'embedding': np.frombuffer(embedding, dtype=np.float32).astype(np.float64).tolist(),
+                'location': tuple(json.loads(location)) if location else None,
+            }
+
+        except Exception as e:
+            logger.error(f"Error reading embedding cache: {str(e)}")
+            return None
+
+    def put(self, key, embedding, location=None):
+        """Store an embedding and evict the least recently used entries over the limit"""
+        try:
+            blob = np.asarray(embedding, dtype=np.float32).tobytes()
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, embedding, location, last_access) VALUES (?, ?, ?, ?)",
+                    (key, blob, json.dumps(list(location)) if location else None, time.time())
+                )
+                excess = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    conn.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+                        (excess,)
+                    )
+                conn.commit()
+
+        except Exception as e:
+            logger.error(f"Error writing embedding cache: {str(e)}")
+
+    def stats(self):
+        """Return hit/miss counts for this instance and across all processes"""
+        try:
+            with self._lock:
+                conn = self._connection()
+                entries = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                totals = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+        except Exception as e:
+            logger.error(f"Error reading embedding cache stats: {str(e)}")
+            entries, totals = 0, {}
+
+        lookups = self.hits + self.misses
+        total_hits = totals.get('hits', 0)
+        total_lookups = total_hits + totals.get('misses', 0)
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'total_hits': total_hits,
+            'total_misses': totals.get('misses', 0),
+            'total_hit_rate': total_hits / total_lookups if total_lookups else 0.0,
+        }
+
+    def clear(self):
+        """Remove all cached embeddings and statistics"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM embeddings")
+            conn.execute("DELETE FROM stats")
+            conn.commit()
+
+def open_embedding_cache(config=None):
+    """Create the shared embedding cache from the application config, or None if disabled"""
+    path = config.get('EMBEDDING_CACHE_PATH', 'cache/embeddings.sqlite') if config else 'cache/embeddings.sqlite'
+    if not path:
+        return None
+
+    max_entries = config.get('EMBEDDING_CACHE_MAX_ENTRIES', 100000) if config else 100000
+    return EmbeddingCache(path, max_entries=max_entries)
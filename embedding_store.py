@@ -0,0 +1,437 @@
+import copy
+import json
+import logging
+import tempfile
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STORE_MODES = ('float32', 'float16', 'int8')
+
+# Rows converted to float32 at a time when scanning a quantized gallery; a
+# 512 KB scratch block stays in cache
+CHUNK_ROWS = 1024
+
+# Centroids per side of the tiles compared in the all-pairs audit; a 1024 x
+# 1024 tile of float32 distances is 4 MB
+PAIR_BLOCK = 1024
+
+# Added to every employee's radius so float32 rounding never makes the
+# centroid bound exclude a closer embedding
+RADIUS_SLACK = 1e-3
+
+class EmbeddingStore:
+    """Contiguous, optionally quantized gallery of face embeddings
+
+    All embeddings live in one (N, 128) array instead of a list of float64
+    arrays. ``float32`` stores them as is. ``float16`` halves that, and
+    ``int8`` quantizes every dimension to 256 levels between its minimum and
+    maximum over the gallery (a quarter of float32). Quantized modes scan the
+    compact codes for approximate distances, then re-rank the ``rerank``
+    closest rows with exact float32 distances. The float32 originals they need
+    are kept in a temporary file-backed array, so only the re-ranked rows are
+    read back.
+
+    Rows are kept grouped by employee, and every employee also has a centroid
+    and a radius (the largest distance from the centroid to one of their
+    embeddings). With ``candidates`` set, nearest() scores the probe against
+    the centroids first and compares full embeddings only for the closest
+    employees; see nearest() for the guarantee this keeps.
+    """
+
+    def __init__(self, mode='float32', rerank=32, dimensions=128, candidates=0):
+        if mode not in STORE_MODES:
+            raise ValueError(f"Unknown embedding store mode '{mode}', expected one of {', '.join(STORE_MODES)}")
+        self.mode = mode
+        self.rerank = rerank
+        self.dimensions = dimensions
+        self.candidates = candidates
+        self.labels = np.empty(0, dtype=np.int64)
+        self.names = {}  # Display name per label
+        self._codes = np.empty((0, dimensions), dtype=self.code_dtype)
+        self._norms = np.empty(0, dtype=np.float32)
+        self.employees = np.empty(0, dtype=np.int64)  # Sorted labels, one per centroid
+        self._starts = np.zeros(1, dtype=np.int64)  # Rows of employees[i] are _starts[i]:_starts[i + 1]
+        self._centroid_codes = np.empty((0, dimensions), dtype=self.code_dtype)
+        self._centroid_norms = np.empty(0, dtype=np.float32)
+        self._radii = np.empty(0, dtype=np.float32)
+        self._offset = None
+        self._scale = None
+        self._originals = None
+        self._spill_file = None
+
+    @property
+    def code_dtype(self):
+        return {'float32': np.float32, 'float16': np.float16, 'int8': np.int8}[self.mode]
+
+    @classmethod
+    def from_embeddings(cls, embeddings, labels, mode='float32', rerank=32, names=None, candidates=0):
+        store = cls(mode=mode, rerank=rerank, candidates=candidates)
+        store.build(embeddings, labels)
+        store.names = dict(names or {})
+        return store
+
+    def __len__(self):
+        return len(self.labels)
+
+    def build(self, embeddings, labels):
+        """Replace the contents with the given embeddings and their labels (employee ids)"""
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dimensions)
+        labels = np.asarray(labels, dtype=np.int64)
+        if len(labels) != len(vectors):
+            raise ValueError(f"Got {len(vectors)} embeddings but {len(labels)} labels")
+
+        # Group rows by employee, keeping their order within an employee
+        order = np.argsort(labels, kind='stable')
+        vectors = np.ascontiguousarray(vectors[order])
+        labels = labels[order]
+
+        if self.mode == 'int8':
+            # Per-dimension scalar quantization onto -128..127
+            self._offset = vectors.min(axis=0) if len(vectors) else np.zeros(self.dimensions, dtype=np.float32)
+            span = (vectors.max(axis=0) - self._offset) if len(vectors) else np.ones(self.dimensions, dtype=np.float32)
+            self._scale = np.where(span > 0, span / 255, 1).astype(np.float32)
+
+        self._codes = self._encode(vectors)
+        self.labels = labels
+        self._norms = self._code_norms(self._codes)
+
+        self.employees, starts = np.unique(labels, return_index=True)
+        self._starts = np.append(starts, len(labels)).astype(np.int64)
+        self._centroid_codes, self._centroid_norms, self._radii = self._centroids(vectors, self._starts)
+
+        self._originals = self._spill(vectors) if self.mode != 'float32' and self.rerank else None
+
+    def _encode(self, vectors):
+        if self.mode == 'float32':
+            return vectors
+        if self.mode == 'float16':
+            return vectors.astype(np.float16)
+        codes = np.rint((vectors - self._offset) / self._scale) - 128
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def _code_norms(self, codes):
+        """Squared norms of the decoded codes"""
+        norms = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), CHUNK_ROWS):
+            block = self._decode_codes(codes[start:start + CHUNK_ROWS])
+            norms[start:start + len(block)] = np.einsum('ij,ij->i', block, block)
+        return norms
+
+    def _centroids(self, vectors, starts):
+        """Centroid codes, their squared norms and radii for rows grouped by starts"""
+        if len(starts) < 2:
+            return self._encode(vectors[:0]), np.empty(0, dtype=np.float32), np.empty(0, dtype=np.float32)
+
+        counts = np.diff(starts)
+        centroids = (np.add.reduceat(vectors, starts[:-1], axis=0, dtype=np.float64) / counts[:, None]).astype(np.float32)
+        codes = self._encode(centroids)
+
+        # Radii are measured from the stored (decoded) centroid to the exact embeddings,
+        # so the bound holds however the centroid was quantized
+        decoded = self._decode_codes(codes)
+        spread = np.linalg.norm(vectors - np.repeat(decoded, counts, axis=0), axis=1)
+        radii = np.maximum.reduceat(spread, starts[:-1]) + RADIUS_SLACK
+        return codes, self._code_norms(codes), radii.astype(np.float32)
+
+    def with_employee(self, label, embeddings, name=None):
+        """Copy of the store with one employee's embeddings replaced
+
+        An empty ``embeddings`` removes the employee. Only this employee's rows
+        and centroid are encoded; the other centroids and the int8
+        quantization range are kept, and new rows outside that range are
+        clipped (re-ranking still uses their exact values). The copy is built
+        aside, so a matcher holding this store is never affected.
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dimensions)
+        if not len(self):
+            # Nothing to keep; a full build also sets the int8 quantization range
+            store = EmbeddingStore.from_embeddings(
+                vectors, np.full(len(vectors), label), mode=self.mode, rerank=self.rerank,
+                names=self.names, candidates=self.candidates
+            )
+        else:
+            store = self._replace_rows(int(label), vectors)
+            store.names = dict(self.names)
+
+        if len(vectors):
+            store.names[int(label)] = name
+        else:
+            store.names.pop(int(label), None)
+        return store
+
+    def _replace_rows(self, label, vectors):
+        position = int(np.searchsorted(self.employees, label))
+        exists = position < len(self.employees) and self.employees[position] == label
+        start = self._starts[position]
+        stop = self._starts[position + 1] if exists else start
+
+        store = copy.copy(self)
+        codes = self._encode(vectors)
+        store._codes = np.concatenate([self._codes[:start], codes, self._codes[stop:]])
+        store._norms = np.concatenate([self._norms[:start], self._code_norms(codes), self._norms[stop:]])
+        store.labels = np.concatenate([self.labels[:start], np.full(len(vectors), label, dtype=np.int64), self.labels[stop:]])
+        if self._originals is not None:
+            store._spill_file = None
+            store._originals = store._spill(np.concatenate([self._originals[:start], vectors, self._originals[stop:]]))
+
+        # Only this employee's centroid is recomputed
+        counts = np.diff(self._starts)
+        centroid = self._centroids(vectors, np.array([0, len(vectors)])) if len(vectors) else None
+        keep = slice(position + 1 if exists else position, None)
+        if centroid is None:
+            store.employees = np.concatenate([self.employees[:position], self.employees[keep]])
+            counts = np.concatenate([counts[:position], counts[keep]])
+            store._centroid_codes = np.concatenate([self._centroid_codes[:position], self._centroid_codes[keep]])
+            store._centroid_norms = np.concatenate([self._centroid_norms[:position], self._centroid_norms[keep]])
+            store._radii = np.concatenate([self._radii[:position], self._radii[keep]])
+        else:
+            store.employees = np.concatenate([self.employees[:position], [label], self.employees[keep]])
+            counts = np.concatenate([counts[:position], [len(vectors)], counts[keep]])
+            store._centroid_codes = np.concatenate([self._centroid_codes[:position], centroid[0], self._centroid_codes[keep]])
+            store._centroid_norms = np.concatenate([self._centroid_norms[:position], centroid[1], self._centroid_norms[keep]])
+            store._radii = np.concatenate([self._radii[:position], centroid[2], self._radii[keep]])
+        store._starts = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return store
+
+    def _spill(self, vectors):
+        """Keep float32 originals for re-ranking in a file-backed array"""
+        if self._spill_file is not None:
+            self._spill_file.close()
+        if not len(vectors):
+            self._spill_file = None
+            return vectors
+        self._spill_file = tempfile.TemporaryFile(prefix='gallery_')
+        originals = np.memmap(self._spill_file, dtype=np.float32, mode='w+', shape=vectors.shape)
+        originals[:] = vectors
+        originals.flush()
+        return originals
+
+    def _decode(self, start, stop):
+        """float32 vectors for rows start:stop (a view for float32 mode)"""
+        return self._decode_codes(self._codes[start:stop])
+
+    def _decode_codes(self, codes):
+        if self.mode == 'float32':
+            return codes
+        if self.mode == 'float16':
+            return codes.astype(np.float32)
+        return (codes.astype(np.float32) + 128) * self._scale + self._offset
+
+    def embeddings(self):
+        """All embeddings as float32 (exact where the originals are kept)"""
+        if self._originals is not None:
+            return np.asarray(self._originals)
+        return self._decode(0, len(self))
+
+    def approximate_distances(self, probe):
+        """Squared distances from the probe to every row, computed on the stored codes"""
+        return self._scan(self._codes, self._norms, np.asarray(probe, dtype=np.float32))
+
+    def _scan(self, codes, norms, probe):
+        if self.mode == 'float32':
+            distances = norms - 2 * (codes @ probe)
+        else:
+            # Fold the int8 decode into the probe: x.q = c.(scale*q) + (128*scale + offset).q
+            weights, constant = probe, 0.0
+            if self.mode == 'int8':
+                weights = self._scale * probe
+                constant = float((128 * self._scale + self._offset) @ probe)
+            distances = np.empty(len(codes), dtype=np.float32)
+            for start in range(0, len(codes), CHUNK_ROWS):
+                block = codes[start:start + CHUNK_ROWS].astype(np.float32)
+                np.matmul(block, weights, out=distances[start:start + len(block)])
+            distances += constant
+            distances *= -2
+            distances += norms
+        distances += probe @ probe
+        return np.maximum(distances, 0, out=distances)
+
+    def centroid_distances(self, probe):
+        """Distances from the probe to every employee's centroid"""
+        probe = np.asarray(probe, dtype=np.float32)
+        return np.sqrt(self._scan(self._centroid_codes, self._centroid_norms, probe))
+
+    def employee_rows(self, positions):
+        """Row indexes of the employees at the given positions in ``employees``"""
+        positions = np.asarray(positions, dtype=np.int64)
+        counts = self._starts[positions + 1] - self._starts[positions]
+        firsts = np.repeat(self._starts[positions] - np.cumsum(counts) + counts, counts)
+        return firsts + np.arange(counts.sum())
+
+    def exact_distances(self, rows, probe):
+        """Euclidean distances from the probe to the given rows in float32"""
+        probe = np.asarray(probe, dtype=np.float32)
+        vectors = self._originals[rows] if self._originals is not None else self._decode_codes(self._codes[rows])
+        return np.linalg.norm(vectors - probe, axis=1)
+
+    def search(self, probe, k=1, rows=None):
+        """Indexes and distances of the k nearest rows, closest first
+
+        ``rows`` limits the search to a subset of row indexes.
+        """
+        approximate = self.approximate_distances(probe) if rows is None else self._subset_distances(rows, probe)
+        candidates = np.arange(len(self)) if rows is None else np.asarray(rows)
+        if not len(candidates):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # Shortlist on the codes, then order the shortlist by exact distance
+        shortlist = max(k, self.rerank if self.mode != 'float32' else k)
+        if shortlist < len(candidates):
+            keep = np.argpartition(approximate, shortlist - 1)[:shortlist]
+            candidates = candidates[keep]
+        exact = self.exact_distances(candidates, probe)
+        order = np.argsort(exact)[:k]
+        return candidates[order], exact[order]
+
+    def _subset_distances(self, rows, probe):
+        probe = np.asarray(probe, dtype=np.float32)
+        rows = np.asarray(rows)
+        block = self._decode_codes(self._codes[rows])
+        distances = self._norms[rows] - 2 * (block @ probe) + probe @ probe
+        return np.maximum(distances, 0)
+
+    def nearest(self, probe, tolerance=None):
+        """(row index, distance) of the closest embedding, or (None, inf) for an empty gallery
+
+        With ``candidates`` set, only the embeddings of the employees with the
+        closest centroids are compared, plus any other employee whose bound
+        (centroid distance minus radius) is below the best distance found. With
+        ``tolerance`` that bound is capped at it: every embedding within
+        ``tolerance`` is still found with its exact distance, so accept/reject
+        decisions at that threshold match the exhaustive search, but for a
+        probe with no match the distance returned may not be the smallest.
+        """
+        if not len(self):
+            return None, float('inf')
+        if not self.candidates or len(self.employees) <= self.candidates:
+            rows, distances = self.search(probe, k=1)
+            return int(rows[0]), float(distances[0])
+
+        centroid_distances = self.centroid_distances(probe)
+        closest = np.argpartition(centroid_distances, self.candidates - 1)[:self.candidates]
+        rows, distances = self.search(probe, k=1, rows=self.employee_rows(closest))
+        index, distance = int(rows[0]), float(distances[0])
+
+        bound = distance if tolerance is None else min(distance, tolerance)
+        reachable = centroid_distances - self._radii <= bound
+        reachable[closest] = False
+        if reachable.any():
+            rows, distances = self.search(probe, k=1, rows=self.employee_rows(np.flatnonzero(reachable)))
+            if distances[0] < distance:
+                index, distance = int(rows[0]), float(distances[0])
+        return index, distance
+
+    def neighbours(self, probe, tolerance, exclude=None):
+        """{employee id: smallest exact distance} of every employee with an embedding within tolerance
+
+        Only employees whose centroid bound is within ``tolerance`` are
+        compared, so none is missed. ``exclude`` leaves out one employee (the
+        one being enrolled).
+        """
+        if not len(self):
+            return {}
+        reachable = self.centroid_distances(probe) - self._radii <= tolerance
+        if exclude is not None:
+            reachable &= self.employees != exclude
+        positions = np.flatnonzero(reachable)
+        if not len(positions):
+            return {}
+
+        distances = self.exact_distances(self.employee_rows(positions), probe)
+        counts = self._starts[positions + 1] - self._starts[positions]
+        closest = np.minimum.reduceat(distances, np.cumsum(counts) - counts)
+        return {
+            int(self.employees[position]): float(distance)
+            for position, distance in zip(positions, closest) if distance <= tolerance
+        }
+
+    def close_pairs(self, tolerance, block_size=PAIR_BLOCK):
+        """(employee a, employee b, distance) for every two employees with embeddings within tolerance
+
+        Closest pairs first, a < b. Centroids are compared all-pairs in tiles
+        of matrix products. Only employee pairs whose bound (centroid distance
+        minus both radii) is within ``tolerance`` have their embeddings
+        compared, one employee against all its candidates in one product.
+        """
+        centroids = self._decode_codes(self._centroid_codes)
+        norms, radii = self._centroid_norms, self._radii
+        count = len(centroids)
+        # Squared centroid distance a row may reach with the largest radius
+        # on the other side; pairs above it are dropped without a square root
+        reach = (tolerance + radii + (radii.max() if count else 0)) ** 2 - norms
+        first, second = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+        # Tiles on and above the diagonal cover every pair once
+        for row in range(0, count, block_size):
+            rows = slice(row, min(row + block_size, count))
+            for col in range(row, count, block_size):
+                cols = slice(col, min(col + block_size, count))
+                tile = centroids[rows] @ centroids[cols].T
+                tile *= -2
+                tile += norms[None, cols]
+                close = tile <= reach[rows, None]
+                if row == col:
+                    close = np.triu(close, k=1)
+                a, b = np.nonzero(close)
+                a += row
+                b += col
+
+                # The exact bound for the pairs left
+                distances = np.sqrt(np.maximum(tile[close] + norms[a], 0))
+                keep = distances - radii[a] - radii[b] <= tolerance
+                first.append(a[keep])
+                second.append(b[keep])
+
+        first, second = np.concatenate(first), np.concatenate(second)
+        order = np.argsort(first, kind='stable')
+        first, second = first[order], second[order]
+
+        vectors = self.embeddings()
+        squared = np.einsum('ij,ij->i', vectors, vectors)
+        pairs = []
+        positions, starts = np.unique(first, return_index=True)
+        for position, candidates in zip(positions, np.split(second, starts[1:])):
+            own = slice(self._starts[position], self._starts[position + 1])
+            rows = self.employee_rows(candidates)
+            block = squared[own, None] + squared[None, rows] - 2 * (vectors[own] @ vectors[rows].T)
+            counts = self._starts[candidates + 1] - self._starts[candidates]
+            closest = np.sqrt(np.maximum(np.minimum.reduceat(block.min(axis=0), np.cumsum(counts) - counts), 0))
+            found = closest <= tolerance
+            pairs.extend(zip(
+                self.employees[np.full(found.sum(), position)].tolist(),
+                self.employees[candidates[found]].tolist(),
+                closest[found].tolist()
+            ))
+        return sorted(pairs, key=lambda pair: pair[2])
+
+    def memory_bytes(self):
+        """Bytes held in memory by the gallery arrays"""
+        total = self._codes.nbytes + self._norms.nbytes + self.labels.nbytes
+        total += self._centroid_codes.nbytes + self._centroid_norms.nbytes + self._radii.nbytes
+        total += self.employees.nbytes + self._starts.nbytes
+        if self._scale is not None:
+            total += self._scale.nbytes + self._offset.nbytes
+        return total
+
+    def disk_bytes(self):
+        """Bytes of float32 originals kept on disk for re-ranking"""
+        return self._originals.nbytes if isinstance(self._originals, np.memmap) else 0
+
+def gallery_payload(db):
+    """Embeddings, labels and names of every enrolled employee, read from the database
+
+    Returns a float32 array, a list of employee ids and an id-to-name dict,
+    ready for ``EmbeddingStore.from_embeddings`` and cheap to ship to worker
+    processes.
+    """
+    from models import Employee
+
+    embeddings = []
+    labels = []
+    names = {}
+    for employee in db.session.query(Employee).filter(Employee.face_embeddings.isnot(None)):
+        employee_embeddings = json.loads(employee.face_embeddings)
+        embeddings.extend(employee_embeddings)
+        labels.extend([employee.id] * len(employee_embeddings))
+        names[employee.id] = employee.name
+    return np.asarray(embeddings, dtype=np.float32).reshape(-1, 128), labels, names
@@ -0,0 +1,282 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+import numpy as np
+from werkzeug.utils import secure_filename
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'max_dimension': 800,
+    'crop_size': 300,
+    'model': 'hog',
+    'upsample': 1,
+    'num_jitters': 1,
+}
+
+def enrollment_settings(config=None):
+    """Build encoder settings for enrollment from the application config"""
+    if config is None:
+        return dict(DEFAULT_SETTINGS)
+
+    return {
+        'max_dimension': config.get('ENROLLMENT_MAX_DIMENSION', DEFAULT_SETTINGS['max_dimension']),
+        'crop_size': config.get('ENROLLMENT_CROP_SIZE', DEFAULT_SETTINGS['crop_size']),
+        'model': config.get('ENROLLMENT_DETECTION_MODEL', DEFAULT_SETTINGS['model']),
+        'upsample': config.get('ENROLLMENT_UPSAMPLE', DEFAULT_SETTINGS['upsample']),
+        'num_jitters': config.get('ENROLLMENT_NUM_JITTERS', DEFAULT_SETTINGS['num_jitters']),
+    }
+
+CONFLICT_ACTIONS = ('reject', 'flag', 'off')
+
+DEFAULT_CONFLICT_SETTINGS = {
+    'action': 'reject',
+    'distance': 0.5,
+}
+
+def conflict_settings(config=None):
+    """Build the duplicate and conflicting-identity check for enrollment from the application config"""
+    if config is None:
+        return dict(DEFAULT_CONFLICT_SETTINGS)
+
+    return {
+        'action': config.get('ENROLLMENT_CONFLICT_ACTION', DEFAULT_CONFLICT_SETTINGS['action']),
+        'distance': config.get('ENROLLMENT_CONFLICT_DISTANCE', DEFAULT_CONFLICT_SETTINGS['distance']),
+    }
+
+class EnrolledGallery:
+    """Embeddings of every enrolled employee, kept between enrollment conflict checks
+
+    The first refresh builds the store from the database. Later ones only
+    read employee ids and ``updated_at``, re-read the employees that changed
+    (whoever changed them: upload jobs, the CLI, a re-embedding switch) and
+    patch them in with ``with_employee()``, so a check costs the size of the
+    change rather than of the gallery.
+    """
+
+    # Above this share of changed employees a full build is cheaper than patching
+    REBUILD_FRACTION = 0.25
+
+    def __init__(self, db):
+        self.db = db
+        self.gallery = None
+        self.seen = {}  # Employee id -> updated_at of the embeddings in the store
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Bring the store up to date with the database and return it"""
+        from models import Employee
+        from embedding_store import EmbeddingStore, gallery_payload
+
+        # Held across the reads so two workers never patch from different snapshots
+        with self._lock:
+            # Stamps are read first: a row updated meanwhile is stored newer than
+            # its stamp and simply read again on the next refresh
+            current = dict(self.db.session.query(Employee.id, Employee.updated_at))
+            changed = [employee_id for employee_id, stamp in current.items() if self.seen.get(employee_id) != stamp]
+            removed = [employee_id for employee_id in self.seen if employee_id not in current]
+
+            if self.gallery is None or len(changed) + len(removed) > self.REBUILD_FRACTION * len(current):
+                vectors, labels, names = gallery_payload(self.db)
+                self.gallery = EmbeddingStore.from_embeddings(vectors, labels, names=names)
+            else:
+                gallery = self.gallery
+                for employee_id in removed:
+                    gallery = gallery.with_employee(employee_id, [])
+                if changed:
+                    for employee in Employee.query.filter(Employee.id.in_(changed)):
+                        embeddings = json.loads(employee.face_embeddings) if employee.face_embeddings else []
+                        gallery = gallery.with_employee(employee.id, embeddings, employee.name)
+                self.gallery = gallery
+            self.seen = current
+            return self.gallery
+
+def find_identity_conflicts(db, embeddings, settings=None, employee_id=None, enrolled=None):
+    """Enrolled employees with an embedding within the conflict distance of a new one
+
+    Catches the same person enrolled again under another email, and two
+    people too alike to tell apart. ``employee_id`` is the employee being
+    enrolled, whose own embeddings are ignored. ``enrolled`` is an
+    ``EnrolledGallery`` kept by a long-running caller; without one the
+    gallery is read in full. Returns a list of dicts with ``photo``
+    (1-based index into ``embeddings``), ``employee_id``, ``name`` and
+    ``distance``, closest first.
+    """
+    settings = {**DEFAULT_CONFLICT_SETTINGS, **(settings or {})}
+    if settings['action'] == 'off' or not len(embeddings):
+        return []
+
+    gallery = (enrolled or EnrolledGallery(db)).refresh()
+    conflicts = []
+    for i, embedding in enumerate(embeddings):
+        for other_id, distance in gallery.neighbours(embedding, settings['distance'], exclude=employee_id).items():
+            conflicts.append({'photo': i + 1, 'employee_id': other_id, 'name': gallery.names.get(other_id), 'distance': distance})
+    return sorted(conflicts, key=lambda conflict: conflict['distance'])
+
+def load_oriented_image(photo_path):
+    """Load a photo as an RGB array, applying its EXIF orientation"""
+    from PIL import Image, ImageOps
+
+    with Image.open(photo_path) as img:
+        img = ImageOps.exif_transpose(img)
+        return np.asarray(img.convert('RGB'))
+
+def preprocess_photo(photo_path, settings=None):
+    """Detect the enrollment face on a downscaled copy and encode it from a normalized crop
+
+    Returns a dict with the embedding, the face location in original image
+    coordinates, the oriented image and per-stage timings in milliseconds.
+    """
+    import cv2
+    import face_recognition
+    from utils import resize_image
+
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    timings = {}
+
+    start = time.perf_counter()
+    image = load_oriented_image(photo_path)
+    timings['load'] = (time.perf_counter() - start) * 1000
+
+    # Detect on a small copy; HOG cost grows with the pixel count
+    start = time.perf_counter()
+    max_dimension = settings['max_dimension']
+    small = resize_image(image, max_width=max_dimension, max_height=max_dimension)
+    scale = image.shape[1] / small.shape[1]
+    timings['resize'] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    locations = face_recognition.face_locations(
+        small,
+        number_of_times_to_upsample=settings['upsample'],
+        model=settings['model']
+    )
+    timings['detect'] = (time.perf_counter() - start) * 1000
+
+    if not locations:
+        raise ValueError(f"No face found in photo {photo_path}")
+
+    if len(locations) > 1:
+        logger.warning(f"Multiple faces found in photo {photo_path}, using the largest one")
+    top, right, bottom, left = max(locations, key=lambda loc: (loc[2] - loc[0]) * (loc[1] - loc[3]))
+
+    # Map the box back to full resolution and cut a crop with some context
+    # around it, scaled so every enrollment face has roughly the same size
+    start = time.perf_counter()
+    top, right, bottom, left = (int(round(v * scale)) for v in (top, right, bottom, left))
+    margin = (bottom - top) // 2
+    crop_top = max(0, top - margin)
+    crop_left = max(0, left - margin)
+    crop_bottom = min(image.shape[0], bottom + margin)
+    crop_right = min(image.shape[1], right + margin)
+    crop = image[crop_top:crop_bottom, crop_left:crop_right]
+
+    crop_scale = settings['crop_size'] / max(crop.shape[:2])
+    crop = cv2.resize(crop, None, fx=crop_scale, fy=crop_scale, interpolation=cv2.INTER_AREA if crop_scale < 1 else cv2.INTER_LINEAR)
+    crop = np.ascontiguousarray(crop)
+    box = (
+        int((top - crop_top) * crop_scale),
+        int((right - crop_left) * crop_scale),
+        int((bottom - crop_top) * crop_scale),
+        int((left - crop_left) * crop_scale),
+    )
+    timings['crop'] = (time.perf_counter() - start) * 1000
+
+    # face_encodings aligns the crop on its landmarks before computing the embedding
+    start = time.perf_counter()
+    encodings = face_recognition.face_encodings(crop, known_face_locations=[box], num_jitters=settings['num_jitters'])
+    timings['encode'] = (time.perf_counter() - start) * 1000
+
+    if not encodings:
+        raise ValueError(f"No face found in photo {photo_path}")
+
+    timings['total'] = sum(timings.values())
+    logger.debug(f"Enrollment timings for {photo_path}: " + ", ".join(f"{k}={v:.1f}ms" for k, v in timings.items()))
+
+    return {
+        'embedding': encodings[0].tolist(),
+        'location': (top, right, bottom, left),
+        'image': image,
+        'timings': timings,
+    }
+
+def process_photo(photo_path, settings=None, cache=None):
+    """Encode an enrollment photo, reusing a cached embedding of identical content
+
+    Returns the same dict as ``preprocess_photo`` plus a ``cached`` flag. On a
+    cache hit ``image`` is None and ``timings`` only covers the lookup.
+    """
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+
+    if cache is None:
+        result = preprocess_photo(photo_path, settings)
+        result['cached'] = False
+        return result
+
+    start = time.perf_counter()
+    key = cache.make_key(photo_path, settings)
+    entry = cache.get(key)
+    if entry is not None:
+        lookup_ms = (time.perf_counter() - start) * 1000
+        return {
+            'embedding': entry['embedding'],
+            'location': entry['location'],
+            'image': None,
+            'timings': {'cache': lookup_ms, 'total': lookup_ms},
+            'cached': True,
+        }
+
+    result = preprocess_photo(photo_path, settings)
+    cache.put(key, result['embedding'], result['location'])
+    result['cached'] = False
+    return result
+
+def encode_photo(photo_path, settings=None, cache=None):
+    """Generate a face embedding for a single enrollment photo"""
+    return process_photo(photo_path, settings, cache)['embedding']
+
+def enroll_employee_photos(task):
+    """Encode and store the photos of one employee (runs inside a worker process)
+
+    ``task`` is a dict with ``name``, ``email``, ``photo_paths``, ``upload_folder``,
+    ``encode``, ``settings`` and ``cache`` keys. Returns a result dict that is
+    safe to send back to the parent process. Photos are copied under names no
+    other employee uses, so a copy made for an insert that fails never replaces
+    an enrolled photo and can simply be deleted.
+    """
+    result = {
+        'name': task['name'],
+        'email': task['email'],
+        'embeddings': [],
+        'photo_paths': [],
+        'error': None,
+    }
+
+    try:
+        employee_folder = os.path.join(task['upload_folder'], "employees")
+        os.makedirs(employee_folder, exist_ok=True)
+
+        for i, photo_path in enumerate(task['photo_paths']):
+            if task['encode']:
+                result['embeddings'].append(encode_photo(photo_path, task.get('settings'), task.get('cache')))
+
+            _, ext = os.path.splitext(photo_path)
+            filename = secure_filename(f"{task['email']}_{i+1}_{uuid.uuid4().hex[:12]}{ext.lower() or '.jpg'}")
+            save_path = os.path.join(employee_folder, filename)
+            shutil.copy2(photo_path, save_path)
+            result['photo_paths'].append(save_path)
+
+    except Exception as e:
+        # Don't leave half-copied photos behind for a failed employee
+        for saved_path in result['photo_paths']:
+            if os.path.exists(saved_path):
+                os.remove(saved_path)
+        result['embeddings'] = []
+        result['photo_paths'] = []
+        result['error'] = str(e)
+
+    return result
@@ -0,0 +1,80 @@
+import cv2
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Reasons a face can be rejected, in the order the checks run (cheapest first)
+REJECT_REASONS = ('size', 'brightness', 'sharpness', 'pose')
+
+# Side of the square the crop is resized to before measuring sharpness, so the
+# threshold means the same for near and far faces
+SHARPNESS_SIZE = 64
+
+def quality_settings(config):
+    """Quality thresholds from the configuration (a Config, snapshot or dict)"""
+    get = config.get if config else (lambda key, default=None: default)
+    return {
+        'enabled': get('QUALITY_GATE_ENABLED', True),
+        'min_size': get('QUALITY_MIN_FACE_SIZE', 40),
+        'min_sharpness': get('QUALITY_MIN_SHARPNESS', 15.0),
+        'min_brightness': get('QUALITY_MIN_BRIGHTNESS', 40),
+        'max_brightness': get('QUALITY_MAX_BRIGHTNESS', 220),
+        'max_pose_offset': get('QUALITY_MAX_POSE_OFFSET', 0.5),
+    }
+
+def sharpness(gray_face):
+    """Variance of the Laplacian of a grayscale face crop; low means blurry"""
+    resized = cv2.resize(gray_face, (SHARPNESS_SIZE, SHARPNESS_SIZE), interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(resized, cv2.CV_64F).var())
+
+def pose_offset(landmarks):
+    """Horizontal offset of the nose from the midpoint between the eyes
+
+    Measured in units of the distance between the eyes, from the 5-point
+    landmarks: about 0 for a frontal face and growing as the head turns
+    towards profile.
+    """
+    left_eye = landmarks.get('left_eye')
+    right_eye = landmarks.get('right_eye')
+    nose = landmarks.get('nose_tip')
+    if not (left_eye and right_eye and nose):
+        return None
+
+    left_x = sum(x for x, _ in left_eye) / len(left_eye)
+    right_x = sum(x for x, _ in right_eye) / len(right_eye)
+    nose_x = sum(x for x, _ in nose) / len(nose)
+    eye_distance = abs(right_x - left_x)
+    if eye_distance < 1:
+        return float('inf')
+    return abs(nose_x - (left_x + right_x) / 2) / eye_distance
+
+def assess_face(frame, frame_location, settings, landmarks=None):
+    """Return the reason a face fails the quality gate, or None if it passes
+
+    ``frame`` is the full-resolution BGR frame and ``frame_location`` the
+    (top, right, bottom, left) box in it. ``landmarks`` is called with no
+    arguments to get the face's 5-point landmarks; it only runs once the
+    cheaper checks have passed.
+    """
+    top, right, bottom, left = frame_location
+    if min(bottom - top, right - left) < settings['min_size']:
+        return 'size'
+
+    face = frame[max(0, top):bottom, max(0, left):right]
+    if face.size == 0:
+        return 'size'
+    gray = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+
+    brightness = float(gray.mean())
+    if not settings['min_brightness'] <= brightness <= settings['max_brightness']:
+        return 'brightness'
+
+    if sharpness(gray) < settings['min_sharpness']:
+        return 'sharpness'
+
+    if settings['max_pose_offset'] and landmarks is not None:
+        offset = pose_offset(landmarks() or {})
+        if offset is not None and offset > settings['max_pose_offset']:
+            return 'pose'
+
+    return None
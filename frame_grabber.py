@@ -0,0 +1,95 @@
+import time
+import logging
+import threading
+
+from frame_ring import Frame
+
+logger = logging.getLogger(__name__)
+
+class FrameGrabber:
+    """Reads a camera on its own thread and keeps only the newest frame
+
+    A camera queues frames in its driver. When the loop reading them is
+    slower than the camera the queue fills up, and every read returns a frame
+    that is older than the last. The grabber drains the camera as fast as it
+    delivers and keeps just the latest frame, with its sequence number and
+    capture time, so the processing loop always gets the freshest one. Frames
+    replaced before anyone took them show up as gaps in the sequence numbers.
+
+    With ``reuse_buffers`` (for cv2.VideoCapture, whose read() fills a given
+    array) frames are read into a few recycled arrays. A frame returned by
+    latest() is left untouched until the next call to latest().
+    """
+
+    def __init__(self, camera, reuse_buffers=False, name='frame-grabber'):
+        self.camera = camera
+        self.reuse_buffers = reuse_buffers
+        self.name = name
+        self.frames = 0  # Frames read from the camera
+        self._condition = threading.Condition()
+        self._latest = None  # Newest frame not yet taken
+        self._held = None  # Frame last returned by latest()
+        self._free = []  # Arrays the camera can read into
+        self._running = False
+        self._finished = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """Stop grabbing; waits up to timeout for a read in progress to return"""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            while self._running:
+                if self.reuse_buffers:
+                    with self._condition:
+                        buffer = self._free.pop() if self._free else None
+                    ret, image = self.camera.read(buffer)
+                else:
+                    ret, image = self.camera.read()
+                timestamp = time.monotonic()
+                if not ret:
+                    break
+
+                with self._condition:
+                    if self._latest is not None and self.reuse_buffers:
+                        self._free.append(self._latest.image)
+                    self.frames += 1
+                    self._latest = Frame(self.frames, image, timestamp)
+                    self._condition.notify_all()
+        except Exception as e:
+            logger.error(f"Error reading from camera: {str(e)}")
+        finally:
+            with self._condition:
+                self._finished = True
+                self._condition.notify_all()
+
+    def latest(self, timeout=None):
+        """Take the newest frame not returned before, waiting up to timeout for one
+
+        Returns None on timeout, after stop(), or once the camera stopped
+        delivering and the last frame has been taken.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._latest is not None or self._finished or not self._running, timeout
+            )
+            frame = self._latest
+            if frame is None:
+                return None
+
+            self._latest = None
+            if self._held is not None and self.reuse_buffers:
+                self._free.append(self._held.image)
+            self._held = frame
+            return frame
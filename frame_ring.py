@@ -0,0 +1,180 @@
+import time
+import logging
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Header: magic, slots, height, width, channels, head sequence
+HEADER_FIELDS = 6
+MAGIC = 0x46524D52  # "FRMR"
+ALIGNMENT = 64
+
+Frame = namedtuple('Frame', ['seq', 'image', 'timestamp'])
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+class FrameRing:
+    """Fixed-size ring of frame slots in shared memory
+
+    One capture process writes frames in place and any number of processes
+    read them as NumPy views of the shared block, so a frame is never pickled
+    or copied between processes. Every slot carries the sequence number of
+    the frame in it; the writer marks a slot as being written (negative
+    sequence) before touching the pixels and publishes the sequence when
+    done, so a reader can tell whether a view still holds the frame it asked
+    for. The writer never waits: when a reader falls behind, old frames are
+    overwritten and the reader skips ahead (see RingReader).
+    """
+
+    def __init__(self, shm, created):
+        self.shm = shm
+        self.created = created
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        if header[0] != MAGIC:
+            raise ValueError(f"Shared memory block '{shm.name}' is not a frame ring")
+
+        self.slots = int(header[1])
+        self.shape = (int(header[2]), int(header[3]), int(header[4]))
+        self._header = header
+
+        offset = HEADER_FIELDS * 8
+        self._seqs = np.ndarray((self.slots,), dtype=np.int64, buffer=shm.buf, offset=offset)
+        offset += self.slots * 8
+        self._timestamps = np.ndarray((self.slots,), dtype=np.float64, buffer=shm.buf, offset=offset)
+        offset = _align(offset + self.slots * 8)
+        self._frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+
+    @staticmethod
+    def size_for(slots, shape):
+        """Bytes of shared memory needed for a ring"""
+        return _align(HEADER_FIELDS * 8 + slots * 16) + slots * int(np.prod(shape))
+
+    @classmethod
+    def create(cls, slots=8, shape=(480, 640, 3), name=None):
+        """Allocate a new ring; the creator is responsible for unlink()"""
+        if slots < 2:
+            raise ValueError("A frame ring needs at least 2 slots")
+        if len(shape) == 2:
+            shape = tuple(shape) + (1,)
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=cls.size_for(slots, shape))
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = (MAGIC, slots, shape[0], shape[1], shape[2], 0)
+        np.ndarray((slots,), dtype=np.int64, buffer=shm.buf, offset=HEADER_FIELDS * 8)[:] = 0
+        return cls(shm, created=True)
+
+    @classmethod
+    def attach(cls, name):
+        """Open a ring created by another process"""
+        from multiprocessing import resource_tracker
+
+        # Child processes share their parent's resource tracker. An unrelated
+        # process starts its own, and before Python 3.13 attaching registers the
+        # block with it, so it would be unlinked when this process exits.
+        own_tracker = getattr(resource_tracker._resource_tracker, '_fd', None) is None
+        shm = shared_memory.SharedMemory(name=name)
+        if own_tracker:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return cls(shm, created=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def head(self):
+        """Sequence number of the newest complete frame (0 before the first)"""
+        return int(self._header[5])
+
+    def begin_write(self):
+        """Claim the next slot and return (seq, view) to capture into in place
+
+        For example ``camera.read(image=view)`` decodes straight into shared
+        memory. Call commit(seq) once the frame is complete.
+        """
+        seq = self.head + 1
+        slot = (seq - 1) % self.slots
+        self._seqs[slot] = -seq
+        return seq, self._frames[slot]
+
+    def commit(self, seq, timestamp=None):
+        """Publish a frame written into the slot claimed by begin_write"""
+        slot = (seq - 1) % self.slots
+        self._timestamps[slot] = time.time() if timestamp is None else timestamp
+        self._seqs[slot] = seq
+        self._header[5] = seq
+
+    def write(self, frame, timestamp=None):
+        """Copy a frame into the next slot and publish it"""
+        seq, view = self.begin_write()
+        np.copyto(view, frame.reshape(self.shape))
+        self.commit(seq, timestamp)
+        return seq
+
+    def get(self, seq):
+        """Frame with this sequence number as a zero-copy view, or None if it is gone"""
+        slot = (seq - 1) % self.slots
+        if seq <= 0 or self._seqs[slot] != seq:
+            return None
+        frame = Frame(seq, self._frames[slot], float(self._timestamps[slot]))
+        # The writer may have claimed the slot while we read the timestamp
+        return frame if self._seqs[slot] == seq else None
+
+    def valid(self, seq):
+        """Whether a view returned for seq still holds that frame"""
+        return seq > 0 and self._seqs[(seq - 1) % self.slots] == seq
+
+    def close(self):
+        # Views into the block must be dropped before the mapping can close
+        self._header = self._seqs = self._timestamps = self._frames = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+class RingReader:
+    """Per-consumer cursor over a FrameRing with overwrite-on-lag semantics
+
+    Frames are returned in order. If the writer has lapped the reader, the
+    frames it missed are counted in ``dropped`` and reading resumes at the
+    oldest frame that is still safe to read.
+    """
+
+    def __init__(self, ring, poll_interval=0.001, from_start=False):
+        self.ring = ring
+        self.poll_interval = poll_interval
+        self.next_seq = 1 if from_start else ring.head + 1
+        self.dropped = 0
+        self.delivered = 0
+
+    def read(self, timeout=None, latest=False):
+        """Next frame (or the newest one with latest=True); None on timeout
+
+        The image is a view into shared memory. Copy it, or check
+        ``ring.valid(frame.seq)`` after using it, if the reader can fall more
+        than ``slots - 1`` frames behind.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            head = self.ring.head
+            if head >= self.next_seq:
+                # The slot after head may already be mid-write, so stay one slot clear of it
+                oldest = max(1, head - self.ring.slots + 2)
+                target = head if latest else max(self.next_seq, oldest)
+                self.dropped += target - self.next_seq
+                self.next_seq = target
+                frame = self.ring.get(target)
+                if frame is not None:
+                    self.next_seq = target + 1
+                    self.delivered += 1
+                    return frame
+                # Overwritten between reading head and the slot; the next pass counts it as dropped
+                continue
+
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
@@ -0,0 +1,166 @@
+import os
+import json
+import uuid
+import logging
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from models import Employee, UploadJob
+
+logger = logging.getLogger(__name__)
+
+class UploadJobQueue:
+    """Database-backed queue that processes employee photo uploads in a worker pool"""
+
+    def __init__(self, app, db, max_workers=2, on_gallery_changed=None, stale_after_minutes=10,
+                 encoder_settings=None, embedding_cache=None, conflict_settings=None):
+        self.app = app
+        self.db = db
+        self.encoder_settings = encoder_settings
+        from enrollment import EnrolledGallery
+
+        self.conflict_settings = conflict_settings  # None skips the duplicate check
+        # Built by the first check and patched with what changed by later ones
+        self.enrolled = EnrolledGallery(db) if conflict_settings else None
+        self.embedding_cache = embedding_cache
+        self.on_gallery_changed = on_gallery_changed
+        self.stale_after = timedelta(minutes=stale_after_minutes)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upload-job')
+
+    def enqueue(self, employee_id, photo_paths):
+        """Persist a new job for the saved photos and hand it to the worker pool"""
+        job = UploadJob(
+            id=uuid.uuid4().hex,
+            employee_id=employee_id,
+            status='queued',
+            photo_paths=json.dumps(photo_paths),
+            total=len(photo_paths),
+            processed=0,
+            errors=json.dumps([])
+        )
+        self.db.session.add(job)
+        self.db.session.commit()
+
+        self.submit(job.id)
+        return job
+
+    def submit(self, job_id):
+        """Schedule a persisted job on the worker pool"""
+        self.executor.submit(self.process, job_id)
+
+    def recover(self):
+        """Resubmit jobs left queued or stuck running by a previous process"""
+        try:
+            stale_before = datetime.utcnow() - self.stale_after
+            stuck = UploadJob.query.filter(
+                UploadJob.status == 'running',
+                UploadJob.updated_at < stale_before
+            ).all()
+            for job in stuck:
+                job.status = 'queued'
+            self.db.session.commit()
+
+            pending = UploadJob.query.filter_by(status='queued').all()
+            for job in pending:
+                self.submit(job.id)
+
+            if pending:
+                logger.info(f"Recovered {len(pending)} pending upload jobs")
+            return len(pending)
+
+        except Exception as e:
+            logger.error(f"Error recovering upload jobs: {str(e)}")
+            return 0
+
+    def process(self, job_id):
+        """Encode every photo of a job, recording progress as it goes"""
+        from enrollment import encode_photo, find_identity_conflicts
+
+        with self.app.app_context():
+            try:
+                # Claim the job atomically so concurrent workers never run it twice
+                claimed = UploadJob.query.filter_by(id=job_id, status='queued').update(
+                    {'status': 'running', 'updated_at': datetime.utcnow()}
+                )
+                self.db.session.commit()
+                if not claimed:
+                    return
+
+                job = self.db.session.get(UploadJob, job_id)
+                photo_paths = json.loads(job.photo_paths)
+                embeddings = []
+                errors = []
+
+                for i, photo_path in enumerate(photo_paths):
+                    try:
+                        embeddings.append(encode_photo(photo_path, self.encoder_settings, self.embedding_cache))
+                    except Exception as e:
+                        errors.append({'photo': i + 1, 'path': photo_path, 'error': str(e)})
+
+                    job.processed = i + 1
+                    job.errors = json.dumps(errors)
+                    self.db.session.commit()
+
+                # Faces too close to another employee: the same person under a second
+                # email, or someone the matcher could not tell apart from them
+                conflicts = []
+                if not errors and self.conflict_settings:
+                    conflicts = [
+                        {
+                            'photo': conflict['photo'],
+                            'path': photo_paths[conflict['photo'] - 1],
+                            'error': f"Too similar to employee {conflict['employee_id']} ({conflict['name']}), "
+                                     f"distance {conflict['distance']:.2f}",
+                            'employee_id': conflict['employee_id'],
+                            'distance': conflict['distance'],
+                        }
+                        for conflict in find_identity_conflicts(
+                            self.db, embeddings, self.conflict_settings, job.employee_id, self.enrolled
+                        )
+                    ]
+                    if self.conflict_settings['action'] == 'reject':
+                        errors = conflicts
+                    elif conflicts:
+                        logger.warning(f"Upload job {job_id} flagged: {conflicts[0]['error']}")
+
+                if errors:
+                    # Keep the all-or-nothing behaviour of synchronous uploads
+                    for photo_path in photo_paths:
+                        if os.path.exists(photo_path):
+                            os.remove(photo_path)
+                    job.status = 'failed'
+                    job.errors = json.dumps(errors)
+                    job.finished_at = datetime.utcnow()
+                    self.db.session.commit()
+                    logger.warning(f"Upload job {job_id} failed: {len(errors)} of {len(photo_paths)} photos rejected")
+                    return
+
+                employee = self.db.session.get(Employee, job.employee_id)
+                employee.face_embeddings = json.dumps(embeddings)
+                employee.photo_paths = json.dumps(photo_paths)
+                job.errors = json.dumps(conflicts)  # Flagged conflicts of a completed job
+                job.status = 'completed'
+                job.finished_at = datetime.utcnow()
+                self.db.session.commit()
+
+                logger.info(f"Upload job {job_id} completed with {len(embeddings)} face encodings")
+                if self.embedding_cache:
+                    stats = self.embedding_cache.stats()
+                    logger.info(f"Embedding cache hit rate: {stats['hit_rate']:.1%} "
+                                f"({stats['hits']} hits, {stats['misses']} misses)")
+
+                if self.on_gallery_changed:
+                    self.on_gallery_changed(job.employee_id)
+
+            except Exception as e:
+                logger.error(f"Error processing upload job {job_id}: {str(e)}")
+                self.db.session.rollback()
+                UploadJob.query.filter_by(id=job_id).update({
+                    'status': 'failed',
+                    'errors': json.dumps([{'photo': None, 'path': None, 'error': str(e)}]),
+                    'finished_at': datetime.utcnow()
+                })
+                self.db.session.commit()
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs and optionally wait for running ones"""
+        self.executor.shutdown(wait=wait)
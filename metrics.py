@@ -0,0 +1,246 @@
+import time
+import bisect
+import threading
+
+# Latency buckets in seconds, from sub-millisecond matching up to slow CNN detection
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+def _format_value(value):
+    """Format a sample value the way Prometheus expects"""
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape_label_value(value):
+    """Escape backslashes, newlines and quotes in a label value"""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    """Render a label set as {name="value",...}"""
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + '}'
+
+class _Metric:
+    """Base class handling labelled children"""
+
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *labelvalues):
+        """Return the child metric for a set of label values"""
+        key = tuple(str(value) for value in labelvalues)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        # Unlabelled metrics use a single child with no label values
+        return self.labels()
+
+    def collect(self):
+        """Yield exposition lines for this metric"""
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type_name}"
+        for labelvalues, child in sorted(self._children.items()):
+            yield from child.samples(self.name, self.labelnames, labelvalues)
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labelnames, labelvalues):
+        yield f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(self.value)}"
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name, labelnames, labelvalues):
+        yield f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(self.value)}"
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default().set(value)
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+    def samples(self, name, labelnames, labelvalues):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            labels = _format_labels(labelnames, labelvalues, ('le', _format_value(bound)))
+            yield f"{name}_bucket{labels} {cumulative}"
+        yield f"{name}_sum{_format_labels(labelnames, labelvalues)} {_format_value(total)}"
+        yield f"{name}_count{_format_labels(labelnames, labelvalues)} {cumulative}"
+
+class _Timer:
+    """Context manager observing the duration of its block"""
+
+    __slots__ = ('child', 'start')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+REGISTRY = MetricsRegistry()
+
+# Recognition pipeline metrics
+STAGE_LATENCY = Histogram(
+    'face_attendance_stage_seconds',
+    'Latency of each recognition pipeline stage',
+    labelnames=('stage',),
+    registry=REGISTRY
+)
+FRAMES = Counter(
+    'face_attendance_frames_total',
+    'Camera frames by outcome (read, processed, skipped, dropped)',
+    labelnames=('outcome',),
+    registry=REGISTRY
+)
+FACES = Counter(
+    'face_attendance_faces_total',
+    'Faces by outcome (detected, rejected, recognized, unknown)',
+    labelnames=('outcome',),
+    registry=REGISTRY
+)
+REJECTIONS = Counter(
+    'face_attendance_faces_rejected_total',
+    'Faces dropped by the quality gate before encoding, by reason',
+    labelnames=('reason',),
+    registry=REGISTRY
+)
+FRAME_AGE = Histogram(
+    'face_attendance_frame_age_seconds',
+    'Time from capturing a frame to the start of its processing',
+    registry=REGISTRY
+)
+ERRORS = Counter(
+    'face_attendance_errors_total',
+    'Errors raised in the recognition pipeline',
+    labelnames=('stage',),
+    registry=REGISTRY
+)
+
+# Pre-bound children keep label lookups out of the per-frame path
+STAGES = {
+    stage: STAGE_LATENCY.labels(stage)
+    for stage in ('capture', 'resize', 'detect', 'quality', 'encode', 'match', 'db_write', 'image_write', 'notify')
+}
+FRAMES_READ = FRAMES.labels('read')
+FRAMES_PROCESSED = FRAMES.labels('processed')
+FRAMES_SKIPPED = FRAMES.labels('skipped')
+FRAMES_DROPPED = FRAMES.labels('dropped')
+FACES_DETECTED = FACES.labels('detected')
+FACES_REJECTED = FACES.labels('rejected')
+FACES_RECOGNIZED = FACES.labels('recognized')
+FACES_UNKNOWN = FACES.labels('unknown')
+REJECTED = {reason: REJECTIONS.labels(reason) for reason in ('size', 'brightness', 'sharpness', 'pose')}
@@ -1,4 +1,6 @@
+import os
 from datetime import datetime
+from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 
@@ -7,6 +9,28 @@ class Base(DeclarativeBase):
 
 db = SQLAlchemy(model_class=Base)
 
+def create_db_app(import_name=__name__, config=None):
+    """Create a Flask app with only the database configured
+
+    The CLI uses this directly so that commands which only touch the database
+    never build the web app or import the computer vision stack.
+    ``UPLOAD_FOLDER`` comes from ``config`` (a fresh ``Config`` by default),
+    the same setting the recognition loop stores captures under.
+    """
+    if config is None:
+        from config import Config
+        config = Config()
+
+    app = Flask(import_name)
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///attendance.db")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+    app.config["UPLOAD_FOLDER"] = config.get('UPLOAD_FOLDER', 'uploads')
+    db.init_app(app)
+    return app
+
 class Employee(db.Model):
     """Employee model for storing employee information and face embeddings"""
     id = db.Column(db.Integer, primary_key=True)
@@ -42,4 +66,50 @@ class UnknownFace(db.Model):
     notified = db.Column(db.Boolean, default=False)  # Whether admin was notified
     
     def __repr__(self):
-        return f'<UnknownFace at {self.timestamp}>'
\ No newline at end of file
+        return f'<UnknownFace at {self.timestamp}>'
+
+class UploadJob(db.Model):
+    """Background job that encodes uploaded employee photos"""
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
+    status = db.Column(db.String(20), default='queued', index=True)  # queued, running, completed, failed
+    photo_paths = db.Column(db.Text)  # JSON string of saved upload paths
+    total = db.Column(db.Integer, default=0)
+    processed = db.Column(db.Integer, default=0)
+    errors = db.Column(db.Text)  # JSON string of per-photo errors
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<UploadJob {self.id} {self.status}>'
+
+class GalleryVersion(db.Model):
+    """A generation of face embeddings computed with one set of encoder settings"""
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), default='building', index=True)  # building, active, retired, abandoned
+    encoder_settings = db.Column(db.Text)  # JSON string of the enrollment settings used
+    total = db.Column(db.Integer, default=0)  # Employees with photos when the build started
+    processed = db.Column(db.Integer, default=0)
+    failed = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    activated_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<GalleryVersion {self.id} {self.status}>'
+
+class GalleryEmbedding(db.Model):
+    """One employee's embeddings staged for a gallery version until it is activated"""
+    id = db.Column(db.Integer, primary_key=True)
+    version_id = db.Column(db.Integer, db.ForeignKey('gallery_version.id'), nullable=False, index=True)
+    # Not a foreign key, so deleting an employee is never blocked by a build in progress
+    employee_id = db.Column(db.Integer, nullable=False)
+    face_embeddings = db.Column(db.Text)  # JSON string of face embeddings, empty when every photo failed
+    photo_paths = db.Column(db.Text)  # JSON string of the photos they were computed from
+    errors = db.Column(db.Text)  # JSON string of per-photo errors
+    
+    __table_args__ = (db.UniqueConstraint('version_id', 'employee_id'),)
+    
+    def __repr__(self):
+        return f'<GalleryEmbedding {self.employee_id} in version {self.version_id}>'
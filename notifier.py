@@ -1,7 +1,6 @@
 import os
 import logging
 from datetime import datetime
-from twilio.rest import Client
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +18,8 @@ class NotificationService:
             auth_token = os.environ.get("TWILIO_AUTH_TOKEN")
             
             if account_sid and auth_token:
+                # Imported only when SMS is configured; the Twilio SDK is slow to import
+                from twilio.rest import Client
                 self.twilio_client = Client(account_sid, auth_token)
                 logger.info("Twilio client initialized successfully")
             else:
@@ -0,0 +1,216 @@
+import os
+import sys
+import time
+import pstats
+import cProfile
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('sampling', 'cprofile')
+
+class ProfileSession:
+    """One time-bounded profiling run of the recognition thread
+
+    A sampler thread reads the recognition thread's stack from
+    ``sys._current_frames()`` every few milliseconds and counts collapsed
+    stacks, so the loop itself does no extra work. In ``cprofile`` mode the
+    loop additionally enables cProfile on its own thread (cProfile only sees
+    the thread that enabled it) and the session also writes a pstats file.
+    """
+
+    def __init__(self, thread_ident, output_dir, mode='sampling', seconds=10.0, frames=None,
+                 sample_interval=0.005):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profiling mode '{mode}', expected one of {', '.join(PROFILE_MODES)}")
+
+        self.thread_ident = thread_ident
+        self.output_dir = output_dir
+        self.mode = mode
+        self.seconds = seconds
+        self.max_frames = frames
+        self.sample_interval = sample_interval
+        self.started_at = datetime.now()
+        self.deadline = time.monotonic() + seconds if seconds else None
+        self.frames = 0
+        self.samples = 0
+        self.stacks = Counter()
+        self.files = {}
+        self.finished = threading.Event()
+        self._stop_sampling = threading.Event()
+        self._finish_lock = threading.Lock()
+        self._profile = None
+        self._sampler = threading.Thread(target=self._sample_loop, name='profile-sampler', daemon=True)
+
+        prefix = f"recognition_{self.started_at.strftime('%Y%m%d_%H%M%S')}"
+        self.collapsed_path = os.path.join(output_dir, prefix + ".collapsed")
+        self.pstats_path = os.path.join(output_dir, prefix + ".pstats") if mode == 'cprofile' else None
+
+    def start(self):
+        self._sampler.start()
+
+    def expired(self):
+        """Whether the time or frame budget of the session is used up"""
+        if self.max_frames and self.frames >= self.max_frames:
+            return True
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def on_frame(self):
+        """Called by the recognition thread once per loop iteration"""
+        if self.mode == 'cprofile' and self._profile is None:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+            return
+
+        self.frames += 1
+        if self.expired():
+            self.finish()
+
+    def finish(self):
+        """Stop collecting and write the result files"""
+        with self._finish_lock:
+            if self.finished.is_set():
+                return
+            if self._profile is not None:
+                # cProfile must be disabled by the thread that enabled it
+                self._profile.disable()
+            self._stop_sampling.set()
+            if self._sampler.is_alive() and threading.current_thread() is not self._sampler:
+                self._sampler.join()
+            self._write()
+
+    def _write(self):
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(self.collapsed_path, 'w') as f:
+                for stack, count in self.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            self.files['collapsed'] = self.collapsed_path
+
+            if self._profile is not None:
+                pstats.Stats(self._profile).dump_stats(self.pstats_path)
+                self.files['pstats'] = self.pstats_path
+
+            logger.info(f"Profiling finished after {self.frames} frames and {self.samples} samples: "
+                        f"{', '.join(self.files.values())}")
+        except Exception as e:
+            logger.error(f"Error writing profile: {str(e)}")
+        finally:
+            self.finished.set()
+
+    def _sample_loop(self):
+        while not self._stop_sampling.wait(self.sample_interval):
+            frame = sys._current_frames().get(self.thread_ident)
+            if frame is None:
+                break
+            self.stacks[self.collapse(frame)] += 1
+            self.samples += 1
+            # Stop sampling at the deadline even if the loop is stuck on a slow frame
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                break
+
+        # Without cProfile there is nothing left for the loop to do, so write the
+        # results now rather than waiting for a frame that may be stuck
+        if self.mode == 'sampling' and not self._stop_sampling.is_set():
+            self.finish()
+
+    @staticmethod
+    def collapse(frame):
+        """Render a stack as root;...;leaf with one module:function entry per frame"""
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def status(self):
+        return {
+            'mode': self.mode,
+            'started_at': self.started_at.isoformat(),
+            'seconds': self.seconds,
+            'max_frames': self.max_frames,
+            'frames': self.frames,
+            'samples': self.samples,
+            'finished': self.finished.is_set(),
+            'files': dict(self.files),
+        }
+
+class RecognitionProfiler:
+    """Start profiling sessions on a running recognition loop on demand
+
+    The loop only checks ``session is not None`` per frame, so profiling costs
+    nothing until a session is requested.
+    """
+
+    def __init__(self, output_dir='diagnostics', sample_interval=0.005, max_seconds=120):
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.max_seconds = max_seconds
+        self.thread_ident = None
+        self.session = None
+        self.last_session = None
+        self._lock = threading.Lock()
+
+    def attach(self, thread_ident):
+        """Record which thread runs the recognition loop"""
+        self.thread_ident = thread_ident
+
+    def start(self, mode='sampling', seconds=None, frames=None):
+        """Begin a session bounded by seconds and/or frames"""
+        if self.thread_ident is None:
+            raise RuntimeError("Recognition loop is not running")
+        if seconds is None and not frames:
+            seconds = 10.0
+        if seconds is not None and not 0 < seconds <= self.max_seconds:
+            raise ValueError(f"seconds must be between 0 and {self.max_seconds}")
+        if frames is not None and frames <= 0:
+            raise ValueError("frames must be positive")
+        # A frame-bounded session still may not run longer than max_seconds
+        seconds = seconds or self.max_seconds
+
+        with self._lock:
+            if self.session is not None:
+                if not self.session.finished.is_set():
+                    raise RuntimeError("A profiling session is already running")
+                # A sampling session can finish on its own while the loop is stalled
+                self.last_session = self.session
+            session = ProfileSession(
+                self.thread_ident, self.output_dir, mode=mode, seconds=seconds, frames=frames,
+                sample_interval=self.sample_interval
+            )
+            session.start()
+            self.session = session
+
+        logger.info(f"Profiling recognition loop ({mode}) for {seconds}s" + (f" or {frames} frames" if frames else ""))
+        return session
+
+    def on_frame(self):
+        """Advance the active session; called by the recognition thread"""
+        session = self.session
+        session.on_frame()
+        if session.finished.is_set():
+            self._complete(session)
+
+    def detach(self):
+        """Finish any active session when the recognition loop exits"""
+        session = self.session
+        if session is not None:
+            session.finish()
+            self._complete(session)
+        self.thread_ident = None
+
+    def _complete(self, session):
+        with self._lock:
+            self.last_session = session
+            self.session = None
+
+    def status(self):
+        session = self.session or self.last_session
+        return {
+            'active': session is not None and not session.finished.is_set(),
+            'session': session.status() if session else None,
+        }
@@ -1,71 +1,286 @@
 import cv2
 import face_recognition
-import numpy as np
 import os
 import json
 import threading
 import time
 from datetime import datetime, timedelta
-from models import Employee, Attendance, UnknownFace
-from utils import blur_face
+from models import Employee, Attendance, UnknownFace, GalleryVersion
+from utils import BufferPool, blur_face, get_thumbnail_path, shrink_to_rgb, write_thumbnail
+from storage import CaptureStorage
+from profiler import RecognitionProfiler
+from roi import Region, parse_rois, detection_scale
+from face_quality import assess_face, quality_settings
+from embedding_store import EmbeddingStore
+from frame_grabber import FrameGrabber
+from frame_ring import Frame
+from metrics import (
+    STAGES, ERRORS, FRAME_AGE, FRAMES_READ, FRAMES_PROCESSED, FRAMES_SKIPPED, FRAMES_DROPPED,
+    FACES_DETECTED, FACES_REJECTED, FACES_RECOGNIZED, FACES_UNKNOWN, REJECTED
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
-class FaceRecognitionSystem:
+# A camera that delivers no frame for this long is treated as failed
+CAPTURE_TIMEOUT_SECONDS = 10
+
+class FacePipeline:
+    """Finds, checks and encodes the faces in a frame
+    
+    Holds the configuration snapshot, detection regions, reusable buffers and
+    the gallery, but no camera or database, so batch workers
+    (batch_recognition.py) run exactly the steps of the live loop.
+    """
+    
+    def __init__(self, config):
+        self.config = config
+        self.gallery = EmbeddingStore()  # Replaced as a whole on every reload
+        self.regions = [Region.full_frame()]
+        self._roi_spec = ''
+        self.buffers = BufferPool()  # Per-region detection images, reused across frames
+        self.refresh_settings()
+    
+    def refresh_settings(self):
+        """Take the configuration snapshot used while handling the next frame"""
+        snapshot = getattr(self.config, 'snapshot', None)
+        self.settings = snapshot() if snapshot else self.config
+        
+        # Regions are only re-parsed when the setting changes
+        roi_spec = self.settings.get('DETECTION_ROIS', '')
+        if roi_spec != self._roi_spec:
+            try:
+                self.regions = parse_rois(roi_spec, self.config.get('CAMERA_INDEX', 0))
+                logger.info(f"Detecting faces in {len(self.regions)} region(s)")
+            except (TypeError, ValueError) as e:
+                logger.error(f"Invalid DETECTION_ROIS, searching the whole frame: {str(e)}")
+                self.regions = [Region.full_frame()]
+            self._roi_spec = roi_spec
+            self.buffers.clear()
+    
+    def build_gallery(self, embeddings, labels, names):
+        """An embedding store in the configured format"""
+        return EmbeddingStore.from_embeddings(
+            embeddings, labels,
+            mode=self.config.get('GALLERY_STORE_MODE', 'float32'),
+            rerank=self.config.get('GALLERY_RERANK', 32),
+            names=names,
+            candidates=self.config.get('GALLERY_CANDIDATES', 8)
+        )
+    
+    @property
+    def known_face_encodings(self):
+        """Gallery embeddings as a list of arrays (matching itself uses self.gallery)"""
+        return list(self.gallery.embeddings())
+    
+    @property
+    def known_face_names(self):
+        return [self.gallery.names.get(int(label)) for label in self.gallery.labels]
+    
+    @property
+    def employee_ids(self):
+        return [int(label) for label in self.gallery.labels]
+    
+    def detect_in_region(self, frame, region, found):
+        """Detect faces in one region of the frame
+        
+        Returns the rgb region image, the face locations in that image and
+        the same locations in full-frame coordinates. Faces outside a polygon
+        region, or already found by an overlapping region, are left out.
+        """
+        height, width = frame.shape[:2]
+        left, top, right, bottom = region.pixel_box(width, height)
+        if right <= left or bottom <= top:
+            return None, [], []
+        scale = region.scale or detection_scale(width, self.settings)
+        
+        # Crop to the region and resize it for faster processing, into this region's buffers
+        with STAGES['resize'].time():
+            rgb_small_frame = shrink_to_rgb(frame[top:bottom, left:right], scale, self.buffers, region)
+        
+        # Find faces in the region
+        with STAGES['detect'].time():
+            locations = face_recognition.face_locations(rgb_small_frame)
+        
+        region_locations, frame_locations = region.to_frame(locations, scale, width, height, found)
+        return rgb_small_frame, region_locations, frame_locations
+    
+    def filter_quality(self, frame, detection, quality):
+        """Drop faces from a region's detections that fail the quality gate"""
+        rgb_small_frame, locations, frame_locations = detection
+        kept_locations = []
+        kept_frame_locations = []
+        for location, frame_location in zip(locations, frame_locations):
+            # Landmarks come from the region image the face was detected in
+            reason = assess_face(
+                frame, frame_location, quality,
+                landmarks=lambda: next(iter(face_recognition.face_landmarks(rgb_small_frame, [location], model='small')), None)
+            )
+            if reason:
+                FACES_REJECTED.inc()
+                REJECTED[reason].inc()
+                continue
+            kept_locations.append(location)
+            kept_frame_locations.append(frame_location)
+        return rgb_small_frame, kept_locations, kept_frame_locations
+    
+    def encode_full_resolution(self, frame, frame_location):
+        """Encode a face from a crop of the full-resolution frame around its box"""
+        top, right, bottom, left = frame_location
+        # Leave a margin so the landmark model sees the whole face
+        margin = (bottom - top) // 4
+        crop_top, crop_left = max(0, top - margin), max(0, left - margin)
+        crop = frame[crop_top:bottom + margin, crop_left:right + margin]
+        rgb_crop = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+        location = (top - crop_top, right - crop_left, bottom - crop_top, left - crop_left)
+        return face_recognition.face_encodings(rgb_crop, [location])[0]
+    
+    def analyze_frame(self, frame):
+        """Faces in a frame that pass the quality gate, as (full-frame location, encoding) pairs"""
+        # Find faces in each region of interest (the whole frame by default)
+        found = []
+        detections = [self.detect_in_region(frame, region, found) for region in self.regions]
+        face_locations = [location for _, _, frame_locations in detections for location in frame_locations]
+        if not face_locations:
+            return []
+        FACES_DETECTED.inc(len(face_locations))
+        
+        # Skip faces too small, dark, blurry or turned away to be worth encoding
+        quality = quality_settings(self.settings)
+        if quality['enabled']:
+            with STAGES['quality'].time():
+                detections = [self.filter_quality(frame, detection, quality) for detection in detections]
+            face_locations = [location for _, _, frame_locations in detections for location in frame_locations]
+            if not face_locations:
+                return []
+        
+        with STAGES['encode'].time():
+            if self.settings.get('DETECTION_REFINE', False):
+                # Coarse to fine: found on the small image, encoded from full-resolution crops
+                face_encodings = [self.encode_full_resolution(frame, location) for location in face_locations]
+            else:
+                # Encode from each region's image, one call per region
+                face_encodings = []
+                for rgb_small_frame, locations, _ in detections:
+                    if locations:
+                        face_encodings.extend(face_recognition.face_encodings(rgb_small_frame, locations))
+        
+        return list(zip(face_locations, face_encodings))
+    
+class FaceRecognitionSystem(FacePipeline):
     """Real-time face recognition system for attendance tracking"""
     
-    def __init__(self, db, notification_service, config):
+    def __init__(self, db, notification_service, config, camera=None):
         self.db = db
         self.notification_service = notification_service
-        self.config = config
         self.is_running = False
-        self.camera = None
-        self.known_face_encodings = []
-        self.known_face_names = []
-        self.employee_ids = []
+        self._stop_requested = threading.Event()  # Set by stop(), also while the camera is opening
+        self.camera = camera  # Any object with the cv2.VideoCapture read/isOpened/release interface
+        self._gallery_lock = threading.Lock()  # Serializes reloads, not matching
+        self.gallery_version = None  # Active GalleryVersion id the gallery was loaded from
         self.attendance_cooldown = {}  # Track recent attendance to prevent duplicates
         self.unknown_face_attempts = {}  # Track unknown face attempts
+        self.grabber = None
+        self.current_frame = None  # Frame being handled (seq, image, capture timestamp)
+        super().__init__(config)
+        self.upload_folder = self.config.get('UPLOAD_FOLDER', 'uploads')
+        self.storage = CaptureStorage(self.upload_folder)
+        self.profiler = RecognitionProfiler(
+            self.config.get('DIAGNOSTICS_FOLDER', 'diagnostics'),
+            sample_interval=self.config.get('PROFILER_SAMPLE_INTERVAL_MS', 5) / 1000,
+            max_seconds=self.config.get('PROFILER_MAX_SECONDS', 120)
+        )
         self.load_known_faces()
         
     def load_known_faces(self):
         """Load known faces from the database"""
         try:
-            with self.db.session.begin():
-                employees = Employee.query.all()
-                
-                self.known_face_encodings = []
-                self.known_face_names = []
-                self.employee_ids = []
-                
-                for employee in employees:
-                    if employee.face_embeddings:
-                        embeddings = json.loads(employee.face_embeddings)
-                        for embedding in embeddings:
-                            self.known_face_encodings.append(np.array(embedding))
-                            self.known_face_names.append(employee.name)
-                            self.employee_ids.append(employee.id)
-                
-                logger.info(f"Loaded {len(self.known_face_encodings)} face encodings for {len(employees)} employees")
+            # Held across the read too: an update_employee() committed meanwhile is
+            # either in this snapshot or applied after it, never overwritten by it
+            with self._gallery_lock:
+                with self.db.session.begin():
+                    version_id = self.active_gallery_version()
+                    employees = Employee.query.all()
+                    
+                    embeddings = []
+                    labels = []
+                    names = {}
+                    
+                    for employee in employees:
+                        if employee.face_embeddings:
+                            employee_embeddings = json.loads(employee.face_embeddings)
+                            embeddings.extend(employee_embeddings)
+                            labels.extend([employee.id] * len(employee_embeddings))
+                            names[employee.id] = employee.name
+                
+                # Build a new store first so a reload never exposes a half-filled gallery
+                gallery = self.build_gallery(embeddings, labels, names)
+                self.gallery = gallery
+                self.gallery_version = version_id
+            
+            logger.info(f"Loaded {len(gallery)} face encodings for {len(employees)} employees "
+                        f"({gallery.mode}, {gallery.memory_bytes() / 1024:.0f} KB)")
                 
         except Exception as e:
             logger.error(f"Error loading known faces: {str(e)}")
     
+    def active_gallery_version(self):
+        """Id of the active gallery version (None until a re-embedding job activated one)"""
+        version = GalleryVersion.query.filter_by(status='active').with_entities(GalleryVersion.id).first()
+        return version.id if version else None
+    
+    def check_gallery_version(self):
+        """Reload the whole gallery if a re-embedding job activated a new version"""
+        try:
+            with self.db.session.begin():
+                version_id = self.active_gallery_version()
+            if version_id != self.gallery_version:
+                logger.info(f"Gallery version {version_id} activated, reloading known faces")
+                self.load_known_faces()
+        except Exception as e:
+            logger.error(f"Error checking the gallery version: {str(e)}")
+    
+    def update_employee(self, employee_id):
+        """Reload one employee's embeddings after their photos changed (or they were deleted)"""
+        try:
+            with self._gallery_lock:
+                with self.db.session.begin():
+                    employee = self.db.session.get(Employee, employee_id)
+                    embeddings = json.loads(employee.face_embeddings) if employee and employee.face_embeddings else []
+                    name = employee.name if employee else None
+                
+                # Only this employee's rows and centroid are rebuilt
+                self.gallery = self.gallery.with_employee(employee_id, embeddings, name)
+            
+            logger.info(f"Updated {len(embeddings)} face encodings for employee {employee_id}")
+            
+        except Exception as e:
+            logger.error(f"Error updating known faces for employee {employee_id}: {str(e)}")
+    
     def initialize_camera(self):
         """Initialize the camera"""
         try:
+            if self.camera is not None:
+                # An injected camera (e.g. a replayed recording) is used as is
+                return self.camera.isOpened()
+            
             camera_index = self.config.get('CAMERA_INDEX', 0)
             self.camera = cv2.VideoCapture(camera_index)
             
             if not self.camera.isOpened():
                 raise Exception(f"Cannot open camera {camera_index}")
             
-            # Set camera properties for better performance
-            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            # Capture at the configured resolution; detection scales down from it
+            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, self.config.get('CAMERA_WIDTH', 640))
+            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, self.config.get('CAMERA_HEIGHT', 480))
             self.camera.set(cv2.CAP_PROP_FPS, 30)
+            # Frames are drained by the grabber thread; a short driver queue keeps them fresh
+            self.camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
             
-            logger.info(f"Camera initialized successfully on index {camera_index}")
+            # The camera may pick the nearest mode it supports
+            width = int(self.camera.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(self.camera.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            logger.info(f"Camera initialized successfully on index {camera_index} at {width}x{height}")
             return True
             
         except Exception as e:
@@ -75,42 +290,36 @@ class FaceRecognitionSystem:
     def process_frame(self, frame):
         """Process a single frame for face recognition"""
         try:
-            # Resize frame for faster processing
-            small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-            rgb_small_frame = small_frame[:, :, ::-1]
+            faces = self.analyze_frame(frame)
             
-            # Find faces in the frame
-            face_locations = face_recognition.face_locations(rgb_small_frame)
-            face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-            
-            # Process each face
-            for face_encoding, face_location in zip(face_encodings, face_locations):
-                # Compare with known faces
-                matches = face_recognition.compare_faces(
-                    self.known_face_encodings, 
-                    face_encoding,
-                    tolerance=self.config.get('RECOGNITION_THRESHOLD', 0.6)
-                )
-                
-                face_distances = face_recognition.face_distance(
-                    self.known_face_encodings, 
-                    face_encoding
-                )
-                
-                best_match_index = np.argmin(face_distances)
-                
-                if matches[best_match_index]:
+            # Process each face against the gallery as it was when the frame started
+            gallery = self.gallery
+            for face_location, face_encoding in faces:
+                if not len(gallery):
+                    FACES_UNKNOWN.inc()
+                    self.handle_unknown_face(frame, face_location)
+                    continue
+                
+                with STAGES['match'].time():
+                    # Compare with known faces
+                    threshold = self.settings.get('RECOGNITION_THRESHOLD', 0.6)
+                    best_match_index, distance = gallery.nearest(face_encoding, tolerance=threshold)
+                
+                if distance <= threshold:
                     # Face recognized
-                    employee_id = self.employee_ids[best_match_index]
-                    employee_name = self.known_face_names[best_match_index]
-                    confidence = 1 - face_distances[best_match_index]
+                    FACES_RECOGNIZED.inc()
+                    employee_id = int(gallery.labels[best_match_index])
+                    employee_name = gallery.names.get(employee_id)
+                    confidence = 1 - distance
                     
                     self.handle_recognized_face(employee_id, employee_name, confidence, frame, face_location)
                 else:
                     # Unknown face
+                    FACES_UNKNOWN.inc()
                     self.handle_unknown_face(frame, face_location)
                     
         except Exception as e:
+            ERRORS.labels('process_frame').inc()
             logger.error(f"Error processing frame: {str(e)}")
     
     def handle_recognized_face(self, employee_id, employee_name, confidence, frame, face_location):
@@ -119,7 +328,7 @@ class FaceRecognitionSystem:
             current_time = datetime.now()
             
             # Check if this employee already marked attendance recently (cooldown)
-            cooldown_minutes = self.config.get('ATTENDANCE_COOLDOWN_MINUTES', 2)
+            cooldown_minutes = self.settings.get('ATTENDANCE_COOLDOWN_MINUTES', 2)
             if employee_id in self.attendance_cooldown:
                 time_diff = current_time - self.attendance_cooldown[employee_id]
                 if time_diff < timedelta(minutes=cooldown_minutes):
@@ -141,37 +350,35 @@ class FaceRecognitionSystem:
                 
                 # Mark attendance
                 # Save attendance image
-                image_filename = f"attendance_{employee_id}_{current_time.strftime('%Y%m%d_%H%M%S')}.jpg"
-                image_path = os.path.join("uploads", "attendance", image_filename)
+                image_path = self.storage.new_path(f"attendance_{employee_id}", current_time)
                 
                 # Extract and save face image
+                # Locations are already in full-frame coordinates
                 top, right, bottom, left = face_location
-                # Scale back up face locations since frame was scaled down
-                top *= 4
-                right *= 4
-                bottom *= 4
-                left *= 4
                 
                 # Extract face from frame
                 face_image = frame[top:bottom, left:right]
                 
                 # Apply blur if configured
-                if self.config.get('BLUR_FACES', False):
+                if self.settings.get('BLUR_FACES', False):
                     face_image = blur_face(face_image)
                 
-                # Save the image
-                cv2.imwrite(image_path, face_image)
+                # Save the image and its dashboard thumbnail
+                with STAGES['image_write'].time():
+                    cv2.imwrite(image_path, face_image)
+                    self.save_thumbnail(face_image, image_path)
                 
                 # Create attendance record
-                attendance = Attendance(
-                    employee_id=employee_id,
-                    timestamp=current_time,
-                    image_path=image_path,
-                    confidence=confidence
-                )
-                
-                self.db.session.add(attendance)
-                self.db.session.commit()
+                with STAGES['db_write'].time():
+                    attendance = Attendance(
+                        employee_id=employee_id,
+                        timestamp=current_time,
+                        image_path=image_path,
+                        confidence=confidence
+                    )
+                    
+                    self.db.session.add(attendance)
+                    self.db.session.commit()
                 
                 # Update cooldown
                 self.attendance_cooldown[employee_id] = current_time
@@ -179,6 +386,7 @@ class FaceRecognitionSystem:
                 logger.info(f"Attendance marked for {employee_name} (ID: {employee_id}) with confidence {confidence:.2f}")
                 
         except Exception as e:
+            ERRORS.labels('recognized_face').inc()
             logger.error(f"Error handling recognized face: {str(e)}")
     
     def handle_unknown_face(self, frame, face_location):
@@ -197,39 +405,38 @@ class FaceRecognitionSystem:
             attempt_data = self.unknown_face_attempts[face_key]
             
             # Send notification after multiple attempts
-            max_attempts = self.config.get('UNKNOWN_FACE_MAX_ATTEMPTS', 3)
+            max_attempts = self.settings.get('UNKNOWN_FACE_MAX_ATTEMPTS', 3)
             if attempt_data['count'] >= max_attempts:
                 # Save unknown face image
-                image_filename = f"unknown_{current_time.strftime('%Y%m%d_%H%M%S')}.jpg"
-                image_path = os.path.join("uploads", "attendance", image_filename)
+                image_path = self.storage.new_path("unknown", current_time)
                 
                 # Extract face from frame
+                # Locations are already in full-frame coordinates
                 top, right, bottom, left = face_location
-                # Scale back up face locations since frame was scaled down
-                top *= 4
-                right *= 4
-                bottom *= 4
-                left *= 4
                 
                 face_image = frame[top:bottom, left:right]
                 
                 # Apply blur if configured
-                if self.config.get('BLUR_FACES', False):
+                if self.settings.get('BLUR_FACES', False):
                     face_image = blur_face(face_image)
                 
-                cv2.imwrite(image_path, face_image)
+                with STAGES['image_write'].time():
+                    cv2.imwrite(image_path, face_image)
+                    self.save_thumbnail(face_image, image_path)
                 
                 # Record unknown face
-                with self.db.session.begin():
-                    unknown_face = UnknownFace(
-                        timestamp=current_time,
-                        image_path=image_path
-                    )
-                    self.db.session.add(unknown_face)
-                    self.db.session.commit()
+                with STAGES['db_write'].time():
+                    with self.db.session.begin():
+                        unknown_face = UnknownFace(
+                            timestamp=current_time,
+                            image_path=image_path
+                        )
+                        self.db.session.add(unknown_face)
+                        self.db.session.commit()
                 
                 # Send notification
-                self.notification_service.send_unknown_face_alert(image_path)
+                with STAGES['notify'].time():
+                    self.notification_service.send_unknown_face_alert(image_path)
                 
                 # Reset attempts for this face
                 del self.unknown_face_attempts[face_key]
@@ -237,8 +444,15 @@ class FaceRecognitionSystem:
                 logger.warning(f"Unknown face detected after {max_attempts} attempts")
                 
         except Exception as e:
+            ERRORS.labels('unknown_face').inc()
             logger.error(f"Error handling unknown face: {str(e)}")
     
+    def save_thumbnail(self, face_image, image_path):
+        """Write the thumbnail of a capture while the crop is still in memory"""
+        size = self.settings.get('THUMBNAIL_SIZE', 150)
+        thumbnail_path = get_thumbnail_path(os.path.relpath(image_path, self.upload_folder), self.upload_folder)
+        write_thumbnail(face_image, thumbnail_path, (size, size))
+    
     def cleanup_old_attempts(self):
         """Clean up old unknown face attempts"""
         try:
@@ -256,29 +470,63 @@ class FaceRecognitionSystem:
         except Exception as e:
             logger.error(f"Error cleaning up attempts: {str(e)}")
     
+    def next_frame(self):
+        """The next frame to handle, or None when the camera stopped delivering"""
+        if self.grabber is not None:
+            return self.grabber.latest(timeout=CAPTURE_TIMEOUT_SECONDS)
+        
+        ret, image = self.camera.read()
+        if not ret:
+            return None
+        sequence = self.current_frame.seq + 1 if self.current_frame else 1
+        return Frame(sequence, image, time.monotonic())
+    
     def run(self):
         """Main recognition loop"""
         try:
             if not self.initialize_camera():
                 logger.error("Failed to initialize camera")
                 return
+            if self._stop_requested.is_set():
+                return
             
             self.is_running = True
+            self.profiler.attach(threading.get_ident())
+            if self.config.get('CAMERA_GRABBER', True):
+                # Read the camera on its own thread so a slow frame never leaves a backlog
+                self.grabber = FrameGrabber(self.camera, reuse_buffers=isinstance(self.camera, cv2.VideoCapture)).start()
             logger.info("Face recognition system started")
             
             frame_count = 0
             last_cleanup = datetime.now()
+            last_version_check = time.monotonic()
             
-            while self.is_running:
-                ret, frame = self.camera.read()
-                if not ret:
-                    logger.error("Failed to read frame from camera")
+            while self.is_running and not self._stop_requested.is_set():
+                # Pick up configuration reloads between frames
+                self.refresh_settings()
+                frame_started = time.monotonic()
+                
+                with STAGES['capture'].time():
+                    frame = self.next_frame()
+                if frame is None:
+                    if self.is_running:
+                        ERRORS.labels('capture').inc()
+                        logger.error("Failed to read frame from camera")
                     break
+                FRAMES_READ.inc()
+                if self.current_frame and frame.seq > self.current_frame.seq + 1:
+                    # Replaced by newer frames while the previous one was handled
+                    FRAMES_DROPPED.inc(frame.seq - self.current_frame.seq - 1)
+                self.current_frame = frame
                 
                 # Process every nth frame to maintain performance
-                process_every_n_frames = self.config.get('PROCESS_EVERY_N_FRAMES', 3)
+                process_every_n_frames = self.settings.get('PROCESS_EVERY_N_FRAMES', 3)
                 if frame_count % process_every_n_frames == 0:
-                    self.process_frame(frame)
+                    FRAMES_PROCESSED.inc()
+                    FRAME_AGE.observe(time.monotonic() - frame.timestamp)
+                    self.process_frame(frame.image)
+                else:
+                    FRAMES_SKIPPED.inc()
                 
                 frame_count += 1
                 
@@ -287,26 +535,47 @@ class FaceRecognitionSystem:
                     self.cleanup_old_attempts()
                     last_cleanup = datetime.now()
                 
-                # Small delay to prevent excessive CPU usage
-                time.sleep(0.03)  # ~30 FPS
+                # Switch to a gallery version activated by a re-embedding job
+                if time.monotonic() - last_version_check >= self.settings.get('GALLERY_VERSION_CHECK_SECONDS', 30):
+                    self.check_gallery_version()
+                    last_version_check = time.monotonic()
+                
+                # Only does work while an on-demand profiling session is active
+                if self.profiler.session is not None:
+                    self.profiler.on_frame()
+                
+                # Pace the loop to TARGET_FPS, counting the time already spent on this frame
+                frame_interval = 1.0 / self.settings.get('TARGET_FPS', 30)
+                remaining = frame_interval - (time.monotonic() - frame_started)
+                if remaining > 0:
+                    time.sleep(remaining)
                 
         except Exception as e:
             logger.error(f"Error in recognition loop: {str(e)}")
         finally:
+            self.is_running = False
+            self.profiler.detach()
             self.cleanup()
     
     def stop(self):
         """Stop the recognition system"""
+        self._stop_requested.set()
         self.is_running = False
+        grabber = self.grabber
+        if grabber is not None:
+            # Wakes the loop if it is waiting for a frame
+            grabber.stop(timeout=0)
         logger.info("Face recognition system stopped")
     
     def cleanup(self):
         """Clean up resources"""
         try:
+            if self.grabber is not None:
+                self.grabber.stop()
+                self.grabber = None
             if self.camera:
                 self.camera.release()
                 self.camera = None
-            cv2.destroyAllWindows()
             logger.info("Recognition system cleaned up")
         except Exception as e:
             logger.error(f"Error during cleanup: {str(e)}")
@@ -0,0 +1,276 @@
+import os
+import json
+import time
+import fcntl
+import logging
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from models import Employee, GalleryVersion, GalleryEmbedding
+
+logger = logging.getLogger(__name__)
+
+# Worker processes run at a lower priority so encoding yields the CPU to the
+# recognition loop and the web app
+WORKER_NICENESS = 10
+
+def lower_priority():
+    """Process pool initializer for re-embedding workers"""
+    try:
+        os.nice(WORKER_NICENESS)
+    except OSError:
+        pass
+
+def reembed_employee(task):
+    """Encode all photos of one employee (runs inside a worker process)
+
+    Photos that fail are reported and left out; the employee only fails
+    when none of them can be encoded.
+    """
+    from enrollment import encode_photo
+
+    embeddings = []
+    errors = []
+    for i, photo_path in enumerate(task['photo_paths']):
+        try:
+            embeddings.append(encode_photo(photo_path, task['settings'], task.get('cache')))
+        except Exception as e:
+            errors.append({'photo': i + 1, 'path': photo_path, 'error': str(e)})
+    return {
+        'employee_id': task['employee_id'],
+        'photo_paths': task['photo_paths'],
+        'embeddings': embeddings,
+        'errors': errors,
+    }
+
+class GalleryReembedder:
+    """Recompute every employee's embeddings from their photos under a new gallery version
+
+    Embeddings are staged in ``GalleryEmbedding`` rows of a building version,
+    committed in batches, while recognition keeps using the current ones. An
+    interrupted run resumes with the employees that have no row yet, as long as
+    the encoder settings are unchanged. Once every employee is done, one
+    transaction copies the staged embeddings into ``Employee.face_embeddings``
+    and marks the version active; running recognition loops notice the new
+    version and reload their gallery in one swap. Employees whose photos
+    changed during the build are encoded again before the switch.
+
+    ``max_rate`` caps the photos encoded per second so a run can share the
+    machine with the live system during business hours.
+    """
+
+    def __init__(self, app, db, encoder_settings, embedding_cache=None, workers=2, batch_size=50,
+                 max_rate=0, lock_folder='uploads'):
+        self.app = app
+        self.db = db
+        self.encoder_settings = encoder_settings
+        self.settings_key = json.dumps(encoder_settings, sort_keys=True)
+        self.embedding_cache = embedding_cache
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_rate = max_rate
+        self.lock_folder = lock_folder
+
+    def active_version(self):
+        return GalleryVersion.query.filter_by(status='active').first()
+
+    def prepare_version(self, force=False):
+        """The building version for the current settings, resumed or newly created
+
+        Returns None when the active version already uses these settings and
+        ``force`` is not set.
+        """
+        building = GalleryVersion.query.filter_by(status='building').order_by(GalleryVersion.id).all()
+        for version in building:
+            if version.encoder_settings == self.settings_key:
+                logger.info(f"Resuming gallery version {version.id}")
+                return version
+
+        active = self.active_version()
+        if active and active.encoder_settings == self.settings_key and not force:
+            return None
+
+        # Builds for other settings can never be activated now
+        for version in building:
+            version.status = 'abandoned'
+            GalleryEmbedding.query.filter_by(version_id=version.id).delete()
+
+        version = GalleryVersion(
+            status='building',
+            encoder_settings=self.settings_key,
+            total=Employee.query.filter(Employee.photo_paths.isnot(None)).count(),
+            processed=0,
+            failed=0
+        )
+        self.db.session.add(version)
+        self.db.session.commit()
+        logger.info(f"Started gallery version {version.id}")
+        return version
+
+    def pending_tasks(self, version, retry_failed=False):
+        """Employees whose embeddings are missing from the version or were computed from other photos"""
+        staged = {
+            row.employee_id: row
+            for row in GalleryEmbedding.query.filter_by(version_id=version.id)
+        }
+        tasks = []
+        for employee_id, photo_paths in self.db.session.query(Employee.id, Employee.photo_paths).order_by(Employee.id):
+            paths = json.loads(photo_paths) if photo_paths else []
+            if not paths:
+                continue
+            row = staged.get(employee_id)
+            if row is not None and json.loads(row.photo_paths) == paths:
+                if row.face_embeddings or not retry_failed:
+                    continue
+            tasks.append({
+                'employee_id': employee_id,
+                'photo_paths': paths,
+                'settings': self.encoder_settings,
+                'cache': self.embedding_cache,
+            })
+        return tasks
+
+    def save_batch(self, version, results):
+        """Stage a batch of results in one transaction, replacing earlier rows of the same employees"""
+        staged = {
+            row.employee_id: row
+            for row in GalleryEmbedding.query.filter(
+                GalleryEmbedding.version_id == version.id,
+                GalleryEmbedding.employee_id.in_([result['employee_id'] for result in results])
+            )
+        }
+        for result in results:
+            row = staged.get(result['employee_id'])
+            if row is None:
+                row = GalleryEmbedding(version_id=version.id, employee_id=result['employee_id'])
+                self.db.session.add(row)
+            row.face_embeddings = json.dumps(result['embeddings']) if result['embeddings'] else None
+            row.photo_paths = json.dumps(result['photo_paths'])
+            row.errors = json.dumps(result['errors'])
+
+        self.db.session.flush()
+        rows = GalleryEmbedding.query.filter_by(version_id=version.id)
+        version.processed = rows.count()
+        version.failed = rows.filter(GalleryEmbedding.face_embeddings.is_(None)).count()
+        self.db.session.commit()
+
+    def encode(self, version, tasks, progress=None):
+        """Encode tasks in the process pool, committing every ``batch_size`` employees"""
+        batch = []
+        in_flight = set()
+        next_submit = time.monotonic()
+
+        def collect(futures):
+            for future in futures:
+                batch.append(future.result())
+            if len(batch) >= self.batch_size:
+                self.save_batch(version, batch)
+                batch.clear()
+                if progress:
+                    progress(version)
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=lower_priority) as executor:
+            for task in tasks:
+                # A few tasks queued per worker keep it busy without reading ahead of the throttle
+                while len(in_flight) >= self.workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+
+                if self.max_rate:
+                    delay = next_submit - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_submit = max(next_submit, time.monotonic()) + len(task['photo_paths']) / self.max_rate
+                in_flight.add(executor.submit(reembed_employee, task))
+
+            collect(wait(in_flight).done)
+            if batch:
+                self.save_batch(version, batch)
+                if progress:
+                    progress(version)
+
+    def activate(self, version, skip_failed=False):
+        """Switch recognition to the version in one transaction
+
+        Returns 'activated', 'stale' when photos changed since they were
+        encoded (encode the pending employees and try again) or 'failed' when
+        employees have no embeddings and ``skip_failed`` is not set.
+        """
+        staged = {
+            row.employee_id: row
+            for row in GalleryEmbedding.query.filter_by(version_id=version.id)
+        }
+        employees = Employee.query.filter(Employee.photo_paths.isnot(None)).all()
+
+        updates = []
+        for employee in employees:
+            paths = json.loads(employee.photo_paths)
+            if not paths:
+                continue
+            row = staged.get(employee.id)
+            if row is None or json.loads(row.photo_paths) != paths:
+                self.db.session.rollback()
+                return 'stale'
+            if not row.face_embeddings and not skip_failed:
+                self.db.session.rollback()
+                return 'failed'
+            updates.append((employee, row.face_embeddings))
+
+        for employee, face_embeddings in updates:
+            employee.face_embeddings = face_embeddings
+
+        previous = self.active_version()
+        if previous is not None:
+            previous.status = 'retired'
+        version.status = 'active'
+        version.activated_at = datetime.utcnow()
+        # Only the active version's rows are kept, for resuming and auditing the switch
+        GalleryEmbedding.query.filter(GalleryEmbedding.version_id != version.id).delete()
+        self.db.session.commit()
+        logger.info(f"Activated gallery version {version.id} for {len(updates)} employees")
+        return 'activated'
+
+    def failures(self, version):
+        """(employee id, errors) of employees none of whose photos could be encoded"""
+        rows = GalleryEmbedding.query.filter(
+            GalleryEmbedding.version_id == version.id,
+            GalleryEmbedding.face_embeddings.is_(None)
+        ).order_by(GalleryEmbedding.employee_id)
+        return [(row.employee_id, json.loads(row.errors or '[]')) for row in rows]
+
+    def run(self, force=False, skip_failed=False, progress=None):
+        """Build and activate a gallery version; returns a report
+
+        The report's ``status`` is 'current' (nothing to do), 'activated' or
+        'failed' (the version stays building; fix the photos and run again).
+        """
+        with self.app.app_context():
+            version = self.prepare_version(force)
+            if version is None:
+                return {'status': 'current', 'version': self.active_version().id, 'failures': []}
+
+            # Failed employees are retried once per run, on the first pass
+            retry_failed = True
+            while True:
+                tasks = self.pending_tasks(version, retry_failed)
+                retry_failed = False
+                if tasks:
+                    self.encode(version, tasks, progress)
+
+                status = self.activate(version, skip_failed)
+                if status != 'stale':
+                    return {'status': status, 'version': version.id, 'failures': self.failures(version)}
+
+    def run_exclusive(self, force=False, skip_failed=False, progress=None):
+        """Run unless another process is already re-embedding"""
+        os.makedirs(self.lock_folder, exist_ok=True)
+        lock_path = os.path.join(self.lock_folder, ".reembed.lock")
+        with open(lock_path, 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logger.info("Re-embedding already running in another process, skipping")
+                return None
+            try:
+                return self.run(force, skip_failed, progress)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,273 @@
+import os
+import fcntl
+import logging
+import shutil
+import threading
+from datetime import datetime, timedelta
+from models import Attendance, UnknownFace
+from storage import CaptureStorage
+
+logger = logging.getLogger(__name__)
+
+class RetentionEngine:
+    """Delete expired capture images and the database rows that reference them
+
+    Expired days of the sharded capture layout are dropped as whole
+    directories, after clearing their database references with one prefix
+    match per day. Files left in the legacy flat layout are found with
+    ``os.scandir`` and handled in batches. References are always cleared in one
+    transaction before files are unlinked, so a crash can leave orphan files
+    (removed on the next run) but never rows pointing at deleted images. A
+    short pause between batches keeps the disk available for the recognition
+    loop.
+    """
+
+    def __init__(self, app, db, upload_folder, image_retention_days=30, attendance_retention_days=0,
+                 batch_size=500, batch_pause=0.05):
+        self.app = app
+        self.db = db
+        self.upload_folder = upload_folder
+        self.storage = CaptureStorage(upload_folder)
+        self.image_retention_days = image_retention_days
+        self.attendance_retention_days = attendance_retention_days
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def iter_expired_batches(self, cutoff):
+        """Yield lists of (path, size, partition date) for legacy flat-layout files older than the cutoff"""
+        for entries in self.storage.iter_legacy_files(self.batch_size):
+            batch = []
+            for entry in entries:
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                if stat.st_mtime < cutoff:
+                    partition = datetime.fromtimestamp(stat.st_mtime).date()
+                    batch.append((entry.path, stat.st_size, partition))
+            if batch:
+                yield batch
+
+    @staticmethod
+    def directory_usage(directory):
+        """Count files and bytes below a directory"""
+        files = 0
+        size = 0
+        stack = [directory]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            files += 1
+                            size += entry.stat(follow_symlinks=False).st_size
+            except FileNotFoundError:
+                continue
+        return files, size
+
+    def run(self, dry_run=False):
+        """Apply the retention policy once and return a report"""
+        report = {
+            'dry_run': dry_run,
+            'files': 0,
+            'bytes': 0,
+            'partitions': {},
+            'attendance_images_cleared': 0,
+            'unknown_faces_deleted': 0,
+            'attendance_rows_deleted': 0,
+        }
+
+        with self.app.app_context():
+            if self.image_retention_days > 0:
+                self.expire_images(report, dry_run)
+            if self.attendance_retention_days > 0:
+                self.expire_attendance_rows(report, dry_run)
+
+        action = "Would delete" if dry_run else "Deleted"
+        logger.info(
+            f"Retention: {action} {report['files']} files ({report['bytes']} bytes), "
+            f"cleared {report['attendance_images_cleared']} attendance images, "
+            f"removed {report['unknown_faces_deleted']} unknown faces and "
+            f"{report['attendance_rows_deleted']} attendance rows"
+        )
+        return report
+
+    def expire_images(self, report, dry_run):
+        """Remove capture images older than the image retention period"""
+        cutoff_time = datetime.now() - timedelta(days=self.image_retention_days)
+        self.expire_day_directories(cutoff_time, report, dry_run)
+        self.expire_legacy_files(cutoff_time, report, dry_run)
+
+    def expire_day_directories(self, cutoff_time, report, dry_run):
+        """Drop whole day directories of the sharded layout that are past the cutoff"""
+        for day, directory in self.storage.iter_day_directories():
+            if day >= cutoff_time.date() or self._stop_event.is_set():
+                break
+
+            files, size = self.directory_usage(directory)
+            prefix = directory + os.sep
+            pattern = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            attendance_query = Attendance.query.filter(Attendance.image_path.like(pattern, escape='\\'))
+            unknown_query = UnknownFace.query.filter(UnknownFace.image_path.like(pattern, escape='\\'))
+
+            if dry_run:
+                report['attendance_images_cleared'] += attendance_query.count()
+                report['unknown_faces_deleted'] += unknown_query.count()
+            else:
+                report['attendance_images_cleared'] += attendance_query.update(
+                    {'image_path': None}, synchronize_session=False
+                )
+                report['unknown_faces_deleted'] += unknown_query.delete(synchronize_session=False)
+                self.db.session.commit()
+
+                thumbnail_directory = os.path.join(
+                    self.upload_folder, "thumbnails", os.path.relpath(directory, self.upload_folder)
+                )
+                for tree in (directory, thumbnail_directory):
+                    shutil.rmtree(tree, ignore_errors=True)
+                    # Remove the month and year directories once they are empty
+                    for parent in (os.path.dirname(tree), os.path.dirname(os.path.dirname(tree))):
+                        try:
+                            os.rmdir(parent)
+                        except OSError:
+                            break
+
+            report['files'] += files
+            report['bytes'] += size
+            stats = report['partitions'].setdefault(day.isoformat(), {'files': 0, 'bytes': 0})
+            stats['files'] += files
+            stats['bytes'] += size
+
+            self._stop_event.wait(self.batch_pause)
+
+    def expire_legacy_files(self, cutoff_time, report, dry_run):
+        """Remove expired files still in the flat layout, in batches"""
+        for batch in self.iter_expired_batches(cutoff_time.timestamp()):
+            if self._stop_event.is_set():
+                break
+
+            paths = [path for path, _, _ in batch]
+            attendance_query = Attendance.query.filter(Attendance.image_path.in_(paths))
+            unknown_query = UnknownFace.query.filter(UnknownFace.image_path.in_(paths))
+
+            if dry_run:
+                report['attendance_images_cleared'] += attendance_query.count()
+                report['unknown_faces_deleted'] += unknown_query.count()
+            else:
+                report['attendance_images_cleared'] += attendance_query.update(
+                    {'image_path': None}, synchronize_session=False
+                )
+                report['unknown_faces_deleted'] += unknown_query.delete(synchronize_session=False)
+                self.db.session.commit()
+
+            for path, size, partition in batch:
+                if not dry_run:
+                    self.remove_file(path)
+                report['files'] += 1
+                report['bytes'] += size
+                stats = report['partitions'].setdefault(partition.isoformat(), {'files': 0, 'bytes': 0})
+                stats['files'] += 1
+                stats['bytes'] += size
+
+            self._stop_event.wait(self.batch_pause)
+
+        # Unknown faces whose image is already gone have nothing left to show
+        stale_unknowns = UnknownFace.query.filter(
+            UnknownFace.timestamp < cutoff_time,
+            UnknownFace.image_path.is_(None)
+        )
+        if dry_run:
+            report['unknown_faces_deleted'] += stale_unknowns.count()
+        else:
+            report['unknown_faces_deleted'] += stale_unknowns.delete(synchronize_session=False)
+            self.db.session.commit()
+
+    def expire_attendance_rows(self, report, dry_run):
+        """Delete attendance rows older than the attendance retention period in batches"""
+        cutoff_time = datetime.now() - timedelta(days=self.attendance_retention_days)
+        query = Attendance.query.filter(Attendance.timestamp < cutoff_time)
+
+        if dry_run:
+            report['attendance_rows_deleted'] += query.count()
+            return
+
+        while not self._stop_event.is_set():
+            rows = self.db.session.query(Attendance.id, Attendance.image_path).filter(
+                Attendance.timestamp < cutoff_time
+            ).limit(self.batch_size).all()
+            if not rows:
+                break
+
+            Attendance.query.filter(Attendance.id.in_([row.id for row in rows])).delete(synchronize_session=False)
+            self.db.session.commit()
+            for row in rows:
+                if row.image_path:
+                    self.remove_file(row.image_path)
+            report['attendance_rows_deleted'] += len(rows)
+
+            self._stop_event.wait(self.batch_pause)
+
+    def remove_file(self, path):
+        """Delete an image and its cached thumbnail, ignoring files already gone"""
+        from utils import get_thumbnail_path
+
+        thumbnail_path = get_thumbnail_path(os.path.relpath(path, self.upload_folder), self.upload_folder)
+        for file_path in (path, thumbnail_path):
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Error deleting {file_path}: {str(e)}")
+
+    def run_exclusive(self, dry_run=False):
+        """Run unless another process holds the retention lock"""
+        lock_path = os.path.join(self.upload_folder, ".retention.lock")
+        with open(lock_path, 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logger.info("Retention already running in another process, skipping")
+                return None
+            try:
+                return self.run(dry_run)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def start_scheduler(self, interval_hours=24, initial_delay_minutes=5):
+        """Run retention periodically on a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        def loop():
+            delay = initial_delay_minutes * 60
+            while not self._stop_event.wait(delay):
+                delay = interval_hours * 3600
+                try:
+                    self.run_exclusive()
+                except Exception as e:
+                    logger.error(f"Error running retention: {str(e)}")
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=loop, name='retention', daemon=True)
+        self._thread.start()
+        logger.info(f"Retention scheduled every {interval_hours} hours")
+
+    def stop(self):
+        """Stop the scheduler and interrupt a running pass between batches"""
+        self._stop_event.set()
+
+def create_retention_engine(app, db, config):
+    """Build the retention engine from configuration"""
+    get = config.get if config else (lambda key, default=None: default)
+    return RetentionEngine(
+        app, db, app.config["UPLOAD_FOLDER"],
+        image_retention_days=get('IMAGE_RETENTION_DAYS', 30),
+        attendance_retention_days=get('ATTENDANCE_RETENTION_DAYS', 0),
+        batch_size=get('RETENTION_BATCH_SIZE', 500),
+        batch_pause=get('RETENTION_BATCH_PAUSE', 0.05)
+    )
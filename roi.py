@@ -0,0 +1,175 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Smallest face (in pixels of the image searched) the default HOG detector
+# finds with face_locations' single upsample
+DETECTOR_MIN_FACE_SIZE = 40
+
+# Never shrink frames further than this, however large the faces
+MIN_DETECTION_SCALE = 0.05
+
+def detection_scale(frame_width, settings):
+    """Downscale for detection that still finds the smallest face of interest
+
+    ``DETECTION_MIN_FACE_SIZE`` is the smallest face to find, in pixels at the
+    configured ``CAMERA_WIDTH`` (unset: a quarter of the width, which gives
+    the original 0.25 and keeps the detection cost of a higher-resolution
+    camera the same). If the camera delivers another resolution the face size
+    is scaled with it. The frame is shrunk until that face is as small as the
+    detector can see, and never enlarged.
+    """
+    configured_width = settings.get('CAMERA_WIDTH') or frame_width
+    min_face = settings.get('DETECTION_MIN_FACE_SIZE') or configured_width / 4
+    min_face = min_face * frame_width / configured_width
+    return min(1.0, max(MIN_DETECTION_SCALE, DETECTOR_MIN_FACE_SIZE / min_face))
+
+class Region:
+    """Part of the camera frame searched for faces
+
+    Coordinates are fractions of the frame width and height (0-1), so a
+    region keeps its meaning when the capture resolution changes. Detection
+    runs on the region's bounding box, downscaled by ``scale`` (or by the
+    detection_scale policy when unset); for a polygon only faces whose centre
+    lies inside the polygon are kept.
+    """
+
+    def __init__(self, box, polygon=None, scale=None, name=None):
+        self.box = box  # (left, top, right, bottom)
+        self.polygon = polygon
+        self.scale = scale
+        self.name = name
+
+    @classmethod
+    def full_frame(cls, scale=None):
+        return cls((0.0, 0.0, 1.0, 1.0), scale=scale, name='frame')
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Build a region from {"rect": [x, y, w, h]} or {"polygon": [[x, y], ...]}"""
+        if not isinstance(spec, dict):
+            raise ValueError(f"Region must be an object, got {spec!r}")
+
+        scale = spec.get('scale')
+        if scale is not None and not 0 < float(scale) <= 1:
+            raise ValueError(f"Region scale must be in (0, 1], got {scale}")
+
+        if 'rect' in spec:
+            x, y, width, height = (float(value) for value in spec['rect'])
+            if width <= 0 or height <= 0:
+                raise ValueError(f"Region rect must have a positive size, got {spec['rect']}")
+            box = (x, y, x + width, y + height)
+            polygon = None
+        elif 'polygon' in spec:
+            polygon = [(float(x), float(y)) for x, y in spec['polygon']]
+            if len(polygon) < 3:
+                raise ValueError("Region polygon needs at least 3 points")
+            xs = [x for x, _ in polygon]
+            ys = [y for _, y in polygon]
+            box = (min(xs), min(ys), max(xs), max(ys))
+        else:
+            raise ValueError(f"Region needs a 'rect' or 'polygon', got {spec!r}")
+
+        if min(box) < 0 or max(box) > 1:
+            raise ValueError(f"Region coordinates must be fractions of the frame (0-1), got {spec!r}")
+
+        return cls(box, polygon, float(scale) if scale is not None else None, spec.get('name'))
+
+    def pixel_box(self, width, height):
+        """Bounding box in pixels as (left, top, right, bottom), clipped to the frame"""
+        left, top, right, bottom = self.box
+        return (
+            max(0, int(left * width)),
+            max(0, int(top * height)),
+            min(width, int(round(right * width))),
+            min(height, int(round(bottom * height))),
+        )
+
+    def contains(self, x, y, width, height):
+        """Whether a pixel position lies inside the region"""
+        if self.polygon is None:
+            left, top, right, bottom = self.pixel_box(width, height)
+            return left <= x < right and top <= y < bottom
+
+        # Ray casting against the polygon in pixel coordinates
+        points = [(px * width, py * height) for px, py in self.polygon]
+        inside = False
+        j = len(points) - 1
+        for i, (xi, yi) in enumerate(points):
+            xj, yj = points[j]
+            if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+                inside = not inside
+            j = i
+        return inside
+
+    def to_frame(self, locations, scale, width, height, found):
+        """Map face locations found in the region's downscaled crop to full-frame coordinates
+
+        Returns the kept locations in crop and in frame coordinates. Faces
+        whose centre lies outside a polygon, or inside a face in ``found``
+        (already detected by an overlapping region), are left out; kept
+        faces are added to ``found``.
+        """
+        left, top, _, _ = self.pixel_box(width, height)
+        region_locations = []
+        frame_locations = []
+        for location in locations:
+            # Scale back up and offset to full-frame coordinates
+            face_top, face_right, face_bottom, face_left = location
+            frame_location = (
+                top + round(face_top / scale),
+                left + round(face_right / scale),
+                top + round(face_bottom / scale),
+                left + round(face_left / scale),
+            )
+            center_x = (frame_location[1] + frame_location[3]) // 2
+            center_y = (frame_location[0] + frame_location[2]) // 2
+
+            if self.polygon and not self.contains(center_x, center_y, width, height):
+                continue
+            if any(t <= center_y < b and l <= center_x < r for t, r, b, l in found):
+                continue
+
+            found.append(frame_location)
+            region_locations.append(location)
+            frame_locations.append(frame_location)
+        return region_locations, frame_locations
+
+def parse_rois(spec, camera_index=0):
+    """Regions for one camera from the DETECTION_ROIS setting
+
+    ``spec`` is JSON: a list of regions used for every camera, or an object
+    mapping camera indexes to lists. An empty spec, or a camera without an
+    entry, searches the whole frame. Raises ValueError for a malformed spec.
+    """
+    if not spec:
+        return [Region.full_frame()]
+
+    try:
+        data = json.loads(spec) if isinstance(spec, str) else spec
+    except ValueError as e:
+        raise ValueError(f"DETECTION_ROIS is not valid JSON: {str(e)}")
+
+    if isinstance(data, dict):
+        data = data.get(str(camera_index))
+        if data is None:
+            return [Region.full_frame()]
+    if not isinstance(data, list):
+        raise ValueError("DETECTION_ROIS must be a list of regions or an object of lists per camera")
+
+    regions = [Region.from_spec(item) for item in data]
+    return regions or [Region.full_frame()]
+
+def validate_rois(spec):
+    """Return a list of error messages for a DETECTION_ROIS value"""
+    try:
+        data = json.loads(spec) if isinstance(spec, str) and spec else spec
+        if isinstance(data, dict):
+            for camera_index in data:
+                parse_rois(data, camera_index)
+        else:
+            parse_rois(data)
+    except (TypeError, ValueError) as e:
+        return [f"DETECTION_ROIS is invalid: {str(e)}"]
+    return []
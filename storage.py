@@ -0,0 +1,151 @@
+import os
+import re
+import uuid
+import logging
+from datetime import datetime, date
+from sqlalchemy import update, bindparam
+from models import Attendance, UnknownFace
+
+logger = logging.getLogger(__name__)
+
+# Timestamp embedded in legacy flat-layout names, e.g. attendance_3_20250705_091502.jpg
+LEGACY_TIMESTAMP = re.compile(r'_(\d{8}_\d{6})\.[^.]+$')
+
+class CaptureStorage:
+    """Date-sharded storage for captured face images
+
+    Captures are written to ``<upload_folder>/attendance/YYYY/MM/DD/HH/`` with a
+    random suffix in the file name, so two captures in the same second never
+    collide and no directory grows beyond one hour of traffic. Retention can
+    drop a whole day by removing its ``YYYY/MM/DD`` directory.
+    """
+
+    def __init__(self, upload_folder, category="attendance"):
+        self.upload_folder = upload_folder
+        self.root = os.path.join(upload_folder, category)
+        self._known_directories = set()
+
+    def shard_directory(self, timestamp):
+        """Return the hour directory for a capture time"""
+        return os.path.join(self.root, timestamp.strftime('%Y'), timestamp.strftime('%m'),
+                            timestamp.strftime('%d'), timestamp.strftime('%H'))
+
+    def day_directory(self, day):
+        """Return the directory holding all captures of one day"""
+        return os.path.join(self.root, day.strftime('%Y'), day.strftime('%m'), day.strftime('%d'))
+
+    def new_path(self, prefix, timestamp):
+        """Return a unique path for a new capture, creating its shard directory"""
+        directory = self.shard_directory(timestamp)
+        if directory not in self._known_directories:
+            os.makedirs(directory, exist_ok=True)
+            self._known_directories.add(directory)
+            # Only the current hour is ever written; don't let the set grow forever
+            if len(self._known_directories) > 48:
+                self._known_directories = {directory}
+
+        filename = f"{prefix}_{timestamp.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:12]}.jpg"
+        return os.path.join(directory, filename)
+
+    def iter_day_directories(self):
+        """Yield (date, path) for every day directory, oldest first
+
+        Only the year, month and day levels are listed, so this stays cheap no
+        matter how many files the shards hold.
+        """
+        for year in self._sorted_numeric_entries(self.root, 4):
+            year_path = os.path.join(self.root, year)
+            for month in self._sorted_numeric_entries(year_path, 2):
+                month_path = os.path.join(year_path, month)
+                for day in self._sorted_numeric_entries(month_path, 2):
+                    try:
+                        yield date(int(year), int(month), int(day)), os.path.join(month_path, day)
+                    except ValueError:
+                        continue
+
+    @staticmethod
+    def _sorted_numeric_entries(path, width):
+        """List sub-directories whose names are fixed-width numbers"""
+        try:
+            with os.scandir(path) as it:
+                return sorted(
+                    entry.name for entry in it
+                    if entry.is_dir(follow_symlinks=False) and len(entry.name) == width and entry.name.isdigit()
+                )
+        except FileNotFoundError:
+            return []
+
+    def legacy_timestamp(self, entry):
+        """Capture time of a flat-layout file, from its name or else its mtime"""
+        match = LEGACY_TIMESTAMP.search(entry.name)
+        if match:
+            try:
+                return datetime.strptime(match.group(1), '%Y%m%d_%H%M%S')
+            except ValueError:
+                pass
+        return datetime.fromtimestamp(entry.stat(follow_symlinks=False).st_mtime)
+
+    def iter_legacy_files(self, batch_size=500):
+        """Yield batches of files still sitting directly in the flat capture directory"""
+        batch = []
+        try:
+            with os.scandir(self.root) as it:
+                for entry in it:
+                    if entry.is_file(follow_symlinks=False):
+                        batch.append(entry)
+                        if len(batch) >= batch_size:
+                            yield batch
+                            batch = []
+        except FileNotFoundError:
+            return
+        if batch:
+            yield batch
+
+    def migrate_legacy_files(self, db, batch_size=500, dry_run=False):
+        """Move flat-layout captures into shards and rewrite their database paths
+
+        Paths are rewritten in the database before the files are moved. If the
+        migration is interrupted, re-running it moves the remaining files and
+        the path updates are no-ops for rows already rewritten.
+        """
+        from utils import get_thumbnail_path
+
+        attendance_table = Attendance.__table__
+        unknown_table = UnknownFace.__table__
+        moved = 0
+
+        for batch in self.iter_legacy_files(batch_size):
+            moves = []
+            for entry in batch:
+                timestamp = self.legacy_timestamp(entry)
+                directory = self.shard_directory(timestamp)
+                moves.append((entry.path, os.path.join(directory, entry.name)))
+
+            if dry_run:
+                moved += len(moves)
+                continue
+
+            params = [{'old_path': old, 'new_path': new} for old, new in moves]
+            for table in (attendance_table, unknown_table):
+                db.session.execute(
+                    update(table)
+                    .where(table.c.image_path == bindparam('old_path'))
+                    .values(image_path=bindparam('new_path')),
+                    params
+                )
+            db.session.commit()
+
+            for old_path, new_path in moves:
+                os.makedirs(os.path.dirname(new_path), exist_ok=True)
+                os.replace(old_path, new_path)
+
+                old_thumbnail = get_thumbnail_path(os.path.relpath(old_path, self.upload_folder), self.upload_folder)
+                if os.path.exists(old_thumbnail):
+                    new_thumbnail = get_thumbnail_path(os.path.relpath(new_path, self.upload_folder), self.upload_folder)
+                    os.makedirs(os.path.dirname(new_thumbnail), exist_ok=True)
+                    os.replace(old_thumbnail, new_thumbnail)
+
+            moved += len(moves)
+            logger.info(f"Migrated {moved} captures to the sharded layout")
+
+        return moved
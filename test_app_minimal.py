@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Test suite for the minimal app served by main.py
+Tests that the templates shared with app.py render against its routes
+"""
+
+import pytest
+import os
+import sys
+import importlib
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+class TestMinimalApp:
+    """Test suite for app_minimal"""
+
+    @pytest.fixture
+    def minimal(self, tmp_path, monkeypatch):
+        """Import app_minimal against a scratch database and upload folder"""
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'minimal.db'}")
+        monkeypatch.delitem(sys.modules, 'app_minimal', raising=False)
+        module = importlib.import_module('app_minimal')
+        module.app.config['TESTING'] = True
+        yield module
+        sys.modules.pop('app_minimal', None)
+
+    def test_pages_render_with_capture(self, minimal):
+        """Test the dashboard and employees pages build the shared navigation and media URLs"""
+        image_path = os.path.join("uploads", "attendance", "capture.jpg")
+        with open(image_path, 'wb') as f:
+            f.write(b'jpeg')
+
+        with minimal.app.app_context():
+            employee = minimal.Employee(name="John Doe", email="john@test.com")
+            minimal.db.session.add(employee)
+            minimal.db.session.commit()
+            minimal.db.session.add(minimal.Attendance(employee_id=employee.id, image_path=image_path))
+            minimal.db.session.commit()
+
+        client = minimal.app.test_client()
+        response = client.get('/dashboard')
+        assert response.status_code == 200
+        assert b'href="/employees"' in response.data
+        assert b'/media/attendance/capture.jpg' in response.data
+        assert client.get('/employees').status_code == 200
+        assert client.get('/media/attendance/capture.jpg').data == b'jpeg'
+        assert client.get('/').headers['Location'].endswith('/dashboard')
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test suite for offline batch recognition
+Tests splitting media into work units and backfilling attendance without face recognition
+"""
+
+import pytest
+import os
+import sys
+import tempfile
+import shutil
+from datetime import datetime
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models import db, Employee, Attendance, create_db_app
+from batch_recognition import discover_media, first_sightings, backfill_attendance
+
+try:
+    import cv2
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+def sighting(employee_id, timestamp, distance=0.3):
+    return {'file': 'clip.mp4', 'frame': 0, 'timestamp': timestamp, 'box': [0, 1, 1, 0],
+            'employee_id': employee_id, 'name': None, 'distance': distance}
+
+class TestMediaDiscovery:
+    """Test suite for discover_media"""
+
+    @pytest.fixture
+    def temp_dir(self):
+        """Create temporary directory for test files"""
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    def test_images_chunked_in_order(self, temp_dir):
+        """Test images anywhere in the tree are split into fixed-size units"""
+        os.makedirs(os.path.join(temp_dir, "b"))
+        for path in ["a1.jpg", "a2.PNG", os.path.join("b", "b1.jpg"), "notes.txt"]:
+            open(os.path.join(temp_dir, path), 'wb').close()
+
+        units = discover_media(temp_dir, images_per_unit=2)
+
+        assert [unit['kind'] for unit in units] == ['images', 'images']
+        assert [os.path.basename(path) for unit in units for path in unit['paths']] == ["a1.jpg", "a2.PNG", "b1.jpg"]
+
+    @pytest.mark.skipif(not CV2_AVAILABLE, reason="OpenCV not available")
+    def test_video_split_into_frame_ranges(self, temp_dir):
+        """Test a video becomes contiguous frame ranges timed from the given start"""
+        path = os.path.join(temp_dir, "clip.avi")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+        for _ in range(25):
+            writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+        writer.release()
+
+        units = discover_media(path, frames_per_unit=10, every=3, start=datetime(2026, 1, 5, 9, 0))
+
+        assert [(unit['first'], unit['stop']) for unit in units] == [(0, 10), (10, 20), (20, 25)]
+        assert all(unit['every'] == 3 and unit['fps'] == 10 for unit in units)
+        assert units[0]['started_at'] == "2026-01-05T09:00:00"
+
+class TestBackfill:
+    """Test suite for backfilling attendance from batch results"""
+
+    @pytest.fixture
+    def app_context(self, monkeypatch):
+        """Create application context with an in-memory database"""
+        monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+        app = create_db_app(__name__)
+
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.drop_all()
+
+    def test_first_sighting_per_day(self):
+        """Test only the earliest recognition per employee and day is kept, and unknowns are ignored"""
+        records = [
+            sighting(1, "2026-01-05T09:10:00"),
+            sighting(1, "2026-01-05T08:55:00"),
+            sighting(1, "2026-01-06T12:00:00"),
+            sighting(None, "2026-01-05T07:00:00", distance=0.9),
+        ]
+
+        sightings = first_sightings(records)
+
+        assert sorted(sightings) == [(1, datetime(2026, 1, 5).date()), (1, datetime(2026, 1, 6).date())]
+        assert sightings[(1, datetime(2026, 1, 5).date())]['timestamp'] == "2026-01-05T08:55:00"
+
+    def test_backfill_skips_days_already_marked(self, app_context):
+        """Test attendance is added in bulk only for employee-days without a record"""
+        ada = Employee(name="Ada", email="ada@test.com")
+        bob = Employee(name="Bob", email="bob@test.com")
+        db.session.add_all([ada, bob])
+        db.session.commit()
+        ada_id, bob_id = ada.id, bob.id
+        db.session.add(Attendance(employee_id=ada_id, timestamp=datetime(2026, 1, 5, 8, 0), confidence=0.7))
+        db.session.commit()
+
+        added = backfill_attendance(db, first_sightings([
+            sighting(ada_id, "2026-01-05T09:00:00"),
+            sighting(ada_id, "2026-01-06T09:00:00"),
+            sighting(bob_id, "2026-01-05T09:30:00", distance=0.25),
+        ]))
+
+        assert added == 2
+        rows = Attendance.query.order_by(Attendance.employee_id, Attendance.timestamp).all()
+        assert [(row.employee_id, row.timestamp) for row in rows] == [
+            (ada_id, datetime(2026, 1, 5, 8, 0)),
+            (ada_id, datetime(2026, 1, 6, 9, 0)),
+            (bob_id, datetime(2026, 1, 5, 9, 30)),
+        ]
+        assert rows[2].confidence == pytest.approx(0.75)
+        assert rows[2].image_path is None
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test suite for the micro-benchmark helpers
+Tests regression detection and the matching benchmark's equivalence to process_frame
+"""
+
+import pytest
+import os
+import sys
+import numpy as np
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+from bench_micro import compare_results, match_face, measure, synthetic_gallery
+from embedding_store import EmbeddingStore
+from replay import FakeCamera
+
+class TestMicroBenchmarks:
+    """Test suite for bench_micro"""
+    
+    def test_compare_flags_only_slowdowns_above_threshold(self):
+        """Test regressions are reported relative to the baseline median"""
+        baseline = {
+            'match/gallery=100': {'median_ms': 1.0},
+            'match/gallery=1000': {'median_ms': 10.0},
+            'encode/num_jitters=1': {'median_ms': 5.0},
+        }
+        current = {
+            'match/gallery=100': {'median_ms': 1.1},
+            'match/gallery=1000': {'median_ms': 13.0},
+            'encode/num_jitters=1': {'median_ms': 2.0},
+            'load_known_faces/rows=100': {'median_ms': 50.0},
+        }
+        
+        regressions = compare_results(current, baseline, threshold=0.15)
+        assert [key for key, _, _, _ in regressions] == ['match/gallery=1000']
+        assert regressions[0][3] == pytest.approx(1.3)
+    
+    def test_match_face_finds_nearest_embedding(self):
+        """Test the matching benchmark does the same work as process_frame"""
+        vectors, labels = synthetic_gallery(50)
+        gallery = EmbeddingStore.from_embeddings(vectors, labels, mode='int8', candidates=4)
+        probe = vectors[17] + 0.001
+        
+        matched, index = match_face(gallery, probe)
+        assert matched
+        assert labels[index] == labels[17]
+        assert not match_face(gallery, probe + 1.0)[0]
+    
+    def test_measure_reports_per_call_times(self):
+        """Test measure returns ordered timing statistics"""
+        result = measure(lambda: np.zeros(10), repeat=3, number=4)
+        assert result['runs'] == 12
+        assert result['min_ms'] <= result['median_ms'] <= result['max_ms']
+
+class TestReplayCamera:
+    """Test suite for the replay harness camera"""
+    
+    def test_replays_image_sequence(self, tmp_path):
+        """Test frames are replayed in order, looped and resized, then reads fail"""
+        import cv2
+        
+        for i in range(3):
+            cv2.imwrite(str(tmp_path / f"frame_{i}.png"), np.full((48, 64, 3), i * 50, dtype=np.uint8))
+        (tmp_path / "notes.txt").write_text("not a frame")
+        
+        camera = FakeCamera(str(tmp_path), fps=0, loops=2, width=32, height=24)
+        assert camera.isOpened()
+        
+        values = []
+        while True:
+            ret, frame = camera.read()
+            if not ret:
+                break
+            assert frame.shape == (24, 32, 3)
+            values.append(int(frame[0, 0, 0]))
+        
+        assert values == [0, 50, 100, 0, 50, 100]
+        assert camera.frames_read == 6
+        assert camera.last_read_at is not None
+        
+        camera.release()
+        assert not camera.isOpened()
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Test suite for the command line interface
+Tests bulk import discovery, checkpointing and a full import without computer vision dependencies
+"""
+
+import pytest
+import os
+import sys
+import tempfile
+import json
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cli
+from cli import discover_import_tasks, load_checkpoint, append_checkpoint, import_employees
+from models import db, Employee, create_db_app
+
+class TestBulkImport:
+    """Test suite for the bulk import command"""
+    
+    @pytest.fixture
+    def temp_dir(self):
+        """Create temporary directory for test files"""
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+    
+    def create_photos(self, folder, count=3):
+        """Create placeholder photo files in a folder"""
+        os.makedirs(folder, exist_ok=True)
+        for i in range(count):
+            open(os.path.join(folder, f"photo{i+1}.jpg"), 'wb').close()
+        open(os.path.join(folder, "notes.txt"), 'w').close()
+    
+    def test_discover_directory_tree(self, temp_dir):
+        """Test discovering employees from one folder per email"""
+        self.create_photos(os.path.join(temp_dir, "john.doe@test.com"))
+        self.create_photos(os.path.join(temp_dir, "jane@test.com"), count=4)
+        
+        tasks = discover_import_tasks(temp_dir)
+        
+        assert [task['email'] for task in tasks] == ["jane@test.com", "john.doe@test.com"]
+        assert tasks[1]['name'] == "John Doe"
+        assert len(tasks[0]['photo_paths']) == 4
+        assert all(path.endswith('.jpg') for path in tasks[1]['photo_paths'])
+    
+    def test_discover_manifest(self, temp_dir):
+        """Test discovering employees from a manifest CSV"""
+        self.create_photos(os.path.join(temp_dir, "photos", "jd"))
+        manifest = os.path.join(temp_dir, "manifest.csv")
+        with open(manifest, 'w') as f:
+            f.write("name,email,folder\nJohn Doe,john@test.com,photos/jd\n")
+        
+        tasks = discover_import_tasks(manifest)
+        
+        assert len(tasks) == 1
+        assert tasks[0]['name'] == "John Doe"
+        assert len(tasks[0]['photo_paths']) == 3
+    
+    def test_discover_duplicate_email(self, temp_dir):
+        """Test an email listed twice is imported once and the repeat reported"""
+        self.create_photos(os.path.join(temp_dir, "photos", "jd"))
+        manifest = os.path.join(temp_dir, "manifest.csv")
+        with open(manifest, 'w') as f:
+            f.write("name,email,folder\nJohn Doe,john@test.com,photos/jd\nJohnny Doe,John@test.com,photos/jd\n")
+        
+        tasks = discover_import_tasks(manifest)
+        
+        assert [task['error'] for task in tasks] == [None, "duplicate email, already listed for John Doe"]
+        assert tasks[1]['photo_paths'] == []
+    
+    def import_app(self, temp_dir, monkeypatch):
+        """Point the CLI at a scratch database and upload folder"""
+        monkeypatch.chdir(temp_dir)
+        monkeypatch.setenv('DATABASE_URL', f"sqlite:///{os.path.join(temp_dir, 'test.db')}")
+        monkeypatch.setenv('EMBEDDING_CACHE_PATH', '')
+        app = create_db_app(__name__)
+        app.config['UPLOAD_FOLDER'] = os.path.join(temp_dir, "uploads")
+        monkeypatch.setattr(cli, '_app', app)
+        # Photos are only copied, as on a machine without dlib
+        monkeypatch.setattr(cli, 'FACE_RECOGNITION_AVAILABLE', False)
+        with app.app_context():
+            db.create_all()
+        return app
+    
+    def test_import_manifest_resumes(self, temp_dir, monkeypatch):
+        """Test a manifest import stores employees, reports duplicates and skips what the checkpoint records"""
+        app = self.import_app(temp_dir, monkeypatch)
+        
+        manifest = os.path.join(temp_dir, "manifest.csv")
+        with open(manifest, 'w') as f:
+            f.write("name,email,folder\n")
+            for person in ("ann", "bob", "cid"):
+                self.create_photos(os.path.join(temp_dir, "photos", person))
+                f.write(f"{person.title()},{person}@test.com,photos/{person}\n")
+            f.write("Ann Again,ann@test.com,photos/bob\n")
+        checkpoint = os.path.join(temp_dir, "import.checkpoint")
+        # A previous run committed Ann before it was interrupted
+        append_checkpoint(checkpoint, ["ann@test.com"])
+        
+        assert import_employees(manifest, workers=1, batch_size=1, checkpoint_path=checkpoint) is False
+        
+        with app.app_context():
+            employees = Employee.query.order_by(Employee.email).all()
+            assert [employee.email for employee in employees] == ["bob@test.com", "cid@test.com"]
+            assert all(len(json.loads(employee.photo_paths)) == 3 for employee in employees)
+        assert load_checkpoint(checkpoint) == {"ann@test.com", "bob@test.com", "cid@test.com"}
+        
+        # Running again finds nothing left to import
+        import_employees(manifest, workers=1, checkpoint_path=checkpoint)
+        with app.app_context():
+            assert Employee.query.count() == 2
+    
+    def test_import_keeps_existing_employee_photos(self, temp_dir, monkeypatch):
+        """Test an email taken meanwhile fails without touching that employee's photos"""
+        import enrollment
+        
+        app = self.import_app(temp_dir, monkeypatch)
+        employee_folder = os.path.join(app.config['UPLOAD_FOLDER'], "employees")
+        os.makedirs(employee_folder)
+        # Named the way photos were before copies got a unique suffix
+        enrolled_photo = os.path.join(employee_folder, "dantest.com_1.jpg")
+        with open(enrolled_photo, 'wb') as f:
+            f.write(b'enrolled')
+        with app.app_context():
+            db.session.add(Employee(name="Eve", email="Eve@Test.com"))
+            db.session.commit()
+        
+        manifest = os.path.join(temp_dir, "manifest.csv")
+        with open(manifest, 'w') as f:
+            f.write("name,email,folder\n")
+            for person in ("dan", "eve"):
+                self.create_photos(os.path.join(temp_dir, "photos", person))
+                f.write(f"{person.title()},{person}@test.com,photos/{person}\n")
+        
+        enroll = enrollment.enroll_employee_photos
+        def enroll_then_race(task):
+            # Dan is enrolled by someone else while his photos are being copied
+            result = enroll(task)
+            with app.app_context():
+                db.session.add(Employee(name="Dan", email="dan@test.com", photo_paths=json.dumps([enrolled_photo])))
+                db.session.commit()
+            return result
+        monkeypatch.setattr(enrollment, 'enroll_employee_photos', enroll_then_race)
+        monkeypatch.setattr(cli, 'ProcessPoolExecutor', ThreadPoolExecutor)
+        
+        checkpoint = os.path.join(temp_dir, "import.checkpoint")
+        assert import_employees(manifest, workers=1, checkpoint_path=checkpoint) is False
+        
+        with app.app_context():
+            assert sorted(employee.email for employee in Employee.query) == ["Eve@Test.com", "dan@test.com"]
+        assert os.listdir(employee_folder) == ["dantest.com_1.jpg"]
+        assert open(enrolled_photo, 'rb').read() == b'enrolled'
+        assert load_checkpoint(checkpoint) == set()
+    
+    def test_checkpoint_roundtrip(self, temp_dir):
+        """Test that committed emails survive a restart"""
+        checkpoint = os.path.join(temp_dir, "import.checkpoint")
+        assert load_checkpoint(checkpoint) == set()
+        
+        append_checkpoint(checkpoint, ["a@test.com", "b@test.com"])
+        append_checkpoint(checkpoint, ["c@test.com"])
+        
+        assert load_checkpoint(checkpoint) == {"a@test.com", "b@test.com", "c@test.com"}
+
+class TestStartup:
+    """Test suite for CLI cold-start imports"""
+    
+    def test_cli_does_not_import_heavy_modules(self):
+        """Test database-only commands never load the web app or computer vision stack"""
+        heavy = ['app', 'cv2', 'face_recognition', 'dlib', 'numpy', 'twilio', 'recognition']
+        code = (
+            "import sys, cli; "
+            f"print('loaded:' + ','.join(m for m in {heavy!r} if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        )
+        loaded = [line for line in result.stdout.splitlines() if line.startswith('loaded:')]
+        assert loaded == ['loaded:']
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
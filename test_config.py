@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test suite for runtime configuration reloads
+Tests snapshots, validation and the reload endpoint
+"""
+
+import pytest
+import os
+import sys
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config, RUNTIME_KEYS
+
+class TestConfigReload:
+    """Test suite for Config.reload and snapshots"""
+    
+    def test_snapshot_is_immutable_and_stable(self):
+        """Test a snapshot is read-only and unaffected by later changes"""
+        config = Config()
+        snapshot = config.snapshot()
+        
+        config.reload({'RECOGNITION_THRESHOLD': 0.45})
+        
+        assert snapshot['RECOGNITION_THRESHOLD'] == 0.6
+        assert config.snapshot()['RECOGNITION_THRESHOLD'] == 0.45
+        with pytest.raises(TypeError):
+            snapshot['RECOGNITION_THRESHOLD'] = 0.1
+    
+    def test_overrides_are_coerced(self):
+        """Test string values from forms or JSON take the type of the setting"""
+        config = Config()
+        changed = config.reload({'PROCESS_EVERY_N_FRAMES': '5', 'BLUR_FACES': 'true', 'TARGET_FPS': 30})
+        
+        assert changed == ['BLUR_FACES', 'PROCESS_EVERY_N_FRAMES']
+        assert config.get('PROCESS_EVERY_N_FRAMES') == 5
+        assert config.get('BLUR_FACES') is True
+    
+    def test_invalid_values_keep_old_config(self):
+        """Test a failed validation leaves the current values in place"""
+        config = Config()
+        before = config.snapshot()
+        
+        with pytest.raises(ValueError):
+            config.reload({'RECOGNITION_THRESHOLD': 1.5, 'PROCESS_EVERY_N_FRAMES': 2})
+        with pytest.raises(ValueError):
+            config.reload({'TARGET_FPS': 'fast'})
+        
+        assert config.to_dict() == dict(before)
+    
+    def test_only_runtime_keys_can_be_overridden(self):
+        """Test settings that need a restart are rejected"""
+        config = Config()
+        assert 'CAMERA_INDEX' not in RUNTIME_KEYS
+        
+        with pytest.raises(ValueError):
+            config.reload({'CAMERA_INDEX': 1})
+    
+    def test_reload_from_environment(self, monkeypatch):
+        """Test reloading re-reads environment variables"""
+        config = Config()
+        monkeypatch.setenv('ATTENDANCE_COOLDOWN_MINUTES', '7')
+        
+        changed = config.reload()
+        
+        assert 'ATTENDANCE_COOLDOWN_MINUTES' in changed
+        assert config.get('ATTENDANCE_COOLDOWN_MINUTES') == 7
+
+    def test_reload_keeps_process_environment(self, monkeypatch):
+        """Test .env values never replace variables set by the process environment"""
+        import config as config_module
+        
+        config = Config()
+        monkeypatch.setenv('PROCESS_EVERY_N_FRAMES', '3')
+        monkeypatch.setenv('ATTENDANCE_COOLDOWN_MINUTES', '0')
+        monkeypatch.delenv('ATTENDANCE_COOLDOWN_MINUTES')
+        monkeypatch.setattr(config_module, '_dotenv_keys', set())
+        dotenv = {'PROCESS_EVERY_N_FRAMES': '6', 'ATTENDANCE_COOLDOWN_MINUTES': '9'}
+        monkeypatch.setattr(config_module, 'dotenv_values', lambda: dotenv)
+        
+        config.reload()
+        assert config.get('PROCESS_EVERY_N_FRAMES') == 3
+        assert config.get('ATTENDANCE_COOLDOWN_MINUTES') == 9
+        
+        # A later edit of .env is picked up for the keys .env provides
+        dotenv['ATTENDANCE_COOLDOWN_MINUTES'] = '11'
+        assert config.reload() == ['ATTENDANCE_COOLDOWN_MINUTES']
+        assert config.get('ATTENDANCE_COOLDOWN_MINUTES') == 11
+
+class TestConfigEndpoint:
+    """Test suite for the reload endpoint"""
+    
+    def test_reload_endpoint(self):
+        """Test overrides are applied and bad values rejected"""
+        import app as app_module
+        
+        app = app_module.app
+        app.config['TESTING'] = True
+        original = app_module.config.get('RECOGNITION_THRESHOLD')
+        
+        with app.test_client() as client:
+            try:
+                response = client.post('/api/config/reload', json={'RECOGNITION_THRESHOLD': 0.5})
+                assert response.status_code == 200
+                assert response.get_json()['restart_required'] == []
+                assert client.get('/api/config').get_json()['RECOGNITION_THRESHOLD'] == 0.5
+                
+                response = client.post('/api/config/reload', json={'UPLOAD_FOLDER': '/tmp'})
+                assert response.status_code == 400
+            finally:
+                app_module.config.reload({'RECOGNITION_THRESHOLD': original})
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test suite for the embedding cache
+Tests content-addressed lookups, LRU eviction and hit rate reporting
+"""
+
+import pytest
+import os
+import sys
+import pickle
+import tempfile
+import shutil
+import numpy as np
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from embedding_cache import EmbeddingCache
+
+class TestEmbeddingCache:
+    """Test suite for the EmbeddingCache class"""
+    
+    @pytest.fixture
+    def temp_dir(self):
+        """Create temporary directory for test files"""
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+    
+    def write_photo(self, temp_dir, name, content):
+        """Write a fake photo file"""
+        path = os.path.join(temp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+    
+    def test_key_depends_on_content_and_settings(self, temp_dir):
+        """Test that identical bytes share a key unless settings differ"""
+        a = self.write_photo(temp_dir, "a.jpg", b"same bytes")
+        b = self.write_photo(temp_dir, "b.jpg", b"same bytes")
+        c = self.write_photo(temp_dir, "c.jpg", b"other bytes")
+        settings = {'model': 'hog', 'num_jitters': 1}
+        
+        assert EmbeddingCache.make_key(a, settings) == EmbeddingCache.make_key(b, settings)
+        assert EmbeddingCache.make_key(a, settings) != EmbeddingCache.make_key(c, settings)
+        assert EmbeddingCache.make_key(a, settings) != EmbeddingCache.make_key(a, {**settings, 'num_jitters': 10})
+    
+    def test_get_put_and_hit_rate(self, temp_dir):
+        """Test round-tripping an embedding and counting hits"""
+        cache = EmbeddingCache(os.path.join(temp_dir, "cache.sqlite"))
+        embedding = np.random.rand(128)
+        
+        assert cache.get("key") is None
+        cache.put("key", embedding, (1, 2, 3, 4))
+        entry = cache.get("key")
+        
+        assert np.allclose(entry['embedding'], embedding, atol=1e-6)
+        assert entry['location'] == (1, 2, 3, 4)
+        stats = cache.stats()
+        assert stats['hits'] == 1 and stats['misses'] == 1
+        assert stats['hit_rate'] == 0.5
+    
+    def test_lru_eviction(self, temp_dir):
+        """Test that the least recently used entry is evicted first"""
+        cache = EmbeddingCache(os.path.join(temp_dir, "cache.sqlite"), max_entries=2)
+        cache.put("a", np.zeros(128))
+        cache.put("b", np.zeros(128))
+        cache.get("a")
+        cache.put("c", np.zeros(128))
+        
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.stats()['entries'] == 2
+    
+    def test_pickle_shares_store(self, temp_dir):
+        """Test that a pickled cache reopens the same store and keeps totals"""
+        cache = EmbeddingCache(os.path.join(temp_dir, "cache.sqlite"))
+        cache.put("key", np.ones(128))
+        
+        copy = pickle.loads(pickle.dumps(cache))
+        assert copy.get("key") is not None
+        assert cache.stats()['total_hits'] == 1
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Test suite for the embedding store
+Tests the float32, float16 and int8 gallery modes against exact search
+"""
+
+import pytest
+import os
+import sys
+import numpy as np
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from embedding_store import EmbeddingStore, STORE_MODES
+
+def gallery(employees=200, per_employee=3, seed=0):
+    """Clustered embeddings like dlib's, with probes of known employees"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0, 0.1, size=(employees, 128))
+    labels = np.repeat(np.arange(employees) + 1, per_employee)
+    vectors = centers[labels - 1] + rng.normal(0, 0.025, size=(len(labels), 128))
+    probes = centers[:50] + rng.normal(0, 0.025, size=(min(employees, 50), 128))
+    return vectors, labels, probes
+
+def strangers(count=50, seed=1):
+    return np.random.default_rng(seed).normal(0, 0.1, size=(count, 128))
+
+class TestEmbeddingStore:
+    """Test suite for EmbeddingStore"""
+
+    @pytest.mark.parametrize('mode', STORE_MODES)
+    def test_matches_exact_search(self, mode):
+        """Test every mode returns the exact nearest embedding and its distance"""
+        vectors, labels, probes = gallery()
+        store = EmbeddingStore.from_embeddings(vectors, labels, mode=mode)
+
+        for probe in probes:
+            exact = np.linalg.norm(vectors - probe, axis=1)
+            index, distance = store.nearest(probe)
+
+            assert index == int(np.argmin(exact))
+            assert distance == pytest.approx(exact.min(), abs=1e-5)
+
+    def test_quantized_modes_are_smaller(self):
+        """Test float16 and int8 hold a half and a quarter of the float32 codes in memory"""
+        vectors, labels, _ = gallery(employees=1000)
+        sizes = {mode: EmbeddingStore.from_embeddings(vectors, labels, mode=mode).memory_bytes() for mode in STORE_MODES}
+
+        assert sizes['float16'] < sizes['float32'] * 0.6
+        assert sizes['int8'] < sizes['float32'] * 0.35
+
+    def test_originals_spilled_to_disk_for_rerank(self):
+        """Test quantized modes keep float32 originals on disk only when re-ranking"""
+        vectors, labels, _ = gallery()
+
+        assert EmbeddingStore.from_embeddings(vectors, labels, mode='float32').disk_bytes() == 0
+        assert EmbeddingStore.from_embeddings(vectors, labels, mode='int8').disk_bytes() == vectors.size * 4
+        assert EmbeddingStore.from_embeddings(vectors, labels, mode='int8', rerank=0).disk_bytes() == 0
+
+    def test_int8_without_rerank_is_close(self):
+        """Test int8 distances without re-ranking stay within the quantization error"""
+        vectors, labels, probes = gallery()
+        store = EmbeddingStore.from_embeddings(vectors, labels, mode='int8', rerank=0)
+
+        for probe in probes:
+            _, distance = store.nearest(probe)
+            assert distance == pytest.approx(np.linalg.norm(vectors - probe, axis=1).min(), abs=0.01)
+
+    def test_search_subset_of_rows(self):
+        """Test search can be limited to given rows and returns them closest first"""
+        vectors, labels, probes = gallery()
+        store = EmbeddingStore.from_embeddings(vectors, labels, mode='int8')
+        rows = np.arange(30, 60)
+
+        indexes, distances = store.search(probes[0], k=5, rows=rows)
+
+        assert set(indexes) <= set(rows)
+        assert list(distances) == sorted(distances)
+        exact = np.linalg.norm(vectors[rows] - probes[0], axis=1)
+        assert list(indexes) == list(rows[np.argsort(exact)[:5]])
+
+    def test_labels_and_names(self):
+        """Test rows map back to employee ids and display names"""
+        vectors, labels, probes = gallery(employees=3)
+        store = EmbeddingStore.from_embeddings(vectors, labels, names={1: 'Ada', 2: 'Bob', 3: 'Cy'})
+
+        index, _ = store.nearest(probes[1])
+
+        assert len(store) == 9
+        assert store.labels[index] == 2
+        assert store.names[int(store.labels[index])] == 'Bob'
+
+    @pytest.mark.parametrize('mode', STORE_MODES)
+    def test_centroid_prefilter_keeps_decisions(self, mode):
+        """Test the two-stage search finds every match within the tolerance exactly"""
+        vectors, labels, probes = gallery()
+        store = EmbeddingStore.from_embeddings(vectors, labels, mode=mode, candidates=4)
+
+        for probe in np.vstack([probes, strangers()]):
+            exact = np.linalg.norm(vectors - probe, axis=1)
+            index, distance = store.nearest(probe, tolerance=0.6)
+
+            assert (distance <= 0.6) == (exact.min() <= 0.6)
+            if exact.min() <= 0.6:
+                assert labels[index] == labels[np.argmin(exact)]
+                assert distance == pytest.approx(exact.min(), abs=1e-5)
+
+    def test_centroid_prefilter_without_tolerance_is_exact(self):
+        """Test the centroid bound alone still returns the true nearest embedding"""
+        vectors, labels, _ = gallery()
+        store = EmbeddingStore.from_embeddings(vectors, labels, candidates=4)
+
+        for probe in strangers(10):
+            exact = np.linalg.norm(vectors - probe, axis=1)
+            assert store.nearest(probe)[1] == pytest.approx(exact.min(), abs=1e-5)
+
+    @pytest.mark.parametrize('mode', ['float32', 'int8'])
+    def test_neighbours_within_tolerance(self, mode):
+        """Test every employee within the tolerance is found with its closest distance"""
+        vectors, labels, probes = gallery()
+        store = EmbeddingStore.from_embeddings(vectors, labels, mode=mode)
+
+        for probe in probes[:10]:
+            exact = np.linalg.norm(vectors - probe, axis=1)
+            expected = {}
+            for label, distance in zip(labels, exact):
+                if distance <= 0.6:
+                    expected[int(label)] = min(distance, expected.get(int(label), distance))
+            found = store.neighbours(probe, 0.6)
+
+            assert found.keys() == expected.keys()
+            assert all(found[label] == pytest.approx(expected[label], abs=1e-5) for label in expected)
+            assert int(labels[np.argmin(exact)]) not in store.neighbours(probe, 0.6, exclude=int(labels[np.argmin(exact)]))
+
+    @pytest.mark.parametrize('mode', ['float32', 'int8'])
+    def test_close_pairs_match_brute_force(self, mode):
+        """Test the blocked all-pairs search finds exactly the pairs a full distance matrix does"""
+        rng = np.random.default_rng(3)
+        # A crowded gallery where many employees have lookalikes
+        centers = rng.normal(0, 0.045, size=(300, 128))
+        labels = np.repeat(np.arange(300) + 1, 3)
+        vectors = centers[labels - 1] + rng.normal(0, 0.02, size=(len(labels), 128))
+        store = EmbeddingStore.from_embeddings(vectors, labels, mode=mode)
+
+        exact = np.linalg.norm(vectors[:, None] - vectors[None], axis=2)
+        expected = {}
+        for i, j in zip(*np.nonzero(exact <= 0.62)):
+            if labels[i] < labels[j]:
+                pair = (int(labels[i]), int(labels[j]))
+                expected[pair] = min(exact[i, j], expected.get(pair, exact[i, j]))
+        pairs = store.close_pairs(0.62, block_size=64)
+
+        assert expected
+        assert {(a, b) for a, b, _ in pairs} == expected.keys()
+        assert all(distance == pytest.approx(expected[(a, b)], abs=1e-5) for a, b, distance in pairs)
+        assert [distance for _, _, distance in pairs] == sorted(distance for _, _, distance in pairs)
+
+    def test_rows_grouped_by_employee(self):
+        """Test rows are stored per employee and centroids cover their embeddings"""
+        vectors, labels, _ = gallery(employees=5)
+        order = np.random.default_rng(2).permutation(len(labels))
+        store = EmbeddingStore.from_embeddings(vectors[order], labels[order])
+
+        assert list(store.employees) == [1, 2, 3, 4, 5]
+        assert list(store.labels[store.employee_rows([1, 3])]) == [2, 2, 2, 4, 4, 4]
+        spread = np.linalg.norm(store.embeddings() - np.repeat(store._decode_codes(store._centroid_codes), 3, axis=0), axis=1)
+        assert (spread <= np.repeat(store._radii, 3)).all()
+
+    @pytest.mark.parametrize('mode', STORE_MODES)
+    def test_with_employee_matches_full_build(self, mode):
+        """Test replacing, removing and adding employees gives the same gallery as a rebuild"""
+        vectors, labels, probes = gallery()
+        rng = np.random.default_rng(3)
+        replaced = vectors[labels == 1][:2] + rng.normal(0, 0.01, size=(2, 128))
+        added = rng.normal(0, 0.1, size=128) + rng.normal(0, 0.025, size=(4, 128))
+        store = EmbeddingStore.from_embeddings(vectors, labels, mode=mode, candidates=4, names={1: 'Ada', 2: 'Bob'})
+
+        updated = store.with_employee(1, replaced, 'Ada').with_employee(2, [], None).with_employee(500, added, 'New')
+
+        keep = (labels != 1) & (labels != 2)
+        rebuilt = EmbeddingStore.from_embeddings(
+            np.vstack([replaced, vectors[keep], added]),
+            np.concatenate([[1, 1], labels[keep], [500] * 4]), mode=mode, candidates=4
+        )
+        assert list(updated.labels) == list(rebuilt.labels)
+        assert list(updated.employees) == list(rebuilt.employees)
+        assert updated.names == {1: 'Ada', 500: 'New'}
+        for probe in np.vstack([probes, added]):
+            (index, distance), (expected, expected_distance) = updated.nearest(probe, 0.6), rebuilt.nearest(probe, 0.6)
+            assert updated.labels[index] == rebuilt.labels[expected]
+            assert distance == pytest.approx(expected_distance, abs=1e-5)
+
+        # The store being matched against is left untouched
+        assert len(store) == len(vectors)
+        assert store.names == {1: 'Ada', 2: 'Bob'}
+
+    def test_with_employee_on_empty_store(self):
+        """Test the first employee added to an empty gallery is searchable"""
+        _, _, probes = gallery(employees=1)
+        store = EmbeddingStore(mode='int8').with_employee(7, probes[:1], 'Ada')
+
+        assert store.nearest(probes[0])[1] == pytest.approx(0, abs=1e-5)
+        assert store.names == {7: 'Ada'}
+
+    def test_empty_store(self):
+        """Test an empty gallery finds nothing"""
+        store = EmbeddingStore.from_embeddings([], [], mode='int8')
+
+        assert len(store) == 0
+        assert store.nearest(np.zeros(128)) == (None, float('inf'))
+
+    def test_invalid_mode(self):
+        """Test unknown modes are rejected"""
+        with pytest.raises(ValueError):
+            EmbeddingStore(mode='int4')
+
+    def test_mismatched_labels(self):
+        """Test embeddings and labels must line up"""
+        vectors, labels, _ = gallery(employees=3)
+
+        with pytest.raises(ValueError):
+            EmbeddingStore.from_embeddings(vectors, labels[:-1])
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test suite for enrollment photo processing
+Tests EXIF orientation and mapping the face found on the downscaled copy back to
+the original photo, with the face detector and encoder mocked
+"""
+
+import pytest
+import os
+import sys
+import types
+import tempfile
+import shutil
+import numpy as np
+from unittest.mock import Mock
+from PIL import Image
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from enrollment import load_oriented_image, preprocess_photo
+
+RED = (255, 0, 0)
+BLUE = (0, 0, 255)
+
+class TestEnrollmentPhotos:
+    """Test suite for load_oriented_image and preprocess_photo"""
+
+    @pytest.fixture
+    def temp_dir(self):
+        """Create temporary directory for test files"""
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def face_recognition(self, monkeypatch):
+        """Stand-in for face_recognition whose detector and encoder the tests control"""
+        module = types.SimpleNamespace(
+            face_locations=Mock(return_value=[]),
+            face_encodings=Mock(return_value=[np.full(128, 0.5)]),
+        )
+        monkeypatch.setitem(sys.modules, 'face_recognition', module)
+        return module
+
+    def test_exif_orientation_applied(self, temp_dir):
+        """Test a photo stored sideways with an EXIF rotation is loaded upright"""
+        # Stored 40 wide and 20 high, red on the left; orientation 6 means rotate 90° clockwise
+        image = Image.new('RGB', (40, 20), BLUE)
+        image.paste(RED, (0, 0, 20, 20))
+        exif = image.getexif()
+        exif[0x0112] = 6
+        path = os.path.join(temp_dir, "sideways.jpg")
+        image.save(path, exif=exif, quality=95)
+
+        oriented = load_oriented_image(path)
+
+        assert oriented.shape == (40, 20, 3)
+        assert oriented[5, 10, 0] > 200 and oriented[5, 10, 2] < 50
+        assert oriented[35, 10, 2] > 200 and oriented[35, 10, 0] < 50
+
+    def test_downscaled_face_maps_to_original(self, temp_dir, face_recognition):
+        """Test the box found on the small copy is scaled back and encoded from a normalized crop"""
+        # A 1600x1200 photo with the face at rows 200-400, columns 400-600
+        image = Image.new('RGB', (1600, 1200), BLUE)
+        image.paste(RED, (400, 200, 600, 400))
+        path = os.path.join(temp_dir, "large.png")
+        image.save(path)
+        # Found on the 800x600 copy, with a smaller second face that is ignored
+        face_recognition.face_locations.return_value = [(0, 20, 10, 10), (100, 300, 200, 200)]
+
+        result = preprocess_photo(path, {'max_dimension': 800, 'crop_size': 300})
+
+        small = face_recognition.face_locations.call_args[0][0]
+        assert small.shape == (600, 800, 3)
+        assert result['location'] == (200, 600, 400, 400)
+
+        # Half a face of margin gives a 400x400 crop from (100, 300), scaled by 0.75
+        crop = face_recognition.face_encodings.call_args[0][0]
+        box = face_recognition.face_encodings.call_args[1]['known_face_locations']
+        assert crop.shape == (300, 300, 3)
+        assert box == [(75, 225, 225, 75)]
+        top, right, bottom, left = box[0]
+        assert (crop[top + 5:bottom - 5, left + 5:right - 5] == RED).all()
+        assert (crop[:top - 5] == BLUE).all()
+        assert result['embedding'] == [0.5] * 128
+
+    def test_no_face_raises(self, temp_dir, face_recognition):
+        """Test a photo without a face is rejected"""
+        path = os.path.join(temp_dir, "empty.png")
+        Image.new('RGB', (100, 100), BLUE).save(path)
+
+        with pytest.raises(ValueError, match="No face found"):
+            preprocess_photo(path)
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
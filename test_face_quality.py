@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test suite for the face quality gate
+Tests the size, brightness, sharpness and pose checks run before encoding
+"""
+
+import pytest
+import os
+import sys
+import numpy as np
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import cv2
+    from face_quality import assess_face, pose_offset, quality_settings, sharpness
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+pytestmark = pytest.mark.skipif(not CV2_AVAILABLE, reason="OpenCV not available")
+
+FRONTAL = {'left_eye': [(40, 50), (50, 50)], 'right_eye': [(70, 50), (80, 50)], 'nose_tip': [(60, 70)]}
+PROFILE = {'left_eye': [(40, 50), (44, 50)], 'right_eye': [(54, 50), (58, 50)], 'nose_tip': [(70, 70)]}
+
+def textured_frame(seed=0):
+    """Mid-grey frame with a sharp checkerboard face region at (100, 200, 200, 100)"""
+    rng = np.random.default_rng(seed)
+    frame = np.full((480, 640, 3), 128, dtype=np.uint8)
+    pattern = (np.indices((100, 100)).sum(axis=0) // 4 % 2 * 120 + 60).astype(np.uint8)
+    frame[100:200, 100:200] = pattern[:, :, None] + rng.integers(0, 10, size=(100, 100, 1), dtype=np.uint8)
+    return frame
+
+class TestFaceQuality:
+    """Test suite for assess_face"""
+
+    def setup_method(self):
+        self.settings = quality_settings({})
+
+    def test_sharp_frontal_face_passes(self):
+        """Test a large, well-lit, sharp frontal face is kept"""
+        assert assess_face(textured_frame(), (100, 200, 200, 100), self.settings, landmarks=lambda: FRONTAL) is None
+
+    def test_small_face_rejected_before_landmarks(self):
+        """Test tiny boxes are rejected without running the landmark model"""
+        def landmarks():
+            raise AssertionError("landmarks should not run")
+
+        assert assess_face(textured_frame(), (100, 130, 130, 100), self.settings, landmarks=landmarks) == 'size'
+
+    def test_dark_face_rejected(self):
+        """Test underexposed faces are rejected"""
+        frame = (textured_frame() // 8).astype(np.uint8)
+        assert assess_face(frame, (100, 200, 200, 100), self.settings) == 'brightness'
+
+    def test_blurry_face_rejected(self):
+        """Test blurred faces are rejected"""
+        frame = textured_frame()
+        frame[100:200, 100:200] = cv2.GaussianBlur(frame[100:200, 100:200], (31, 31), 12)
+
+        assert sharpness(cv2.cvtColor(frame[100:200, 100:200], cv2.COLOR_BGR2GRAY)) < self.settings['min_sharpness']
+        assert assess_face(frame, (100, 200, 200, 100), self.settings) == 'sharpness'
+
+    def test_profile_face_rejected(self):
+        """Test faces turned towards profile are rejected by the pose estimate"""
+        assert pose_offset(FRONTAL) == 0
+        assert pose_offset(PROFILE) > self.settings['max_pose_offset']
+        assert assess_face(textured_frame(), (100, 200, 200, 100), self.settings, landmarks=lambda: PROFILE) == 'pose'
+
+    def test_thresholds_from_config(self):
+        """Test thresholds come from the configuration"""
+        settings = quality_settings({'QUALITY_MIN_FACE_SIZE': 150, 'QUALITY_MAX_POSE_OFFSET': 0})
+
+        assert assess_face(textured_frame(), (100, 200, 200, 100), settings) == 'size'
+        settings['min_size'] = 10
+        assert assess_face(textured_frame(), (100, 200, 200, 100), settings, landmarks=lambda: PROFILE) is None
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test suite for the latest-frame grabber
+Tests that slow consumers get the newest frame and that reused buffers stay intact
+"""
+
+import pytest
+import os
+import sys
+import time
+import threading
+import numpy as np
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from frame_grabber import FrameGrabber
+
+class FakeCamera:
+    """Camera delivering numbered frames at a fixed rate; read(image) fills the given array like OpenCV"""
+
+    def __init__(self, frames=None, interval=0.002):
+        self.frames = frames
+        self.interval = interval
+        self.count = 0
+        self.allocations = 0
+        self.release_reads = threading.Event()
+        self.release_reads.set()
+
+    def read(self, image=None):
+        self.release_reads.wait()
+        time.sleep(self.interval)
+        if self.frames is not None and self.count >= self.frames:
+            return False, None
+        self.count += 1
+        if image is None:
+            image = np.empty((4, 4, 3), dtype=np.uint8)
+            self.allocations += 1
+        image[:] = self.count % 256
+        return True, image
+
+class TestFrameGrabber:
+    """Test suite for FrameGrabber"""
+
+    def test_slow_consumer_gets_newest_frame(self):
+        """Test frames queued while the consumer was busy are skipped"""
+        camera = FakeCamera()
+        grabber = FrameGrabber(camera).start()
+        try:
+            first = grabber.latest(timeout=1)
+            time.sleep(0.05)
+            second = grabber.latest(timeout=1)
+
+            assert second.seq > first.seq + 1
+            assert second.seq >= camera.count - 1
+            assert time.monotonic() - second.timestamp < 0.05
+        finally:
+            grabber.stop()
+
+    def test_frame_never_returned_twice(self):
+        """Test latest waits for a newer frame instead of repeating one"""
+        camera = FakeCamera()
+        grabber = FrameGrabber(camera).start()
+        try:
+            camera.release_reads.clear()
+            time.sleep(0.01)
+            # Take whatever the read in progress delivered before the camera paused
+            last = grabber.latest(timeout=1)
+
+            assert grabber.latest(timeout=0.05) is None
+            camera.release_reads.set()
+            assert grabber.latest(timeout=1).seq > last.seq
+        finally:
+            camera.release_reads.set()
+            grabber.stop()
+
+    def test_reused_buffers_not_overwritten_while_held(self):
+        """Test a frame handed out keeps its pixels until the next call"""
+        camera = FakeCamera(interval=0.001)
+        grabber = FrameGrabber(camera, reuse_buffers=True).start()
+        try:
+            for _ in range(20):
+                frame = grabber.latest(timeout=1)
+                value = frame.image[0, 0, 0]
+                time.sleep(0.01)
+                assert (frame.image == value).all()
+                assert value == frame.seq % 256
+            assert camera.allocations <= 4
+        finally:
+            grabber.stop()
+
+    def test_end_of_stream(self):
+        """Test the last frame is still delivered after the camera stops"""
+        grabber = FrameGrabber(FakeCamera(frames=3, interval=0)).start()
+        time.sleep(0.05)
+
+        assert grabber.latest(timeout=1).seq == 3
+        assert grabber.latest(timeout=1) is None
+        grabber.stop()
+
+    def test_stop_wakes_waiting_consumer(self):
+        """Test stop() releases a consumer blocked waiting for a frame"""
+        camera = FakeCamera()
+        camera.release_reads.clear()
+        grabber = FrameGrabber(camera).start()
+
+        threading.Timer(0.05, grabber.stop, kwargs={'timeout': 0}).start()
+        started = time.monotonic()
+
+        assert grabber.latest(timeout=5) is None
+        assert time.monotonic() - started < 1
+        camera.release_reads.set()
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
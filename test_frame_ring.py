@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test suite for the shared-memory frame ring
+Tests in-place writes, zero-copy reads, overwrite-on-lag and cross-process access
+"""
+
+import pytest
+import os
+import sys
+import multiprocessing as mp
+import numpy as np
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from frame_ring import FrameRing, RingReader
+
+SHAPE = (4, 6, 3)
+
+def frame(value):
+    return np.full(SHAPE, value, dtype=np.uint8)
+
+@pytest.fixture
+def ring():
+    ring = FrameRing.create(slots=4, shape=SHAPE)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+def write_frames(name, count):
+    ring = FrameRing.attach(name)
+    for i in range(count):
+        ring.write(frame(i + 1))
+    ring.close()
+
+class TestFrameRing:
+    """Test suite for FrameRing and RingReader"""
+
+    def test_reads_are_views_of_shared_memory(self, ring):
+        """Test frames come back in order without being copied"""
+        reader = RingReader(ring)
+        ring.write(frame(1))
+        ring.write(frame(2))
+
+        first = reader.read(timeout=0)
+        assert (first.seq, int(first.image[0, 0, 0])) == (1, 1)
+        assert not first.image.flags.owndata
+        assert reader.read(timeout=0).seq == 2
+        assert reader.read(timeout=0) is None
+        first = None
+
+    def test_write_in_place(self, ring):
+        """Test a frame captured into the claimed slot is invisible until committed"""
+        reader = RingReader(ring)
+        seq, view = ring.begin_write()
+        view[:] = 7
+
+        assert reader.read(timeout=0) is None
+        ring.commit(seq)
+        assert int(reader.read(timeout=0).image.max()) == 7
+        view = None
+
+    def test_overwrite_on_lag(self, ring):
+        """Test a reader that falls behind skips to the oldest safe frame and counts drops"""
+        reader = RingReader(ring)
+        for i in range(10):
+            ring.write(frame(i + 1))
+
+        result = reader.read(timeout=0)
+        # 4 slots: frames 8-10 are safe, 7's slot is next to be written
+        assert result.seq == 8
+        assert reader.dropped == 7
+        assert not ring.valid(3)
+        result = None
+
+    def test_latest(self, ring):
+        """Test latest=True jumps straight to the newest frame"""
+        reader = RingReader(ring)
+        for i in range(3):
+            ring.write(frame(i + 1))
+
+        assert reader.read(timeout=0, latest=True).seq == 3
+        assert reader.dropped == 2
+
+    def test_view_invalidated_by_overwrite(self, ring):
+        """Test valid() reports when a held view has been reused by the writer"""
+        ring.write(frame(1))
+        held = ring.get(1)
+        assert ring.valid(held.seq)
+
+        for i in range(4):
+            ring.write(frame(i + 2))
+        assert not ring.valid(held.seq)
+        assert ring.get(1) is None
+        held = None
+
+    def test_cross_process(self, ring):
+        """Test frames written by another process are visible here"""
+        reader = RingReader(ring)
+        process = mp.Process(target=write_frames, args=(ring.name, 3))
+        process.start()
+        process.join(10)
+
+        assert process.exitcode == 0
+        assert ring.head == 3
+        assert int(reader.read(timeout=1, latest=True).image[0, 0, 0]) == 3
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
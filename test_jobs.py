@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Test suite for background upload jobs
+Tests job processing with a mocked encoder so no camera or dlib models are needed
+"""
+
+import pytest
+import os
+import sys
+import json
+import tempfile
+import shutil
+import numpy as np
+from unittest.mock import patch
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from models import db, Employee
+from jobs import UploadJobQueue
+import embedding_store
+
+class TestUploadJobQueue:
+    """Test suite for the UploadJobQueue class"""
+    
+    @pytest.fixture
+    def app_client(self):
+        """Create Flask test client"""
+        app.config['TESTING'] = True
+        
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                yield client
+                db.drop_all()
+    
+    @pytest.fixture
+    def temp_dir(self):
+        """Create temporary directory for test files"""
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+    
+    def create_job(self, temp_dir, photo_count=3, conflict_settings=None):
+        """Create an employee and a queued job with placeholder photos"""
+        employee = Employee(name="John Doe", email="john@test.com")
+        db.session.add(employee)
+        db.session.commit()
+        
+        photo_paths = []
+        for i in range(photo_count):
+            path = os.path.join(temp_dir, f"photo{i+1}.jpg")
+            open(path, 'wb').close()
+            photo_paths.append(path)
+        
+        queue = UploadJobQueue(app, db, max_workers=1, conflict_settings=conflict_settings)
+        with patch.object(queue, 'submit'):
+            job = queue.enqueue(employee.id, photo_paths)
+        return queue, job.id, employee.id, photo_paths
+    
+    def test_job_completes(self, app_client, temp_dir):
+        """Test that a job stores embeddings and reports progress"""
+        queue, job_id, employee_id, photo_paths = self.create_job(temp_dir)
+        
+        with patch('enrollment.encode_photo', return_value=[0.1] * 128):
+            queue.process(job_id)
+        
+        db.session.expire_all()
+        employee = db.session.get(Employee, employee_id)
+        assert len(json.loads(employee.face_embeddings)) == 3
+        
+        response = app_client.get(f'/api/jobs/{job_id}')
+        data = response.get_json()
+        assert data['status'] == 'completed'
+        assert data['processed'] == data['total'] == 3
+        assert data['errors'] == []
+    
+    def test_job_reports_per_photo_errors(self, app_client, temp_dir):
+        """Test that rejected photos are reported and the upload is rolled back"""
+        queue, job_id, employee_id, photo_paths = self.create_job(temp_dir)
+        
+        def fake_encode(path, settings=None, cache=None):
+            if path.endswith('photo2.jpg'):
+                raise ValueError("No face found")
+            return [0.1] * 128
+        
+        with patch('enrollment.encode_photo', side_effect=fake_encode):
+            queue.process(job_id)
+        
+        data = app_client.get(f'/api/jobs/{job_id}').get_json()
+        assert data['status'] == 'failed'
+        assert [e['photo'] for e in data['errors']] == [2]
+        assert not any(os.path.exists(path) for path in photo_paths)
+        
+        db.session.expire_all()
+        assert db.session.get(Employee, employee_id).face_embeddings is None
+    
+    def create_lookalike(self):
+        """Enroll an employee whose faces sit right next to the uploaded ones"""
+        lookalike = Employee(name="Jane Doe", email="jane@test.com",
+                             face_embeddings=json.dumps([[0.11] * 128, [0.5] * 128]))
+        db.session.add(lookalike)
+        db.session.commit()
+        return lookalike.id
+    
+    def test_conflicting_upload_rejected(self, app_client, temp_dir):
+        """Test faces matching another employee fail the job and are not stored"""
+        lookalike_id = self.create_lookalike()
+        queue, job_id, employee_id, photo_paths = self.create_job(
+            temp_dir, conflict_settings={'action': 'reject', 'distance': 0.5})
+        
+        with patch('enrollment.encode_photo', return_value=[0.1] * 128):
+            queue.process(job_id)
+        
+        data = app_client.get(f'/api/jobs/{job_id}').get_json()
+        assert data['status'] == 'failed'
+        assert [e['photo'] for e in data['errors']] == [1, 2, 3]
+        assert {e['employee_id'] for e in data['errors']} == {lookalike_id}
+        assert data['errors'][0]['distance'] == pytest.approx(0.01 * 128 ** 0.5, abs=1e-4)
+        assert not any(os.path.exists(path) for path in photo_paths)
+        
+        db.session.expire_all()
+        assert db.session.get(Employee, employee_id).face_embeddings is None
+    
+    def test_conflicting_upload_flagged(self, app_client, temp_dir):
+        """Test flagged conflicts are reported on a job that still completes"""
+        self.create_lookalike()
+        queue, job_id, employee_id, photo_paths = self.create_job(
+            temp_dir, conflict_settings={'action': 'flag', 'distance': 0.5})
+        
+        with patch('enrollment.encode_photo', return_value=[0.1] * 128):
+            queue.process(job_id)
+        
+        data = app_client.get(f'/api/jobs/{job_id}').get_json()
+        assert data['status'] == 'completed'
+        assert len(data['errors']) == 3
+        
+        db.session.expire_all()
+        assert len(json.loads(db.session.get(Employee, employee_id).face_embeddings)) == 3
+    
+    def test_conflict_gallery_kept_between_jobs(self, app_client, temp_dir):
+        """Test later checks patch the queue's gallery with new and deleted employees"""
+        rng = np.random.default_rng(3)
+        for i in range(8):
+            db.session.add(Employee(name=f"Employee {i}", email=f"employee{i}@test.com",
+                                    face_embeddings=json.dumps(rng.normal(size=(2, 128)).tolist())))
+        db.session.commit()
+        queue, job_id, employee_id, photo_paths = self.create_job(
+            temp_dir, conflict_settings={'action': 'reject', 'distance': 0.5})
+        
+        def enqueue_for(name, email):
+            employee = Employee(name=name, email=email)
+            db.session.add(employee)
+            db.session.commit()
+            path = os.path.join(temp_dir, f"{email}.jpg")
+            open(path, 'wb').close()
+            with patch.object(queue, 'submit'):
+                return queue.enqueue(employee.id, [path]).id
+        
+        with patch('enrollment.encode_photo', return_value=[0.1] * 128), \
+                patch('embedding_store.gallery_payload', wraps=embedding_store.gallery_payload) as payload:
+            queue.process(job_id)
+            assert app_client.get(f'/api/jobs/{job_id}').get_json()['status'] == 'completed'
+            
+            # The second upload is the face John Doe just enrolled
+            second_id = enqueue_for("Jim Doe", "jim@test.com")
+            queue.process(second_id)
+            data = app_client.get(f'/api/jobs/{second_id}').get_json()
+            assert data['status'] == 'failed'
+            assert {e['employee_id'] for e in data['errors']} == {employee_id}
+            
+            db.session.delete(db.session.get(Employee, employee_id))
+            db.session.commit()
+            third_id = enqueue_for("Jim Doe", "jim.doe@test.com")
+            queue.process(third_id)
+            assert app_client.get(f'/api/jobs/{third_id}').get_json()['status'] == 'completed'
+            
+            assert payload.call_count == 1
+        assert employee_id not in queue.enrolled.gallery.names
+    
+    def test_unknown_job(self, app_client):
+        """Test that an unknown job id returns 404"""
+        response = app_client.get('/api/jobs/does-not-exist')
+        assert response.status_code == 404
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
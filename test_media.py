@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test suite for the media endpoint
+Tests thumbnail caching, conditional requests and range support
+"""
+
+import pytest
+import os
+import sys
+import uuid
+import shutil
+import numpy as np
+from PIL import Image
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, media_url
+from utils import get_thumbnail_path
+
+class TestMediaEndpoint:
+    """Test suite for serving uploaded images"""
+    
+    @pytest.fixture
+    def app_client(self):
+        """Create Flask test client"""
+        app.config['TESTING'] = True
+        
+        with app.test_client() as client:
+            with app.app_context():
+                yield client
+    
+    @pytest.fixture
+    def capture(self):
+        """Create a capture image inside the upload folder"""
+        upload_folder = app.config["UPLOAD_FOLDER"]
+        relative_path = f"test_{uuid.uuid4().hex}/capture.jpg"
+        image_path = os.path.join(upload_folder, relative_path)
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+        Image.fromarray(np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)).save(image_path)
+        yield relative_path, image_path
+        shutil.rmtree(os.path.dirname(image_path))
+        shutil.rmtree(os.path.dirname(get_thumbnail_path(relative_path, upload_folder)), ignore_errors=True)
+    
+    def test_serves_original_with_cache_headers(self, app_client, capture):
+        """Test that originals carry a strong ETag and answer conditional requests"""
+        relative_path, image_path = capture
+        
+        response = app_client.get(f'/media/{relative_path}')
+        assert response.status_code == 200
+        assert response.data == open(image_path, 'rb').read()
+        etag = response.headers['ETag']
+        assert not etag.startswith('W/')
+        assert response.cache_control.max_age > 0
+        
+        response = app_client.get(f'/media/{relative_path}', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+    
+    def test_range_request(self, app_client, capture):
+        """Test partial content responses"""
+        relative_path, image_path = capture
+        
+        response = app_client.get(f'/media/{relative_path}', headers={'Range': 'bytes=0-99'})
+        assert response.status_code == 206
+        assert len(response.data) == 100
+    
+    def test_thumbnail_is_cached(self, app_client, capture):
+        """Test that the thumbnail is generated once and then served from disk"""
+        relative_path, image_path = capture
+        thumbnail_path = get_thumbnail_path(relative_path, app.config["UPLOAD_FOLDER"])
+        
+        response = app_client.get(f'/media/{relative_path}?size=thumb')
+        assert response.status_code == 200
+        assert os.path.exists(thumbnail_path)
+        with Image.open(thumbnail_path) as thumbnail:
+            assert max(thumbnail.size) <= 150
+        
+        mtime = os.stat(thumbnail_path).st_mtime
+        app_client.get(f'/media/{relative_path}?size=thumb')
+        assert os.stat(thumbnail_path).st_mtime == mtime
+    
+    def test_rejects_paths_outside_upload_folder(self, app_client):
+        """Test that path traversal is refused"""
+        response = app_client.get('/media/../app.py')
+        assert response.status_code == 404
+    
+    def test_media_url_is_versioned(self, app_client, capture):
+        """Test that template URLs include the file version"""
+        relative_path, image_path = capture
+        
+        with app.test_request_context():
+            url = media_url(image_path, 'thumb')
+        assert url.startswith(f'/media/{relative_path}?')
+        assert 'size=thumb' in url and 'v=' in url
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test suite for recognition pipeline metrics
+Tests the Prometheus text format, histogram buckets and the /metrics endpoint
+"""
+
+import pytest
+import os
+import sys
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import MetricsRegistry, Counter, Gauge, Histogram, CONTENT_TYPE
+
+class TestMetrics:
+    """Test suite for the metrics registry"""
+    
+    def test_counter_render(self):
+        """Test counters render HELP, TYPE and one sample per label set"""
+        registry = MetricsRegistry()
+        counter = Counter('frames_total', 'Frames by outcome', labelnames=('outcome',), registry=registry)
+        counter.labels('read').inc()
+        counter.labels('read').inc(2)
+        counter.labels('skipped').inc()
+        
+        lines = registry.render().splitlines()
+        assert lines[0] == '# HELP frames_total Frames by outcome'
+        assert lines[1] == '# TYPE frames_total counter'
+        assert 'frames_total{outcome="read"} 3' in lines
+        assert 'frames_total{outcome="skipped"} 1' in lines
+    
+    def test_histogram_buckets(self):
+        """Test histogram buckets are cumulative and end with +Inf"""
+        registry = MetricsRegistry()
+        histogram = Histogram('stage_seconds', 'Stage latency', labelnames=('stage',),
+                              registry=registry, buckets=(0.01, 0.1, 1.0))
+        child = histogram.labels('detect')
+        for value in (0.005, 0.05, 0.05, 5.0):
+            child.observe(value)
+        
+        output = registry.render()
+        assert 'stage_seconds_bucket{stage="detect",le="0.01"} 1' in output
+        assert 'stage_seconds_bucket{stage="detect",le="0.1"} 3' in output
+        assert 'stage_seconds_bucket{stage="detect",le="1"} 3' in output
+        assert 'stage_seconds_bucket{stage="detect",le="+Inf"} 4' in output
+        assert 'stage_seconds_count{stage="detect"} 4' in output
+        assert 'stage_seconds_sum{stage="detect"} 5.105' in output
+    
+    def test_histogram_timer(self):
+        """Test the timer observes once even when the block raises"""
+        registry = MetricsRegistry()
+        histogram = Histogram('op_seconds', 'Operation latency', registry=registry)
+        
+        with histogram.time():
+            pass
+        with pytest.raises(ValueError):
+            with histogram.time():
+                raise ValueError("boom")
+        
+        assert 'op_seconds_count 2' in registry.render()
+    
+    def test_label_escaping(self):
+        """Test label values are escaped"""
+        registry = MetricsRegistry()
+        gauge = Gauge('value', 'A gauge', labelnames=('name',), registry=registry)
+        gauge.labels('a\\b"c\nd').set(1.5)
+        
+        assert 'value{name="a\\\\b\\"c\\nd"} 1.5' in registry.render()
+
+class TestMetricsEndpoint:
+    """Test suite for the /metrics endpoint"""
+    
+    def test_metrics_endpoint(self):
+        """Test /metrics serves the pipeline metrics in Prometheus format"""
+        from app import app
+        
+        app.config['TESTING'] = True
+        with app.test_client() as client:
+            response = client.get('/metrics')
+        
+        assert response.status_code == 200
+        assert response.headers['Content-Type'] == CONTENT_TYPE
+        body = response.get_data(as_text=True)
+        assert '# TYPE face_attendance_stage_seconds histogram' in body
+        assert 'face_attendance_frames_total{outcome="processed"}' in body
+        assert 'face_attendance_stage_seconds_bucket{stage="detect",le="+Inf"}' in body
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test suite for the on-demand recognition profiler
+Tests sampling and cProfile sessions against a stand-in recognition loop
+"""
+
+import pytest
+import os
+import sys
+import pstats
+import shutil
+import tempfile
+import threading
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from profiler import RecognitionProfiler
+
+def busy_frame():
+    """Stand-in for process_frame that burns a little CPU"""
+    total = 0
+    for i in range(20000):
+        total += i * i
+    return total
+
+class FakeLoop:
+    """Minimal loop calling the profiler hook the way FaceRecognitionSystem.run does"""
+    
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.is_running = True
+        self.attached = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+    
+    def run(self):
+        self.profiler.attach(threading.get_ident())
+        self.attached.set()
+        try:
+            while self.is_running:
+                busy_frame()
+                if self.profiler.session is not None:
+                    self.profiler.on_frame()
+        finally:
+            self.profiler.detach()
+    
+    def __enter__(self):
+        self.thread.start()
+        self.attached.wait(5)
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.is_running = False
+        self.thread.join(5)
+
+class TestRecognitionProfiler:
+    """Test suite for profiling sessions"""
+    
+    @pytest.fixture
+    def output_dir(self):
+        directory = tempfile.mkdtemp()
+        yield directory
+        shutil.rmtree(directory, ignore_errors=True)
+    
+    def test_requires_running_loop(self, output_dir):
+        """Test a session cannot start before the loop attaches"""
+        profiler = RecognitionProfiler(output_dir)
+        with pytest.raises(RuntimeError):
+            profiler.start(seconds=1)
+    
+    def test_sampling_session_writes_collapsed_stacks(self, output_dir):
+        """Test a time-bounded sampling session writes flamegraph input"""
+        profiler = RecognitionProfiler(output_dir, sample_interval=0.001)
+        with FakeLoop(profiler):
+            session = profiler.start(mode='sampling', seconds=0.3)
+            assert session.finished.wait(5)
+        
+        assert 'pstats' not in session.files
+        with open(session.files['collapsed']) as f:
+            lines = f.read().splitlines()
+        assert lines
+        stack, count = lines[0].rsplit(' ', 1)
+        assert int(count) > 0
+        assert any('test_profiler.py:busy_frame' in line for line in lines)
+        assert not profiler.status()['active']
+    
+    def test_cprofile_session_bounded_by_frames(self, output_dir):
+        """Test a cProfile session stops after N frames and writes a pstats file"""
+        profiler = RecognitionProfiler(output_dir, sample_interval=0.001)
+        with FakeLoop(profiler):
+            session = profiler.start(mode='cprofile', frames=20)
+            assert session.finished.wait(5)
+        
+        assert session.frames == 20
+        stats = pstats.Stats(session.files['pstats'])
+        assert any(name == 'busy_frame' for _, _, name in stats.stats)
+        assert os.path.exists(session.files['collapsed'])
+    
+    def test_rejects_concurrent_and_invalid_sessions(self, output_dir):
+        """Test only one session runs at a time and limits are enforced"""
+        profiler = RecognitionProfiler(output_dir, max_seconds=5)
+        with FakeLoop(profiler):
+            with pytest.raises(ValueError):
+                profiler.start(seconds=60)
+            with pytest.raises(ValueError):
+                profiler.start(mode='perf', seconds=1)
+            session = profiler.start(seconds=1)
+            with pytest.raises(RuntimeError):
+                profiler.start(seconds=1)
+        # Stopping the loop finishes the session early
+        assert session.finished.is_set()
+    
+    def test_profile_endpoint_disabled_by_default(self):
+        """Test the admin endpoint refuses requests unless enabled"""
+        from app import app
+        
+        app.config['TESTING'] = True
+        with app.test_client() as client:
+            response = client.post('/api/recognition/profile', json={'seconds': 5})
+        assert response.status_code == 403
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
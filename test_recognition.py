@@ -28,7 +28,7 @@ try:
     from PIL import Image
     from recognition import FaceRecognitionSystem
     from notifier import NotificationService
-    from utils import blur_face, validate_image_file, resize_image
+    from utils import BufferPool, blur_face, validate_image_file, resize_image, shrink_to_rgb
     FACE_RECOGNITION_AVAILABLE = True
 except ImportError:
     FACE_RECOGNITION_AVAILABLE = False
@@ -130,6 +130,19 @@ class TestFaceRecognitionSystem:
         assert isinstance(recognition_system.known_face_names, list)
         assert isinstance(recognition_system.employee_ids, list)
     
+    @pytest.mark.skipif(not FACE_RECOGNITION_AVAILABLE, reason="Face recognition modules not available")
+    def test_stop_while_camera_opens(self, recognition_system):
+        """Test a stop that arrives before the camera is open keeps the loop from starting"""
+        camera = Mock()
+        camera.isOpened.side_effect = lambda: recognition_system.stop() or True
+        recognition_system.camera = camera
+        
+        recognition_system.run()
+        
+        assert recognition_system.is_running is False
+        camera.read.assert_not_called()
+        camera.release.assert_called_once()
+    
     @pytest.mark.skipif(not FACE_RECOGNITION_AVAILABLE, reason="Face recognition modules not available")
     def test_load_known_faces_empty(self, recognition_system):
         """Test loading known faces when no employees exist"""
@@ -138,6 +151,131 @@ class TestFaceRecognitionSystem:
         assert len(recognition_system.known_face_encodings) == 0
         assert len(recognition_system.known_face_names) == 0
         assert len(recognition_system.employee_ids) == 0
+    
+    @pytest.mark.skipif(not FACE_RECOGNITION_AVAILABLE, reason="Face recognition modules not available")
+    def test_update_employee(self, recognition_system):
+        """Test one employee's photos are swapped into the gallery without a full reload"""
+        john = self.create_test_employee()
+        jane = self.create_test_employee("Jane Doe", "jane@test.com")
+        john_id, jane_id = john.id, jane.id
+        db.session.commit()
+        recognition_system.load_known_faces()
+        
+        new_embeddings = np.random.rand(3, 128).tolist()
+        jane.face_embeddings = json.dumps(new_embeddings)
+        db.session.commit()
+        recognition_system.update_employee(jane_id)
+        
+        assert recognition_system.employee_ids == [john_id, jane_id, jane_id, jane_id]
+        assert recognition_system.gallery.nearest(new_embeddings[1])[1] == pytest.approx(0, abs=1e-5)
+        
+        db.session.delete(john)
+        db.session.commit()
+        recognition_system.update_employee(john_id)
+        
+        assert recognition_system.employee_ids == [jane_id] * 3
+        assert recognition_system.known_face_names == ["Jane Doe"] * 3
+    
+    @pytest.mark.skipif(not FACE_RECOGNITION_AVAILABLE, reason="Face recognition modules not available")
+    def test_update_during_reload_is_kept(self, recognition_system):
+        """Test an upload finishing while a full reload builds its gallery is not overwritten by it"""
+        import threading
+        
+        jane = self.create_test_employee("Jane Doe", "jane@test.com")
+        jane_id = jane.id
+        db.session.commit()
+        new_embeddings = np.random.rand(3, 128).tolist()
+        build_gallery = recognition_system.build_gallery
+        updates = []
+        
+        def upload_job():
+            with app.app_context():
+                recognition_system.update_employee(jane_id)
+        
+        def build_after_upload(*args):
+            # The reload has read the old embeddings; an upload job now commits and reloads Jane
+            jane.face_embeddings = json.dumps(new_embeddings)
+            db.session.commit()
+            update = threading.Thread(target=upload_job)
+            update.start()
+            update.join(timeout=0.2)
+            updates.append(update)
+            return build_gallery(*args)
+        
+        with patch.object(recognition_system, 'build_gallery', side_effect=build_after_upload):
+            recognition_system.load_known_faces()
+        updates[0].join(timeout=5)
+        
+        assert recognition_system.employee_ids == [jane_id] * 3
+        assert recognition_system.gallery.nearest(new_embeddings[1])[1] == pytest.approx(0, abs=1e-5)
+    
+    @pytest.mark.skipif(not FACE_RECOGNITION_AVAILABLE, reason="Face recognition modules not available")
+    def test_switches_to_activated_gallery_version(self, recognition_system):
+        """Test the loop reloads the gallery once a re-embedding job activates a version"""
+        from models import GalleryVersion
+        
+        self.create_test_employee()
+        recognition_system.check_gallery_version()
+        assert recognition_system.gallery_version is None
+        assert len(recognition_system.gallery) == 0
+        
+        db.session.add(GalleryVersion(status='active'))
+        db.session.commit()
+        recognition_system.check_gallery_version()
+        
+        assert recognition_system.gallery_version is not None
+        assert recognition_system.known_face_names == ["John Doe"]
+    
+    @pytest.mark.skipif(not FACE_RECOGNITION_AVAILABLE, reason="Face recognition modules not available")
+    def test_quality_gate_skips_encoding(self, recognition_system):
+        """Test faces rejected by the quality gate are counted and never encoded"""
+        from metrics import FACES_REJECTED, REJECTED
+        
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        rejected = FACES_REJECTED.value
+        too_small = REJECTED['size'].value
+        
+        with patch('face_recognition.face_locations', return_value=[(10, 15, 15, 10)]), \
+             patch('face_recognition.face_encodings') as face_encodings:
+            recognition_system.process_frame(frame)
+        
+        face_encodings.assert_not_called()
+        assert FACES_REJECTED.value == rejected + 1
+        assert REJECTED['size'].value == too_small + 1
+    
+    @pytest.mark.skipif(not FACE_RECOGNITION_AVAILABLE, reason="Face recognition modules not available")
+    def test_refine_encodes_full_resolution_crop(self, recognition_system):
+        """Test coarse-to-fine encoding uses a full-resolution crop around the face"""
+        frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+        
+        with patch('face_recognition.face_encodings', return_value=[np.zeros(128)]) as face_encodings:
+            recognition_system.encode_full_resolution(frame, (400, 700, 600, 500))
+        
+        rgb_crop, locations = face_encodings.call_args[0]
+        # 50 px margin on each side of a 200 px face
+        assert rgb_crop.shape[:2] == (300, 300)
+        assert locations == [(50, 250, 250, 50)]
+    
+    @pytest.mark.skipif(not FACE_RECOGNITION_AVAILABLE, reason="Face recognition modules not available")
+    def test_batch_worker_matches_like_live_loop(self, temp_dir):
+        """Test a batch worker runs the same pipeline and writes one record per face"""
+        import batch_recognition
+        
+        path = os.path.join(temp_dir, "door.jpg")
+        cv2.imwrite(path, np.zeros((480, 640, 3), dtype=np.uint8))
+        settings = {'QUALITY_GATE_ENABLED': False, 'RECOGNITION_THRESHOLD': 0.6}
+        batch_recognition.init_worker(settings, (np.zeros((2, 128)), [7, 7], {7: 'Ada'}))
+        
+        with patch('face_recognition.face_locations', return_value=[(10, 40, 50, 20), (60, 90, 100, 70)]), \
+             patch('face_recognition.face_encodings', return_value=[np.full(128, 0.01), np.ones(128)]):
+            records, frames = batch_recognition.recognize_unit({'kind': 'images', 'paths': [path]})
+        
+        assert frames == 1
+        assert [(record['file'], record['employee_id'], record['name']) for record in records] == [
+            (path, 7, 'Ada'), (path, None, None)
+        ]
+        assert records[0]['box'] == [40, 160, 200, 80]
+        assert records[0]['distance'] == pytest.approx(np.sqrt(128) * 0.01, abs=1e-4)
 
 class TestUtilityFunctions:
     """Test suite for utility functions"""
@@ -169,6 +307,24 @@ class TestUtilityFunctions:
         assert resized.shape[1] <= 800  # width
         assert resized.shape[2] == 3    # channels
     
+    @pytest.mark.skipif(not FACE_RECOGNITION_AVAILABLE, reason="Face recognition modules not available")
+    def test_shrink_to_rgb_reuses_buffers(self):
+        """Test detection images match resize + cvtColor and reuse the same memory"""
+        pool = BufferPool()
+        frame = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+        expected = cv2.cvtColor(cv2.resize(frame[40:, 60:], (0, 0), fx=0.25, fy=0.25), cv2.COLOR_BGR2RGB)
+        
+        first = shrink_to_rgb(frame[40:, 60:], 0.25, pool, 'camera')
+        address = first.ctypes.data
+        second = shrink_to_rgb(frame[40:, 60:], 0.25, pool, 'camera')
+        
+        assert np.array_equal(second, expected)
+        assert second.flags['C_CONTIGUOUS']
+        assert second.ctypes.data == address
+        
+        # A different size gets its own buffer
+        assert shrink_to_rgb(frame, 0.5, pool, 'camera').shape == (240, 320, 3)
+    
     def test_validate_image_file_nonexistent(self):
         """Test validation of non-existent image file"""
         if not FACE_RECOGNITION_AVAILABLE:
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test suite for gallery re-embedding
+Tests staging, resuming and the atomic switch to a new gallery version without face recognition
+"""
+
+import pytest
+import os
+import sys
+import json
+import tempfile
+import shutil
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import reembedding
+from models import db, Employee, GalleryVersion, GalleryEmbedding, create_db_app
+from reembedding import GalleryReembedder
+
+OLD_SETTINGS = {'model': 'hog', 'num_jitters': 1}
+NEW_SETTINGS = {'model': 'hog', 'num_jitters': 10}
+
+def fake_reembed_employee(task):
+    """Stand-in for the worker: one embedding per photo, none for photos named missing"""
+    paths = [path for path in task['photo_paths'] if 'missing' not in path]
+    return {
+        'employee_id': task['employee_id'],
+        'photo_paths': task['photo_paths'],
+        'embeddings': [[task['settings']['num_jitters'] / 10] * 128 for _ in paths],
+        'errors': [{'photo': 1, 'path': path, 'error': 'not found'} for path in task['photo_paths'] if path not in paths],
+    }
+
+class TestGalleryReembedder:
+    """Test suite for GalleryReembedder"""
+
+    @pytest.fixture
+    def app(self, monkeypatch):
+        """Create an app with a file database the worker processes never touch"""
+        temp_dir = tempfile.mkdtemp()
+        monkeypatch.setenv('DATABASE_URL', f"sqlite:///{os.path.join(temp_dir, 'test.db')}")
+        app = create_db_app(__name__)
+        app.config['UPLOAD_FOLDER'] = temp_dir
+
+        with app.app_context():
+            db.create_all()
+            for i in range(5):
+                db.session.add(Employee(
+                    name=f"Employee {i}", email=f"e{i}@test.com",
+                    face_embeddings=json.dumps([[0.0] * 128]),
+                    photo_paths=json.dumps([f"e{i}_1.jpg", f"e{i}_2.jpg"])
+                ))
+            db.session.commit()
+            yield app
+            db.drop_all()
+        shutil.rmtree(temp_dir)
+
+    def reembedder(self, app, settings=NEW_SETTINGS, **kwargs):
+        return GalleryReembedder(app, db, settings, workers=2, batch_size=2, lock_folder=app.config['UPLOAD_FOLDER'], **kwargs)
+
+    def test_run_switches_every_employee(self, app, monkeypatch):
+        """Test all employees are encoded in batches and activated together"""
+        monkeypatch.setattr(reembedding, 'reembed_employee', fake_reembed_employee)
+        seen = []
+
+        report = self.reembedder(app).run(progress=lambda version: seen.append(version.processed))
+
+        assert report['status'] == 'activated'
+        assert seen[-1] == 5 and seen == sorted(seen)
+        version = db.session.get(GalleryVersion, report['version'])
+        assert version.status == 'active'
+        assert {json.loads(e.face_embeddings)[0][0] for e in Employee.query.all()} == {1.0}
+
+    def test_resume_encodes_only_missing_employees(self, app):
+        """Test a build interrupted after a batch continues where it stopped"""
+        reembedder = self.reembedder(app)
+        version = reembedder.prepare_version()
+        tasks = reembedder.pending_tasks(version)
+        reembedder.save_batch(version, [fake_reembed_employee(task) for task in tasks[:3]])
+
+        resumed = self.reembedder(app).prepare_version()
+
+        assert resumed.id == version.id
+        assert [task['employee_id'] for task in reembedder.pending_tasks(resumed)] == [t['employee_id'] for t in tasks[3:]]
+        assert reembedder.activate(resumed) == 'stale'
+        # Nothing changed until the version is complete
+        assert json.loads(Employee.query.first().face_embeddings) == [[0.0] * 128]
+
+    def test_changed_settings_abandon_old_build(self, app):
+        """Test a build for other settings is dropped instead of resumed"""
+        old = self.reembedder(app, OLD_SETTINGS)
+        version = old.prepare_version()
+        old.save_batch(version, [fake_reembed_employee(old.pending_tasks(version)[0])])
+
+        new_version = self.reembedder(app).prepare_version()
+
+        assert new_version.id != version.id
+        assert db.session.get(GalleryVersion, version.id).status == 'abandoned'
+        assert GalleryEmbedding.query.filter_by(version_id=version.id).count() == 0
+
+    def test_photos_changed_during_build_are_encoded_again(self, app):
+        """Test an upload finishing mid-build is picked up before the switch"""
+        reembedder = self.reembedder(app)
+        version = reembedder.prepare_version()
+        reembedder.save_batch(version, [fake_reembed_employee(task) for task in reembedder.pending_tasks(version)])
+        employee = Employee.query.first()
+        employee.photo_paths = json.dumps(["new.jpg"])
+        db.session.commit()
+
+        assert reembedder.activate(version) == 'stale'
+        assert [task['photo_paths'] for task in reembedder.pending_tasks(version)] == [["new.jpg"]]
+
+    def test_failed_employees_block_switch(self, app, monkeypatch):
+        """Test employees without a usable photo keep the version building unless skipped"""
+        monkeypatch.setattr(reembedding, 'reembed_employee', fake_reembed_employee)
+        employee = Employee.query.first()
+        employee.photo_paths = json.dumps(["missing.jpg"])
+        db.session.commit()
+        employee_id = employee.id
+
+        report = self.reembedder(app).run()
+
+        assert report['status'] == 'failed'
+        assert [failure[0] for failure in report['failures']] == [employee_id]
+        assert db.session.get(GalleryVersion, report['version']).status == 'building'
+
+        report = self.reembedder(app).run(skip_failed=True)
+
+        assert report['status'] == 'activated'
+        # run() commits through its own app context's session
+        db.session.expire_all()
+        assert db.session.get(Employee, employee_id).face_embeddings is None
+
+    def test_current_settings_need_force(self, app, monkeypatch):
+        """Test an up-to-date gallery is not rebuilt by accident"""
+        monkeypatch.setattr(reembedding, 'reembed_employee', fake_reembed_employee)
+        first = self.reembedder(app).run()
+
+        assert self.reembedder(app).run()['status'] == 'current'
+
+        second = self.reembedder(app).run(force=True)
+        assert second['status'] == 'activated'
+        assert db.session.get(GalleryVersion, first['version']).status == 'retired'
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test suite for the retention engine
+Tests batched deletion of expired captures together with their database rows
+"""
+
+import pytest
+import os
+import sys
+import time
+import tempfile
+import shutil
+from datetime import datetime, timedelta
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from models import db, Employee, Attendance, UnknownFace
+from retention import RetentionEngine
+from storage import CaptureStorage
+
+class TestRetentionEngine:
+    """Test suite for the RetentionEngine class"""
+    
+    @pytest.fixture
+    def app_context(self):
+        """Create application context for testing"""
+        app.config['TESTING'] = True
+        
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.drop_all()
+    
+    @pytest.fixture
+    def upload_folder(self):
+        """Create temporary upload folder"""
+        temp_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(temp_dir, "attendance"))
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+    
+    def create_capture(self, upload_folder, name, age_days):
+        """Create a capture file with a backdated modification time"""
+        path = os.path.join(upload_folder, "attendance", name)
+        with open(path, 'wb') as f:
+            f.write(b"x" * 10)
+        mtime = time.time() - age_days * 24 * 60 * 60
+        os.utime(path, (mtime, mtime))
+        return path
+    
+    def seed(self, upload_folder):
+        """Create old and recent captures referenced by database rows"""
+        employee = Employee(name="John Doe", email="john@test.com")
+        db.session.add(employee)
+        db.session.commit()
+        
+        old_attendance = self.create_capture(upload_folder, "attendance_old.jpg", 40)
+        new_attendance = self.create_capture(upload_folder, "attendance_new.jpg", 1)
+        old_unknown = self.create_capture(upload_folder, "unknown_old.jpg", 40)
+        
+        db.session.add_all([
+            Attendance(employee_id=employee.id, timestamp=datetime.now() - timedelta(days=40), image_path=old_attendance),
+            Attendance(employee_id=employee.id, timestamp=datetime.now() - timedelta(days=1), image_path=new_attendance),
+            UnknownFace(timestamp=datetime.now() - timedelta(days=40), image_path=old_unknown),
+        ])
+        db.session.commit()
+        return old_attendance, new_attendance, old_unknown
+    
+    def test_dry_run_changes_nothing(self, app_context, upload_folder):
+        """Test that a dry run reports without deleting"""
+        old_attendance, new_attendance, old_unknown = self.seed(upload_folder)
+        engine = RetentionEngine(app, db, upload_folder, image_retention_days=30, batch_pause=0)
+        
+        report = engine.run(dry_run=True)
+        
+        assert report['files'] == 2
+        assert report['attendance_images_cleared'] == 1
+        assert report['unknown_faces_deleted'] == 1
+        assert os.path.exists(old_attendance) and os.path.exists(old_unknown)
+        assert UnknownFace.query.count() == 1
+    
+    def test_run_deletes_files_and_references(self, app_context, upload_folder):
+        """Test that expired files go away together with their references"""
+        old_attendance, new_attendance, old_unknown = self.seed(upload_folder)
+        engine = RetentionEngine(app, db, upload_folder, image_retention_days=30, batch_size=1, batch_pause=0)
+        
+        report = engine.run()
+        
+        assert report['files'] == 2
+        assert sum(p['files'] for p in report['partitions'].values()) == 2
+        assert not os.path.exists(old_attendance) and not os.path.exists(old_unknown)
+        assert os.path.exists(new_attendance)
+        assert Attendance.query.count() == 2
+        assert Attendance.query.filter(Attendance.image_path.is_(None)).count() == 1
+        assert UnknownFace.query.count() == 0
+    
+    def test_drops_expired_day_directories(self, app_context, upload_folder):
+        """Test that whole sharded days are removed with their references"""
+        storage = CaptureStorage(upload_folder)
+        old_time = datetime.now() - timedelta(days=40)
+        old_path = storage.new_path("unknown", old_time)
+        new_path = storage.new_path("unknown", datetime.now())
+        for path in (old_path, new_path):
+            with open(path, 'wb') as f:
+                f.write(b"x" * 10)
+        db.session.add_all([
+            UnknownFace(timestamp=old_time, image_path=old_path),
+            UnknownFace(timestamp=datetime.now(), image_path=new_path),
+        ])
+        db.session.commit()
+        engine = RetentionEngine(app, db, upload_folder, image_retention_days=30, batch_pause=0)
+        
+        report = engine.run()
+        
+        assert report['files'] == 1
+        assert old_time.date().isoformat() in report['partitions']
+        assert not os.path.exists(storage.day_directory(old_time))
+        assert os.path.exists(new_path)
+        assert [u.image_path for u in UnknownFace.query.all()] == [new_path]
+    
+    def test_attendance_row_retention(self, app_context, upload_folder):
+        """Test that old attendance rows are deleted when row retention is set"""
+        self.seed(upload_folder)
+        engine = RetentionEngine(app, db, upload_folder, image_retention_days=0,
+                                 attendance_retention_days=30, batch_pause=0)
+        
+        report = engine.run()
+        
+        assert report['attendance_rows_deleted'] == 1
+        assert Attendance.query.count() == 1
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test suite for detection regions of interest
+Tests parsing DETECTION_ROIS, region geometry, mapping faces back to the frame and config validation
+"""
+
+import pytest
+import os
+import sys
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from roi import parse_rois, validate_rois, detection_scale
+from config import Config
+
+class TestRegions:
+    """Test suite for Region and parse_rois"""
+    
+    def test_empty_spec_searches_whole_frame(self):
+        """Test no ROIs means one full-frame region at the default scale"""
+        regions = parse_rois('')
+        
+        assert len(regions) == 1
+        assert regions[0].pixel_box(640, 480) == (0, 0, 640, 480)
+        assert regions[0].scale is None
+        assert detection_scale(640, {}) == 0.25
+    
+    def test_rect_and_polygon(self):
+        """Test rects and polygons become pixel bounding boxes"""
+        regions = parse_rois('[{"rect": [0.25, 0, 0.5, 1], "scale": 0.5}, {"polygon": [[0, 0.5], [0.5, 1], [0, 1]]}]')
+        
+        assert regions[0].pixel_box(640, 480) == (160, 0, 480, 480)
+        assert regions[0].scale == 0.5
+        assert regions[1].pixel_box(640, 480) == (0, 240, 320, 480)
+        assert regions[1].contains(10, 470, 640, 480)
+        assert not regions[1].contains(300, 250, 640, 480)
+    
+    def test_per_camera(self):
+        """Test an object of lists selects regions by camera index"""
+        spec = '{"1": [{"rect": [0, 0, 0.5, 0.5]}]}'
+        
+        assert parse_rois(spec, camera_index=1)[0].box == (0.0, 0.0, 0.5, 0.5)
+        assert parse_rois(spec, camera_index=0)[0].box == (0.0, 0.0, 1.0, 1.0)
+    
+    def test_roi_locations_map_to_full_frame(self):
+        """Test faces found in a region crop map back to full-frame coordinates"""
+        regions = parse_rois([
+            {'rect': [0.5, 0.5, 0.5, 0.5], 'scale': 0.5},
+            {'polygon': [[0, 0], [0.5, 0], [0, 0.5]], 'scale': 0.25},
+        ])
+        found = []
+        
+        locations, frame_locations = regions[0].to_frame([(10, 40, 50, 20)], 0.5, 640, 480, found)
+        assert locations == [(10, 40, 50, 20)]
+        assert frame_locations == [(240 + 20, 320 + 80, 240 + 100, 320 + 40)]
+        assert found == frame_locations
+        
+        # The second face's centre (200, 240) lies in the bounding box but outside the triangle
+        locations, _ = regions[1].to_frame([(40, 60, 80, 40)], 0.25, 640, 480, found)
+        assert locations == []
+        
+        # A face already found by an overlapping region is not reported twice
+        full = parse_rois('')[0]
+        locations, _ = full.to_frame([(70, 100, 80, 90)], 0.25, 640, 480, found)
+        assert locations == []
+    
+    def test_detection_scale_policy(self):
+        """Test the downscale follows the capture resolution and the smallest face wanted"""
+        # A higher-resolution camera keeps the detection image the same size by default
+        assert detection_scale(1920, {'CAMERA_WIDTH': 1920}) * 1920 == pytest.approx(160)
+        # Looking for smaller faces means shrinking less, but never enlarging
+        assert detection_scale(1920, {'CAMERA_WIDTH': 1920, 'DETECTION_MIN_FACE_SIZE': 80}) == 0.5
+        assert detection_scale(640, {'CAMERA_WIDTH': 640, 'DETECTION_MIN_FACE_SIZE': 20}) == 1.0
+        # A camera that ignores the configured resolution gets proportionally sized faces
+        assert detection_scale(1280, {'CAMERA_WIDTH': 640, 'DETECTION_MIN_FACE_SIZE': 80}) == 0.25
+    
+    @pytest.mark.parametrize('spec', [
+        'not json',
+        '[{"rect": [0, 0, 2, 1]}]',
+        '[{"rect": [0, 0, 0, 1]}]',
+        '[{"polygon": [[0, 0], [1, 1]]}]',
+        '[{"rect": [0, 0, 1, 1], "scale": 2}]',
+        '[{"circle": [0.5, 0.5]}]',
+        '{"0": {"rect": [0, 0, 1, 1]}}',
+    ])
+    def test_invalid_specs(self, spec):
+        """Test malformed regions are reported"""
+        assert validate_rois(spec)
+    
+    def test_runtime_override(self):
+        """Test ROIs can be changed at runtime from JSON and bad ones are rejected"""
+        config = Config()
+        
+        changed = config.reload({'DETECTION_ROIS': [{'rect': [0.1, 0.1, 0.8, 0.8]}]})
+        assert changed == ['DETECTION_ROIS']
+        assert parse_rois(config.get('DETECTION_ROIS'))[0].box[0] == 0.1
+        
+        with pytest.raises(ValueError):
+            config.reload({'DETECTION_ROIS': [{'rect': [0, 0, 5, 5]}]})
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
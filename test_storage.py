@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test suite for the capture storage layout
+Tests sharded paths, day listing and migration of the flat layout
+"""
+
+import pytest
+import os
+import sys
+import tempfile
+import shutil
+from datetime import datetime, date
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from config import Config
+from models import db, Employee, Attendance, create_db_app
+from storage import CaptureStorage
+
+class TestCaptureStorage:
+    """Test suite for the CaptureStorage class"""
+    
+    @pytest.fixture
+    def app_context(self):
+        """Create application context for testing"""
+        app.config['TESTING'] = True
+        
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.drop_all()
+    
+    @pytest.fixture
+    def upload_folder(self):
+        """Create temporary upload folder"""
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+    
+    def test_new_path_is_sharded_and_unique(self, upload_folder):
+        """Test that captures in the same second get distinct hour-sharded paths"""
+        storage = CaptureStorage(upload_folder)
+        timestamp = datetime(2025, 7, 5, 9, 15, 2)
+        
+        paths = {storage.new_path("unknown", timestamp) for _ in range(100)}
+        
+        assert len(paths) == 100
+        for path in paths:
+            assert os.path.dirname(path) == os.path.join(upload_folder, "attendance", "2025", "07", "05", "09")
+            assert os.path.basename(path).startswith("unknown_20250705_091502_")
+    
+    def test_iter_day_directories(self, upload_folder):
+        """Test that days are listed oldest first and stray entries are ignored"""
+        storage = CaptureStorage(upload_folder)
+        storage.new_path("unknown", datetime(2025, 7, 5, 9))
+        storage.new_path("unknown", datetime(2024, 12, 31, 23))
+        storage.new_path("unknown", datetime(2025, 7, 5, 17))
+        os.makedirs(os.path.join(storage.root, "misc"))
+        
+        days = [day for day, _ in storage.iter_day_directories()]
+        
+        assert days == [date(2024, 12, 31), date(2025, 7, 5)]
+    
+    def test_migrate_legacy_files(self, app_context, upload_folder):
+        """Test that flat-layout files move into shards with their database paths"""
+        storage = CaptureStorage(upload_folder)
+        os.makedirs(storage.root)
+        legacy_path = os.path.join(storage.root, "attendance_1_20250705_091502.jpg")
+        open(legacy_path, 'wb').close()
+        
+        employee = Employee(name="John Doe", email="john@test.com")
+        db.session.add(employee)
+        db.session.commit()
+        db.session.add(Attendance(employee_id=employee.id, timestamp=datetime(2025, 7, 5, 9, 15, 2), image_path=legacy_path))
+        db.session.commit()
+        
+        assert storage.migrate_legacy_files(db, dry_run=True) == 1
+        assert os.path.exists(legacy_path)
+        
+        assert storage.migrate_legacy_files(db) == 1
+        
+        new_path = os.path.join(storage.shard_directory(datetime(2025, 7, 5, 9)), "attendance_1_20250705_091502.jpg")
+        assert os.path.exists(new_path)
+        assert not os.path.exists(legacy_path)
+        db.session.expire_all()
+        assert Attendance.query.first().image_path == new_path
+        
+        # Re-running is a no-op
+        assert storage.migrate_legacy_files(db) == 0
+    
+    def test_app_upload_folder_follows_config(self, upload_folder, monkeypatch):
+        """Test retention, migration and /media resolve captures where the loop stores them"""
+        monkeypatch.setenv('UPLOAD_FOLDER', upload_folder)
+        assert create_db_app(__name__).config["UPLOAD_FOLDER"] == upload_folder
+        
+        config = Config()
+        config.update({'UPLOAD_FOLDER': os.path.join(upload_folder, "captures")})
+        assert create_db_app(__name__, config).config["UPLOAD_FOLDER"] == os.path.join(upload_folder, "captures")
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Test suite for the recognition worker control channel
+Tests WorkerClient round trips against the control server, the web app proxying to it
+and the controller's single camera owner
+"""
+
+import pytest
+import os
+import sys
+import types
+import threading
+from flask import Flask
+
+# Add the parent directory to the path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from worker import RecognitionController, WorkerClient, WorkerUnavailableError, create_control_server
+
+class FakeController:
+    """Stands in for RecognitionController without a camera"""
+
+    def __init__(self):
+        self.running = False
+        self.gallery_reloads = []
+        self.overrides = []
+
+    def start(self):
+        started = not self.running
+        self.running = True
+        return started
+
+    def stop(self):
+        self.running = False
+
+    def status(self):
+        return {'is_running': self.running, 'message': 'fake', 'pid': os.getpid(), 'gallery_size': 3}
+
+    def reload_gallery(self, employee_id=None):
+        self.gallery_reloads.append(employee_id)
+
+    def runtime_config(self):
+        return {'RECOGNITION_THRESHOLD': 0.6}
+
+    def reload_config(self, overrides=None):
+        if overrides and 'CAMERA_INDEX' in overrides:
+            raise ValueError("CAMERA_INDEX cannot be changed at runtime")
+        self.overrides.append(overrides)
+        return sorted(overrides or {})
+
+    def start_profile(self, mode='sampling', seconds=None, frames=None):
+        if not self.running:
+            raise RuntimeError("Recognition system is not running")
+        return {'mode': mode, 'seconds': seconds, 'max_frames': frames}
+
+    def profile_status(self):
+        return {'active': False, 'session': None}
+
+    def metrics(self):
+        return "# TYPE face_attendance_frames_total counter\n"
+
+class SlowCameraSystem:
+    """Stands in for FaceRecognitionSystem, opening its camera only when told to"""
+
+    camera_opened = None
+    instances = []
+
+    def __init__(self, db, notification_service, config):
+        self.is_running = False
+        self.stopped = threading.Event()
+        self.instances.append(self)
+
+    def run(self):
+        self.camera_opened.wait(timeout=5)
+        if not self.stopped.is_set():
+            self.is_running = True
+            self.stopped.wait(timeout=5)
+        self.is_running = False
+
+    def stop(self):
+        self.stopped.set()
+        self.is_running = False
+
+@pytest.fixture
+def worker():
+    """A control server on a free port serving a FakeController"""
+    controller = FakeController()
+    server = create_control_server(controller, port=0, token='secret')
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield controller, url
+    server.shutdown()
+    server.server_close()
+
+class TestWorkerClient:
+    """Test suite for WorkerClient"""
+
+    def test_round_trip(self, worker):
+        """Test each call reaches the controller in the worker"""
+        controller, url = worker
+        client = WorkerClient(url, token='secret')
+
+        assert client.start() is True
+        assert client.start() is False
+        assert client.is_running() is True
+        assert client.status()['gallery_size'] == 3
+
+        client.reload_gallery()
+        client.reload_gallery(7)
+        assert controller.gallery_reloads == [None, 7]
+
+        assert client.reload_config({'TARGET_FPS': 10}) == ['TARGET_FPS']
+        assert client.start_profile(seconds=2.0)['seconds'] == 2.0
+        assert 'face_attendance_frames_total' in client.metrics()
+
+        client.stop()
+        assert controller.running is False
+
+    def test_errors_map_to_controller_exceptions(self, worker):
+        """Test 400 and 409 responses raise the same exceptions as a local controller"""
+        _, url = worker
+        client = WorkerClient(url, token='secret')
+
+        with pytest.raises(ValueError):
+            client.reload_config({'CAMERA_INDEX': 1})
+        with pytest.raises(RuntimeError):
+            client.start_profile(seconds=1.0)
+
+    def test_token_required(self, worker):
+        """Test requests without the shared token are refused"""
+        controller, url = worker
+
+        with pytest.raises(WorkerUnavailableError):
+            WorkerClient(url, token='wrong').start()
+        assert controller.running is False
+
+    def test_unreachable_worker(self):
+        """Test a worker that is not listening raises WorkerUnavailableError"""
+        server = create_control_server(FakeController(), port=0)
+        port = server.server_address[1]
+        server.server_close()
+
+        with pytest.raises(WorkerUnavailableError):
+            WorkerClient(f"http://127.0.0.1:{port}", timeout=1).status()
+
+class TestRecognitionController:
+    """Test suite for RecognitionController"""
+
+    @pytest.fixture
+    def controller(self, monkeypatch):
+        """A controller whose loops wait for the test to open the camera"""
+        SlowCameraSystem.camera_opened = threading.Event()
+        SlowCameraSystem.instances = []
+        monkeypatch.setitem(sys.modules, 'recognition', types.SimpleNamespace(FaceRecognitionSystem=SlowCameraSystem))
+        controller = RecognitionController(Flask(__name__), None, None, {})
+        yield controller
+        SlowCameraSystem.camera_opened.set()
+        controller.stop()
+
+    def test_second_start_while_camera_opens(self, controller):
+        """Test a start racing one that has not opened the camera yet never adds a second loop"""
+        assert controller.start() is True
+        assert controller.is_running() is False
+
+        assert controller.start() is False
+        assert len(SlowCameraSystem.instances) == 1
+
+        SlowCameraSystem.camera_opened.set()
+        assert controller.start() is False
+
+    def test_stop_waits_for_loop(self, controller):
+        """Test stop returns only once the loop is gone, so a restart opens the camera alone"""
+        controller.start()
+        first = controller.thread
+        # The camera finishes opening while stop() is waiting
+        threading.Timer(0.2, SlowCameraSystem.camera_opened.set).start()
+
+        controller.stop()
+
+        assert not first.is_alive()
+        assert controller.start() is True
+        assert len(SlowCameraSystem.instances) == 2
+
+class TestWorkerEndpoints:
+    """Test suite for the web app talking to a worker"""
+
+    def test_endpoints_proxy_to_worker(self, worker, monkeypatch):
+        """Test the recognition endpoints control the worker instead of a local loop"""
+        import app as app_module
+
+        controller, url = worker
+        app = app_module.app
+        app.config['TESTING'] = True
+        monkeypatch.setattr(app_module, 'recognition_controller', WorkerClient(url, token='secret'))
+
+        with app.test_client() as client:
+            response = client.post('/api/recognition/start')
+            assert response.status_code == 200
+            assert controller.running is True
+
+            status = client.get('/api/recognition/status').get_json()
+            assert status['is_running'] is True
+            assert status['pid'] == os.getpid()
+
+            response = client.get('/metrics')
+            assert b'face_attendance_frames_total' in response.data
+
+            assert client.post('/api/recognition/stop').status_code == 200
+            assert controller.running is False
+
+    def test_unreachable_worker_returns_502(self, monkeypatch):
+        """Test the web app reports a worker that is down instead of failing"""
+        import app as app_module
+
+        server = create_control_server(FakeController(), port=0)
+        port = server.server_address[1]
+        server.server_close()
+
+        app = app_module.app
+        app.config['TESTING'] = True
+        monkeypatch.setattr(app_module, 'recognition_controller', WorkerClient(f"http://127.0.0.1:{port}", timeout=1))
+
+        with app.test_client() as client:
+            assert client.post('/api/recognition/start').status_code == 502
+            assert client.get('/api/recognition/status').status_code == 502
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -64,6 +64,46 @@ def resize_image(image, max_width=800, max_height=600):
         logger.error(f"Error resizing image: {str(e)}")
         return image
 
+class BufferPool:
+    """Destination arrays reused from frame to frame, one per key
+    
+    An array is only reallocated when the requested shape changes, so a
+    stream of same-sized frames is resized and converted into the same memory
+    every time instead of allocating new images per frame.
+    """
+    
+    def __init__(self):
+        self._buffers = {}
+    
+    def get(self, key, shape, dtype=np.uint8):
+        buffer = self._buffers.get(key)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+            self._buffers[key] = buffer
+        return buffer
+    
+    def clear(self):
+        self._buffers.clear()
+    
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+def shrink_to_rgb(image, scale, pool, key):
+    """Downscale a BGR image and convert it to contiguous RGB in pooled buffers
+    
+    Returns the RGB image, which is overwritten by the next call with the
+    same key. The result is identical to cv2.resize with fx/fy followed by
+    cv2.cvtColor.
+    """
+    if scale != 1:
+        # Same size cv2.resize derives from fx/fy, so it writes into the buffer as is
+        height, width = image.shape[:2]
+        shape = (round(height * scale), round(width * scale)) + image.shape[2:]
+        image = cv2.resize(image, (0, 0), dst=pool.get((key, 'small'), shape), fx=scale, fy=scale)
+    
+    # dlib needs a contiguous array; a [:, :, ::-1] view would be copied again for every call
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=pool.get((key, 'rgb'), image.shape))
+
 def validate_image_file(filepath):
     """Validate if file is a valid image"""
     try:
@@ -95,15 +135,56 @@ def validate_image_file(filepath):
 def create_thumbnail(image_path, thumbnail_path, size=(150, 150)):
     """Create thumbnail of an image"""
     try:
+        os.makedirs(os.path.dirname(thumbnail_path) or '.', exist_ok=True)
         with Image.open(image_path) as img:
+            # JPEG draft mode decodes at a reduced scale, far cheaper than a full decode
+            img.draft('RGB', size)
             img.thumbnail(size, Image.Resampling.LANCZOS)
-            img.save(thumbnail_path, "JPEG", quality=85)
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            # Write to a temporary file first so concurrent readers never see a partial thumbnail
+            temp_path = f"{thumbnail_path}.{os.getpid()}.tmp"
+            img.save(temp_path, "JPEG", quality=85)
+        os.replace(temp_path, thumbnail_path)
         return True
     
     except Exception as e:
         logger.error(f"Error creating thumbnail: {str(e)}")
         return False
 
+def get_thumbnail_path(relative_path, upload_folder):
+    """Return where the thumbnail of an upload (relative to the upload folder) is cached"""
+    root, _ = os.path.splitext(relative_path)
+    return os.path.join(upload_folder, "thumbnails", root + ".jpg")
+
+def ensure_thumbnail(relative_path, upload_folder, size=(150, 150)):
+    """Return the cached thumbnail path of an upload, creating it if missing or stale"""
+    image_path = os.path.join(upload_folder, relative_path)
+    thumbnail_path = get_thumbnail_path(relative_path, upload_folder)
+    
+    try:
+        if os.stat(thumbnail_path).st_mtime >= os.stat(image_path).st_mtime:
+            return thumbnail_path
+    except FileNotFoundError:
+        pass
+    
+    if create_thumbnail(image_path, thumbnail_path, size):
+        return thumbnail_path
+    return None
+
+def write_thumbnail(image, thumbnail_path, size=(150, 150)):
+    """Write a thumbnail straight from an in-memory BGR image"""
+    try:
+        height, width = image.shape[:2]
+        scale = min(size[0] / width, size[1] / height, 1.0)
+        thumbnail = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        os.makedirs(os.path.dirname(thumbnail_path) or '.', exist_ok=True)
+        return cv2.imwrite(thumbnail_path, thumbnail, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    
+    except Exception as e:
+        logger.error(f"Error writing thumbnail: {str(e)}")
+        return False
+
 def get_file_size(filepath):
     """Get file size in bytes"""
     try:
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Standalone recognition worker
+Owns the camera and runs the recognition loop in its own process. The web
+app controls it over a small JSON-over-HTTP channel bound to localhost, so
+any number of web workers can share the single camera owner.
+"""
+
+import os
+import sys
+import json
+import hmac
+import logging
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# How long stop() waits for the loop to release the camera
+STOP_TIMEOUT_SECONDS = 10
+
+class WorkerUnavailableError(Exception):
+    """The recognition worker could not be reached"""
+
+class RecognitionController:
+    """Start, stop and inspect the recognition loop running in this process"""
+
+    def __init__(self, app, db, notification_service, config):
+        self.app = app
+        self.db = db
+        self.notification_service = notification_service
+        self.config = config
+        self.system = None
+        self.thread = None
+        self._lock = threading.Lock()
+
+    def is_running(self):
+        return bool(self.system and self.system.is_running)
+
+    def loop_alive(self):
+        """Whether a loop thread exists, including one still opening the camera"""
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        """Start the loop on a daemon thread; returns False if it was already running"""
+        # Imported here so cv2 and the dlib models only load when recognition starts
+        from recognition import FaceRecognitionSystem
+
+        with self._lock:
+            # is_running() only turns true once the camera is open; a loop
+            # still opening it must not get a second camera owner
+            if self.loop_alive():
+                return False
+
+            with self.app.app_context():
+                system = FaceRecognitionSystem(self.db, self.notification_service, self.config)
+
+            def run():
+                # The loop queries and writes through Flask-SQLAlchemy, which needs an app context
+                with self.app.app_context():
+                    system.run()
+
+            self.system = system
+            self.thread = threading.Thread(target=run, name='recognition', daemon=True)
+            self.thread.start()
+            return True
+
+    def stop(self):
+        """Stop the loop and wait until it has released the camera"""
+        with self._lock:
+            if self.system:
+                self.system.stop()
+                self.system = None
+            if self.thread is not None:
+                self.thread.join(timeout=STOP_TIMEOUT_SECONDS)
+                if self.thread.is_alive():
+                    # Kept, so start() refuses until this loop has finished
+                    logger.warning("Recognition loop did not stop in time")
+                else:
+                    self.thread = None
+
+    def status(self):
+        running = self.is_running()
+        return {
+            'is_running': running,
+            'message': 'Recognition system is running' if running else 'Recognition system is stopped',
+            'pid': os.getpid(),
+            'gallery_size': len(self.system.gallery) if self.system else 0,
+        }
+
+    def reload_gallery(self, employee_id=None):
+        """Reload employee embeddings into the running loop (only one employee's when given)"""
+        if self.is_running():
+            with self.app.app_context():
+                if employee_id is None:
+                    self.system.load_known_faces()
+                else:
+                    self.system.update_employee(employee_id)
+
+    def runtime_config(self):
+        from config import RUNTIME_KEYS
+
+        snapshot = self.config.snapshot()
+        return {key: snapshot.get(key) for key in sorted(RUNTIME_KEYS)}
+
+    def reload_config(self, overrides=None):
+        """Apply a config reload; the loop picks it up on its next frame"""
+        return self.config.reload(overrides)
+
+    def start_profile(self, mode='sampling', seconds=None, frames=None):
+        if not self.is_running():
+            raise RuntimeError("Recognition system is not running")
+        return self.system.profiler.start(mode=mode, seconds=seconds, frames=frames).status()
+
+    def profile_status(self):
+        if not self.system:
+            return {'active': False, 'session': None}
+        return self.system.profiler.status()
+
+    def metrics(self):
+        from metrics import REGISTRY
+
+        return REGISTRY.render()
+
+class WorkerClient:
+    """Talk to a recognition worker with the same interface as RecognitionController"""
+
+    def __init__(self, url, token=None, timeout=5.0):
+        self.url = url.rstrip('/')
+        self.token = token
+        self.timeout = timeout
+
+    def _request(self, method, path, body=None, raw=False):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method)
+        request.add_header('Content-Type', 'application/json')
+        if self.token:
+            request.add_header('Authorization', f"Bearer {self.token}")
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = response.read().decode('utf-8')
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read().decode('utf-8')).get('error', str(e))
+            except ValueError:
+                message = str(e)
+            # Map the worker's status codes back to the exceptions the controller raises
+            if e.code == 400:
+                raise ValueError(message)
+            if e.code == 409:
+                raise RuntimeError(message)
+            raise WorkerUnavailableError(message)
+        except (urllib.error.URLError, OSError) as e:
+            raise WorkerUnavailableError(f"Recognition worker at {self.url} is unreachable: {e}")
+
+        return payload if raw else json.loads(payload)
+
+    def is_running(self):
+        return self.status()['is_running']
+
+    def start(self):
+        return self._request('POST', '/start')['started']
+
+    def stop(self):
+        self._request('POST', '/stop')
+
+    def status(self):
+        return self._request('GET', '/status')
+
+    def reload_gallery(self, employee_id=None):
+        self._request('POST', '/gallery/reload', {'employee_id': employee_id})
+
+    def runtime_config(self):
+        return self._request('GET', '/config')
+
+    def reload_config(self, overrides=None):
+        return self._request('POST', '/config/reload', overrides or {})['changed']
+
+    def start_profile(self, mode='sampling', seconds=None, frames=None):
+        return self._request('POST', '/profile', {'mode': mode, 'seconds': seconds, 'frames': frames})
+
+    def profile_status(self):
+        return self._request('GET', '/profile')
+
+    def metrics(self):
+        return self._request('GET', '/metrics', raw=True)
+
+def make_handler(controller, token=None):
+    """Build the request handler class serving a controller"""
+
+    class ControlHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            logger.debug("Control channel: " + format % args)
+
+        def _send(self, status, payload, content_type='application/json'):
+            body = payload if isinstance(payload, str) else json.dumps(payload)
+            body = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _authorized(self):
+            if not token:
+                return True
+            header = self.headers.get('Authorization', '')
+            return hmac.compare_digest(header, f"Bearer {token}")
+
+        def _body(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            if not length:
+                return {}
+            return json.loads(self.rfile.read(length).decode('utf-8')) or {}
+
+        def _dispatch(self, method):
+            if not self._authorized():
+                return self._send(401, {'error': 'Unauthorized'})
+
+            routes = {
+                ('GET', '/status'): lambda body: controller.status(),
+                ('POST', '/start'): lambda body: {'started': controller.start()},
+                ('POST', '/stop'): lambda body: controller.stop() or {'stopped': True},
+                ('POST', '/gallery/reload'): lambda body: controller.reload_gallery(body.get('employee_id')) or {'reloaded': True},
+                ('GET', '/config'): lambda body: controller.runtime_config(),
+                ('POST', '/config/reload'): lambda body: {'changed': controller.reload_config(body or None)},
+                ('POST', '/profile'): lambda body: controller.start_profile(
+                    mode=body.get('mode', 'sampling'), seconds=body.get('seconds'), frames=body.get('frames')
+                ),
+                ('GET', '/profile'): lambda body: controller.profile_status(),
+            }
+
+            try:
+                if (method, self.path) == ('GET', '/metrics'):
+                    from metrics import CONTENT_TYPE
+                    return self._send(200, controller.metrics(), CONTENT_TYPE)
+
+                route = routes.get((method, self.path))
+                if route is None:
+                    return self._send(404, {'error': 'Not found'})
+                return self._send(200, route(self._body()))
+
+            except ValueError as e:
+                self._send(400, {'error': str(e)})
+            except RuntimeError as e:
+                self._send(409, {'error': str(e)})
+            except Exception as e:
+                logger.error(f"Error handling control request {method} {self.path}: {str(e)}")
+                self._send(500, {'error': 'Internal error'})
+
+        def do_GET(self):
+            self._dispatch('GET')
+
+        def do_POST(self):
+            self._dispatch('POST')
+
+    return ControlHandler
+
+def create_control_server(controller, host='127.0.0.1', port=5055, token=None):
+    """Create (but don't start) the HTTP control server for a controller"""
+    server = ThreadingHTTPServer((host, port), make_handler(controller, token))
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the recognition loop as a standalone worker')
+    parser.add_argument('--host', default=None, help='Control channel address (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=None, help='Control channel port (default: RECOGNITION_WORKER_PORT)')
+    parser.add_argument('--no-autostart', action='store_true', help='Wait for a start request instead of starting immediately')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    # Add the parent directory to the path to import our modules
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    from config import Config
+    from models import db, create_db_app
+
+    config = Config()
+    app = create_db_app(__name__, config)
+    with app.app_context():
+        db.create_all()
+
+    try:
+        from notifier import NotificationService
+        notification_service = NotificationService()
+    except ImportError:
+        logger.warning("Notification service not available")
+        notification_service = None
+
+    controller = RecognitionController(app, db, notification_service, config)
+    host = args.host or config.get('RECOGNITION_WORKER_HOST', '127.0.0.1')
+    port = args.port or config.get('RECOGNITION_WORKER_PORT', 5055)
+    server = create_control_server(controller, host, port, config.get('RECOGNITION_WORKER_TOKEN'))
+
+    if not args.no_autostart:
+        controller.start()
+
+    logger.info(f"Recognition worker {os.getpid()} listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        controller.stop()
+        server.server_close()
+
+if __name__ == '__main__':
+    main()